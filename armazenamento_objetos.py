@@ -0,0 +1,127 @@
+import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from esquema_dados import LINHAS_PREVIEW, sondar_csv, sondar_parquet
+
+# Leitura de arquivos em S3 e Azure Blob por intervalos de bytes (Range GET). Um
+# arquivo remoto é exposto como arquivo local com seek, então o pyarrow busca só o
+# rodapé do Parquet e o primeiro grupo de linhas, e o pandas só o início do CSV.
+# Quando o arquivo inteiro é necessário, ele é baixado em partes paralelas.
+# Cada objeto é descrito por (tamanho, ler_intervalo(inicio, fim)).
+
+TAMANHO_BLOCO_LEITURA = 1024 * 1024
+TAMANHO_PARTE = 8 * 1024 * 1024
+MAX_PARTES_PARALELAS = 8
+
+
+class ArquivoRemoto(io.RawIOBase):
+    def __init__(self, tamanho, ler_intervalo):
+        self.tamanho = tamanho
+        self._ler_intervalo = ler_intervalo
+        self._posicao = 0
+        self.requisicoes = 0
+        self.bytes_lidos = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._posicao
+
+    def seek(self, deslocamento, referencia=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._posicao, io.SEEK_END: self.tamanho}[referencia]
+        self._posicao = max(0, base + deslocamento)
+        return self._posicao
+
+    def readinto(self, buffer):
+        fim = min(self._posicao + len(buffer), self.tamanho)
+        if fim <= self._posicao:
+            return 0
+        dados = self._ler_intervalo(self._posicao, fim)
+        buffer[:len(dados)] = dados
+        self._posicao += len(dados)
+        self.requisicoes += 1
+        self.bytes_lidos += len(dados)
+        return len(dados)
+
+
+def abrir_remoto(tamanho, ler_intervalo, tamanho_bloco=TAMANHO_BLOCO_LEITURA):
+    # O buffer agrupa leituras pequenas e sequenciais em requisições de tamanho_bloco
+    return io.BufferedReader(ArquivoRemoto(tamanho, ler_intervalo), buffer_size=tamanho_bloco)
+
+
+def criar_cliente_s3(access_key, secret_key):
+    import boto3
+    from botocore.config import Config
+
+    return boto3.client(
+        "s3", aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+        config=Config(max_pool_connections=MAX_PARTES_PARALELAS * 2)
+    )
+
+
+def objeto_s3(cliente, bucket, chave):
+    tamanho = cliente.head_object(Bucket=bucket, Key=chave)["ContentLength"]
+
+    def ler_intervalo(inicio, fim):
+        return cliente.get_object(Bucket=bucket, Key=chave, Range=f"bytes={inicio}-{fim - 1}")["Body"].read()
+
+    return tamanho, ler_intervalo
+
+
+def criar_cliente_azure(connection_string):
+    from azure.storage.blob import BlobServiceClient
+
+    return BlobServiceClient.from_connection_string(connection_string)
+
+
+def objeto_azure(servico, container, blob):
+    cliente = servico.get_blob_client(container=container, blob=blob)
+    tamanho = cliente.get_blob_properties().size
+
+    def ler_intervalo(inicio, fim):
+        return cliente.download_blob(offset=inicio, length=fim - inicio).readall()
+
+    return tamanho, ler_intervalo
+
+
+def sondar_objeto(tamanho, ler_intervalo, tipo_arquivo, linhas=LINHAS_PREVIEW):
+    arquivo = abrir_remoto(tamanho, ler_intervalo)
+    if tipo_arquivo == "parquet":
+        sondagem = sondar_parquet(arquivo, linhas)
+    else:
+        sondagem = sondar_csv(arquivo, linhas)
+    sondagem.bytes_lidos = arquivo.raw.bytes_lidos
+    return sondagem
+
+
+def baixar_em_partes(tamanho, ler_intervalo, destino, tamanho_parte=TAMANHO_PARTE, max_paralelos=MAX_PARTES_PARALELAS):
+    # Cada parte é baixada por uma thread e gravada na sua posição de um arquivo
+    # temporário, renomeado para o destino só no fim
+    diretorio = os.path.dirname(destino) or "."
+    fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".tmp-")
+    try:
+        os.ftruncate(fd, tamanho)
+
+        def baixar(inicio):
+            dados = ler_intervalo(inicio, min(inicio + tamanho_parte, tamanho))
+            os.pwrite(fd, dados, inicio)
+
+        with ThreadPoolExecutor(max_workers=max_paralelos) as executor:
+            list(executor.map(baixar, range(0, tamanho, tamanho_parte)))
+        os.fsync(fd)
+        os.close(fd)
+        fd = None
+        os.replace(temporario, destino)
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+    return destino
@@ -0,0 +1,166 @@
+import logging
+import os
+from functools import partial
+
+from cliente_llm import ClienteLLM, ErroLLM
+
+# Backends de LLM: o modelo escolhido na etapa 1 define o provedor, e cada etapa
+# é roteada para o modelo adequado (visão para imagens, modelo rápido para texto),
+# com fallback para o modelo padrão quando o provedor falha ou não está configurado.
+#
+# Todos os provedores são acessados por APIs compatíveis com a da OpenAI. Além da
+# OpenAI (OPENAI_API_KEY / OPENAI_BASE_URL), um provedor só é habilitado quando há
+# DASHMIGRATE_<PROVEDOR>_BASE_URL no ambiente (e DASHMIGRATE_<PROVEDOR>_API_KEY, se
+# exigir), por exemplo DASHMIGRATE_LOCAL_BASE_URL=http://localhost:11434/v1 para
+# Ollama/vLLM. O modelo "custom" usa o nome definido em DASHMIGRATE_EXTERNO_MODELO.
+# DASHMIGRATE_MODELO_<ETAPA> fixa o modelo de uma etapa (chave do CATALOGO).
+
+logger = logging.getLogger(__name__)
+
+MODELO_PADRAO = "gpt-4o"
+
+# Chave usada em plataforma.json -> (provedor, nome na API, aceita imagens, variante rápida para texto)
+CATALOGO = {
+    "gpt-4o": ("openai", "gpt-4o", True, "gpt-4o-mini"),
+    "gpt-4": ("openai", "gpt-4", False, None),
+    "gpt-3.5-turbo": ("openai", "gpt-3.5-turbo", False, None),
+    "claude-3-opus": ("anthropic", "claude-3-opus-20240229", True, "claude-3-haiku-20240307"),
+    "claude-3-sonnet": ("anthropic", "claude-3-sonnet-20240229", True, "claude-3-haiku-20240307"),
+    "gemini-1.5-pro": ("google", "gemini-1.5-pro", True, "gemini-1.5-flash"),
+    "gemini-1.0-pro": ("google", "gemini-1.0-pro", False, None),
+    "llama3-70b": ("local", "llama3:70b", False, None),
+    "llama3-8b": ("local", "llama3:8b", False, None),
+    "mixtral-8x7b": ("local", "mixtral:8x7b", False, None),
+    "mistral-7b-instruct": ("local", "mistral:7b-instruct", False, None),
+    "command-r-plus": ("cohere", "command-r-plus", False, None),
+    "bedrock-titan": ("bedrock", "amazon.titan-text-premier-v1:0", False, None),
+    "gpt-4-azure": ("azure", "gpt-4", False, None),
+    "custom": ("externo", None, False, None)
+}
+
+# Tipo de chamada de cada etapa que usa o LLM
+ETAPAS_LLM = {
+    "extracao": "visao",
+    "analise": "texto",
+    "roteiro": "texto",
+    "dax": "texto",
+    "comparacao": "visao"
+}
+
+
+class RoteadorLLM:
+    def __init__(self, clientes, modelo_padrao=MODELO_PADRAO, modelo_visao=MODELO_PADRAO,
+                 modelo_fallback=MODELO_PADRAO, rotas_fixas=None):
+        self.clientes = clientes
+        self.modelo_padrao = modelo_padrao
+        self.modelo_visao = modelo_visao
+        self.modelo_fallback = modelo_fallback
+        self.rotas_fixas = rotas_fixas or {}
+
+    def _destino(self, modelo, rapido=False):
+        provedor, nome_api, _, variante_rapida = CATALOGO[modelo]
+        nome_api = nome_api or os.getenv("DASHMIGRATE_EXTERNO_MODELO", "")
+        return provedor, (variante_rapida if rapido and variante_rapida else nome_api)
+
+    def rota(self, etapa, modelo=None):
+        # Lista de (provedor, modelo na API) em ordem de preferência
+        modelo = modelo if modelo in CATALOGO else self.modelo_padrao
+        candidatos = []
+        if etapa in self.rotas_fixas:
+            candidatos.append(self._destino(self.rotas_fixas[etapa]))
+        if ETAPAS_LLM[etapa] == "visao":
+            candidatos.append(self._destino(modelo if CATALOGO[modelo][2] else self.modelo_visao))
+        else:
+            candidatos.append(self._destino(modelo, rapido=True))
+            candidatos.append(self._destino(modelo))
+        candidatos.append(self._destino(self.modelo_fallback))
+
+        rota = []
+        for provedor, nome_api in candidatos:
+            if provedor in self.clientes and nome_api and (provedor, nome_api) not in rota:
+                rota.append((provedor, nome_api))
+        return rota
+
+    def completar(self, etapa, mensagens, temperatura, modelo=None, ao_receber=None, forcar=False, formato_json=False):
+        rota = self.rota(etapa, modelo)
+        if not rota:
+            raise ErroLLM(f"Nenhum provedor configurado para o modelo {modelo or self.modelo_padrao!r}")
+        recebidos = []
+
+        def repassar(trecho):
+            recebidos.append(trecho)
+            ao_receber(trecho)
+
+        for indice, (provedor, nome_api) in enumerate(rota):
+            try:
+                return self.clientes[provedor].completar(
+                    mensagens, temperatura, modelo=nome_api,
+                    ao_receber=repassar if ao_receber else None, forcar=forcar, formato_json=formato_json,
+                    etapa=etapa
+                )
+            except ErroLLM:
+                # Depois que parte da resposta já foi exibida, trocar de modelo embaralharia o texto
+                if recebidos or indice == len(rota) - 1:
+                    raise
+                logger.warning("%s/%s falhou na etapa %s; tentando %s", provedor, nome_api, etapa, rota[indice + 1][1])
+
+    def estatisticas(self):
+        totais = {}
+        for cliente in self.clientes.values():
+            for nome, valor in cliente.estatisticas().items():
+                totais[nome] = totais.get(nome, 0) + valor
+        return totais
+
+
+def _cliente_openai(**opcoes):
+    from openai import OpenAI
+
+    return OpenAI(**opcoes)
+
+
+def criar_roteador(cache=None, requisicoes_por_minuto=None, tokens_por_minuto=None, max_simultaneas=8,
+                   modelo_padrao=MODELO_PADRAO, observador=None):
+    clientes = {
+        "openai": ClienteLLM(
+            partial(_cliente_openai, api_key=os.getenv("OPENAI_API_KEY")),
+            requisicoes_por_minuto=requisicoes_por_minuto,
+            tokens_por_minuto=tokens_por_minuto,
+            max_simultaneas=max_simultaneas,
+            cache=cache,
+            observador=observador
+        )
+    }
+    for provedor in {entrada[0] for entrada in CATALOGO.values()} - {"openai"}:
+        prefixo = f"DASHMIGRATE_{provedor.upper()}_"
+        base_url = os.getenv(prefixo + "BASE_URL")
+        if not base_url:
+            continue
+        # Servidores locais não têm cota por minuto, só capacidade de atender em paralelo
+        local = provedor == "local"
+        clientes[provedor] = ClienteLLM(
+            partial(_cliente_openai, api_key=os.getenv(prefixo + "API_KEY", "sem-chave"), base_url=base_url),
+            requisicoes_por_minuto=None if local else requisicoes_por_minuto,
+            tokens_por_minuto=None if local else tokens_por_minuto,
+            max_simultaneas=max_simultaneas,
+            cache=cache,
+            observador=observador
+        )
+
+    def modelo_do_ambiente(variavel):
+        modelo = os.getenv(variavel)
+        if modelo and modelo not in CATALOGO:
+            logger.warning("%s=%r não está no catálogo de modelos e será ignorado", variavel, modelo)
+        return modelo if modelo in CATALOGO else None
+
+    rotas_fixas = {}
+    for etapa in ETAPAS_LLM:
+        modelo = modelo_do_ambiente(f"DASHMIGRATE_MODELO_{etapa.upper()}")
+        if modelo:
+            rotas_fixas[etapa] = modelo
+    return RoteadorLLM(
+        clientes,
+        modelo_padrao=modelo_padrao if modelo_padrao in CATALOGO else MODELO_PADRAO,
+        modelo_visao=modelo_do_ambiente("DASHMIGRATE_MODELO_VISAO") or MODELO_PADRAO,
+        modelo_fallback=modelo_do_ambiente("DASHMIGRATE_MODELO_FALLBACK") or MODELO_PADRAO,
+        rotas_fixas=rotas_fixas
+    )
@@ -0,0 +1,70 @@
+import argparse
+import os
+import statistics
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+from backends_llm import MODELO_PADRAO, criar_roteador
+from extracao_visual import extrair_inventario, extrair_por_tiles
+from imagens import preprocessar_imagem
+from inventario import montar_inventario, normalizar_texto, texto_inventario
+
+# Compara latência e recall da extração em imagem inteira com a extração em mosaico.
+# Uso: python benchmarks/bench_extracao_tiles.py dashboard.png esperado.txt
+# O arquivo esperado.txt lista um componente por linha (ex: "KPI: Receita Total").
+# As chamadas seguem o caminho do app: imagem pré-processada (redução e JPEG), mesmo
+# roteador de backends_llm e resposta em modo JSON; sem cache, para medir o modelo.
+
+
+def recall(esperados, texto):
+    linhas = [normalizar_texto(l) for l in texto.split("\n") if l.strip()]
+    texto_normalizado = normalizar_texto(texto)
+    encontrados = 0
+    for item in esperados:
+        chave = normalizar_texto(item)
+        if chave in texto_normalizado or any(SequenceMatcher(None, chave, l).ratio() >= 0.8 for l in linhas):
+            encontrados += 1
+    return encontrados / len(esperados) if esperados else 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("imagem")
+    parser.add_argument("esperado")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--lado-tile", type=int, default=1024)
+    parser.add_argument("--paralelos", type=int, default=4)
+    parser.add_argument("--modelo", default=MODELO_PADRAO, help="Chave de backends_llm.CATALOGO, como no passo 1 do app")
+    args = parser.parse_args()
+
+    load_dotenv()
+    llm = criar_roteador(max_simultaneas=args.paralelos)
+    completar = lambda mensagens: llm.completar("extracao", mensagens, temperatura=0.3, modelo=args.modelo, formato_json=True)
+    with open(args.imagem, "rb") as f:
+        imagem_bytes = f.read()
+    imagem_processada, mime = preprocessar_imagem(imagem_bytes)
+    with open(args.esperado, encoding="utf-8") as f:
+        esperados = [l.strip() for l in f if l.strip()]
+
+    modos = {
+        "imagem inteira": lambda: extrair_inventario(imagem_processada, mime, completar),
+        "mosaico": lambda: extrair_por_tiles(imagem_bytes, completar, max_paralelos=args.paralelos, lado_tile=args.lado_tile)[0],
+    }
+    print(f"{'modo':<16}{'latência média (s)':>20}{'mín (s)':>10}{'recall':>10}")
+    for nome, executar in modos.items():
+        latencias, recalls = [], []
+        for _ in range(args.repeticoes):
+            inicio = time.perf_counter()
+            texto = texto_inventario(montar_inventario(executar()))
+            latencias.append(time.perf_counter() - inicio)
+            recalls.append(recall(esperados, texto))
+        print(f"{nome:<16}{statistics.mean(latencias):>20.2f}{min(latencias):>10.2f}{statistics.mean(recalls):>10.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import argparse
+import ast
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from estatisticas import percentil
+
+# Mede o cold start do app: cada amostra é um processo Python novo que importa o
+# Streamlit e renderiza uma etapa (a primeira tela por padrão), como um pod recém-criado.
+# Com o perfil de importação (python -X importtime) lista os módulos carregados pela
+# primeira execução do script e acusa dependências pesadas que a etapa não usa.
+# Uso: python benchmarks/bench_inicializacao.py --amostras 10 --etapa 0 --limite 1.0
+# Sai com 1 se o app renderizar outra etapa que não a pedida, se carregar um módulo
+# pesado fora de MODULOS_DA_ETAPA e --permitir ou se passar do limite (p50).
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "dashmigrate_app_v4.py")
+MODULOS_PESADOS = ["pandas", "numpy", "openai", "httpx", "PIL", "pyarrow", "openpyxl", "docx", "reportlab",
+                   "sqlalchemy", "boto3", "azure"]
+# Módulos pesados que cada etapa usa de fato (índice da etapa -> pacotes): st.image sempre
+# importa numpy e PIL, e a validação dos dados lê a base com pandas e pyarrow
+MODULOS_DA_ETAPA = {2: ["numpy", "PIL"], 3: ["numpy", "pandas", "pyarrow"], 5: ["numpy", "PIL"]}
+MARCA_INICIO = "@@primeira_execucao"
+ID_MIGRACAO = "bench0000inicio"
+
+CODIGO_AMOSTRA = """
+import json, os, sys, time
+inicio = time.perf_counter()
+sys.path.insert(0, {raiz!r})
+from streamlit.testing.v1 import AppTest
+importado = time.perf_counter()
+sys.stderr.write({marca!r} + "\\n")
+sys.stderr.flush()
+app = AppTest.from_file({app!r}, default_timeout=60)
+app.query_params["migracao"] = {id_migracao!r}
+antes = time.perf_counter()
+app.run()
+fim = time.perf_counter()
+# O app volta para a etapa 1 (e regrava etapa_atual.json) se o estado da migração estiver incompleto
+with open(os.path.join("data", "migracoes", {id_migracao!r}, "etapa_atual.json"), encoding="utf-8") as f:
+    etapa_renderizada = json.load(f)["indice"]
+print(json.dumps({{"importar_streamlit": importado - inicio, "primeira_execucao": fim - antes,
+                  "etapa_renderizada": etapa_renderizada,
+                  "excecao": str(app.exception[0].message) if app.exception else None}}))
+"""
+PLATAFORMA = {"origem": "MicroStrategy", "versao_origem": "2021", "versao_destino": "2024",
+              "modelo_llm_exibicao": "OpenAI - GPT-4o", "modelo_llm": "gpt-4o"}
+
+
+def nomes_etapas():
+    # Lista `etapas` do app, lida do código-fonte para não importar o Streamlit aqui
+    with open(APP, encoding="utf-8") as f:
+        arvore = ast.parse(f.read())
+    for no in arvore.body:
+        if isinstance(no, ast.Assign) and any(isinstance(alvo, ast.Name) and alvo.id == "etapas" for alvo in no.targets):
+            return ast.literal_eval(no.value)
+    raise SystemExit(f"Lista de etapas não encontrada em {APP}")
+
+
+def preparar_diretorio(etapa):
+    # Diretório de trabalho limpo, com a migração já na etapa pedida: as anteriores
+    # concluídas e a plataforma escolhida, como se o usuário tivesse chegado até ela
+    diretorio = tempfile.mkdtemp(prefix="bench_inicializacao_")
+    shutil.copy(os.path.join(RAIZ, "logo.png"), diretorio)
+    dir_migracao = os.path.join(diretorio, "data", "migracoes", ID_MIGRACAO)
+    os.makedirs(dir_migracao)
+    arquivos = {
+        "etapa_atual.json": {"indice": etapa},
+        "progresso.json": {nome: i < etapa for i, nome in enumerate(nomes_etapas())},
+        "plataforma.json": PLATAFORMA if etapa else {"origem": ""}
+    }
+    for nome, conteudo in arquivos.items():
+        with open(os.path.join(dir_migracao, nome), "w", encoding="utf-8") as f:
+            json.dump(conteudo, f)
+    if etapa:
+        # As etapas seguintes exibem o screenshot enviado na etapa 2
+        shutil.copy(os.path.join(RAIZ, "logo.png"), os.path.join(dir_migracao, "uploaded_image.png"))
+    return diretorio
+
+
+def perfil_importacao(stderr):
+    # Linhas do -X importtime depois da marca: (módulo, nível, tempo acumulado em µs); o
+    # nível vem da indentação do nome e é 0 para os imports feitos direto pelo app
+    modulos, depois_da_marca = [], False
+    for linha in stderr.splitlines():
+        if linha.strip() == MARCA_INICIO:
+            depois_da_marca = True
+            continue
+        if not depois_da_marca or not linha.startswith("import time:") or "|" not in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        if proprio.strip().isdigit():
+            nome = nome.rstrip()[1:]
+            modulos.append((nome.strip(), (len(nome) - len(nome.lstrip())) // 2, int(acumulado)))
+    return modulos
+
+
+def medir_amostra(etapa):
+    diretorio = preparar_diretorio(etapa)
+    try:
+        codigo = CODIGO_AMOSTRA.format(raiz=RAIZ, marca=MARCA_INICIO, app=APP, id_migracao=ID_MIGRACAO)
+        ambiente = {**os.environ, "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-benchmark"),
+                    "STREAMLIT_LOGGER_LEVEL": "error"}
+        inicio = time.perf_counter()
+        processo = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=diretorio, env=ambiente,
+                                  capture_output=True, text=True)
+        total = time.perf_counter() - inicio
+        if processo.returncode != 0:
+            raise SystemExit(f"A amostra falhou:\n{processo.stderr[-2000:]}")
+        resultado = json.loads(processo.stdout.strip().splitlines()[-1])
+        if resultado["excecao"]:
+            raise SystemExit(f"O app falhou na etapa {etapa + 1}: {resultado['excecao']}")
+        if resultado["etapa_renderizada"] != etapa:
+            raise SystemExit(f"Pedida a etapa {etapa + 1}, mas o app renderizou a etapa {resultado['etapa_renderizada'] + 1}")
+        resultado["processo"] = total
+        return resultado, perfil_importacao(processo.stderr)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--amostras", type=int, default=5)
+    parser.add_argument("--etapa", type=int, default=0, help="Índice da etapa renderizada (0 = seleção da plataforma)")
+    parser.add_argument("--permitir", default="", help="Outros módulos pesados aceitos nesta etapa, separados por vírgula")
+    parser.add_argument("--limite", type=float, default=1.0, help="p50 máximo, em segundos, da primeira execução do script")
+    parser.add_argument("--top", type=int, default=15, help="Módulos mais lentos exibidos no perfil de importação")
+    args = parser.parse_args()
+
+    amostras, modulos = [], []
+    for _ in range(args.amostras):
+        resultado, modulos = medir_amostra(args.etapa)
+        amostras.append(resultado)
+
+    print(f"etapa {amostras[0]['etapa_renderizada'] + 1} renderizada, {args.amostras} processos novos")
+    for rotulo, chave in (("processo novo até a primeira tela", "processo"),
+                          ("importar o Streamlit", "importar_streamlit"),
+                          ("primeira execução do script", "primeira_execucao")):
+        valores = [a[chave] for a in amostras]
+        print(f"  {rotulo:<36} p50 {percentil(valores, 50) * 1000:7.1f} ms | p95 {percentil(valores, 95) * 1000:7.1f} ms "
+              f"| média {statistics.mean(valores) * 1000:7.1f} ms")
+
+    # Perfil da última amostra: imports diretos do app, pelo tempo acumulado
+    diretos = [(nome, acumulado) for nome, nivel, acumulado in modulos if nivel == 0]
+    total_importacao = sum(acumulado for _, acumulado in diretos)
+    print(f"\nimportações da primeira execução: {len(modulos)} módulos, {total_importacao / 1000:.1f} ms")
+    for nome, acumulado in sorted(diretos, key=lambda item: -item[1])[:args.top]:
+        print(f"  {nome:<46}{acumulado / 1000:9.1f} ms")
+
+    permitidos = {m.strip() for m in args.permitir.split(",") if m.strip()} | set(MODULOS_DA_ETAPA.get(args.etapa, []))
+    carregados = sorted({nome.split(".")[0] for nome, _, _ in modulos} & (set(MODULOS_PESADOS) - permitidos))
+    falhas = []
+    if carregados:
+        falhas.append(f"módulos pesados carregados: {', '.join(carregados)}")
+    p50 = percentil([a["primeira_execucao"] for a in amostras], 50)
+    if p50 > args.limite:
+        falhas.append(f"primeira execução com p50 de {p50:.2f} s, acima do limite de {args.limite:.2f} s")
+    if falhas:
+        print("\n❌ " + "\n❌ ".join(falhas))
+        raise SystemExit(1)
+    print("\n✅ Nenhum módulo pesado inesperado e dentro do limite")
+
+
+if __name__ == "__main__":
+    main()
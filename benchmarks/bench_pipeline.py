@@ -0,0 +1,417 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from multiprocessing import get_context
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backends_llm import criar_roteador
+from cache_colunar import sondar_com_cache
+from comparacao_visual import comparar_imagens, recortes_divergentes
+from correspondencia import resolver_campos
+from dados_sinteticos import MAX_LINHAS_XLSX, gerar_dataset, gerar_screenshot
+from esquema_dados import gerar_esquema
+from estatisticas import percentil
+from exportacao import montar_pacote_zip, texto_medidas_dax
+from extracao_visual import extrair_inventario, extrair_por_tiles, mensagens_imagem
+from geracao_incremental import gerar_partes, montar_documento, nome_tabela_powerbi, planejar_partes, revisar_medidas
+from imagens import FORMATO_PADRAO, MIME_POR_FORMATO, preprocessar_imagem
+from inventario import campos_componentes, interpretar_resposta, montar_inventario, resumo_componentes
+from prompts import montar_prompt_compatibilidade
+from relatorio import gerar_relatorio_docx, gerar_relatorio_pdf
+from servidor_llm_falso import iniciar_servidor, inventario_falso
+
+# Benchmark do pipeline de migração: roda a lógica de cada etapa (carga da base,
+# extração visual, compatibilidade, roteiro/DAX, comparação e exportação) contra um
+# servidor LLM falso local e dados sintéticos, e informa percentis de latência, pico
+# de memória e vazão. Cada caso roda em um processo novo, e o pico de memória (RSS)
+# é medido acima do uso do processo antes das repetições.
+#
+# Uso:
+#   python benchmarks/bench_pipeline.py --perfil rapido
+#   python benchmarks/bench_pipeline.py --perfil completo --etapas dados,exportacao
+#   python benchmarks/bench_pipeline.py --gravar-baseline        # grava a referência desta máquina
+#   python benchmarks/bench_pipeline.py                           # compara com ela; sai com 1 se regrediu
+#
+# As bases geradas ficam em --dir-dados e são reaproveitadas entre execuções. As
+# referências dependem da máquina e ficam em benchmarks/baselines/<perfil>-<máquina>.json.
+
+PERFIS = {
+    "rapido": {
+        "resolucoes": [(1280, 720), (1920, 1080)],
+        "linhas": [1_000, 100_000],
+        "colunas": [10, 100],
+        "formatos": ["csv", "xlsx", "parquet"],
+        "componentes": [12],
+        "repeticoes": 5
+    },
+    "completo": {
+        "resolucoes": [(1280, 720), (1920, 1080), (2560, 1440), (3840, 2160)],
+        "linhas": [1_000, 100_000, 1_000_000, 10_000_000],
+        "colunas": [10, 500, 5000],
+        "formatos": ["csv", "xlsx", "parquet"],
+        "componentes": [12, 40],
+        "repeticoes": 10
+    }
+}
+ETAPAS = ["dados", "extracao", "compatibilidade", "roteiro", "comparacao", "exportacao"]
+MAX_CELULAS = 200_000_000
+MAX_CELULAS_XLSX = 5_000_000
+# Uma diferença só conta como regressão acima da tolerância relativa e destes mínimos absolutos
+REGRESSAO_MIN_SEGUNDOS = 0.01
+REGRESSAO_MIN_MB = 10
+
+
+def _status_memoria_mb(campo):
+    with open("/proc/self/status") as f:
+        for linha in f:
+            if linha.startswith(campo + ":"):
+                return int(linha.split()[1]) / 1024
+    return 0.0
+
+
+def iniciar_medicao_memoria():
+    # No Linux o pico de RSS (VmHWM) é zerado, para o pico da preparação não esconder o
+    # da medição; nos outros sistemas vale o pico desde o início do processo
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _status_memoria_mb("VmRSS")
+    except OSError:
+        return pico_memoria_mb()
+
+
+def pico_memoria_mb():
+    if os.path.exists("/proc/self/status"):
+        return _status_memoria_mb("VmHWM")
+    import resource
+
+    # ru_maxrss vem em KB no Linux e em bytes no macOS
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024
+
+
+def montar_casos(perfil, etapas, max_celulas):
+    casos, pulados = [], []
+    for etapa in etapas:
+        if etapa == "dados":
+            for formato in perfil["formatos"]:
+                for linhas in perfil["linhas"]:
+                    for colunas in perfil["colunas"]:
+                        limite = MAX_CELULAS_XLSX if formato == "xlsx" else max_celulas
+                        nome = f"dados/{formato}/{linhas}x{colunas}"
+                        if linhas * colunas > limite or (formato == "xlsx" and linhas > MAX_LINHAS_XLSX):
+                            pulados.append(nome)
+                            continue
+                        for cache in ("frio", "quente"):
+                            casos.append({"nome": f"{nome}/{cache}", "etapa": etapa, "formato": formato,
+                                          "linhas": linhas, "colunas": colunas, "cache": cache})
+        elif etapa == "extracao":
+            for largura, altura in perfil["resolucoes"]:
+                for modo in ("inteira", "mosaico"):
+                    casos.append({"nome": f"extracao/{largura}x{altura}/{modo}", "etapa": etapa,
+                                  "largura": largura, "altura": altura, "modo": modo,
+                                  "componentes": perfil["componentes"][0]})
+        elif etapa == "compatibilidade":
+            for colunas in perfil["colunas"]:
+                casos.append({"nome": f"compatibilidade/{colunas}col", "etapa": etapa,
+                              "colunas": colunas, "componentes": perfil["componentes"][0]})
+        elif etapa == "roteiro":
+            for componentes in perfil["componentes"]:
+                casos.append({"nome": f"roteiro/{componentes}comp", "etapa": etapa,
+                              "componentes": componentes, "colunas": perfil["colunas"][0]})
+        elif etapa == "comparacao":
+            for largura, altura in perfil["resolucoes"]:
+                casos.append({"nome": f"comparacao/{largura}x{altura}", "etapa": etapa,
+                              "largura": largura, "altura": altura, "componentes": perfil["componentes"][0]})
+        elif etapa == "exportacao":
+            for largura, altura in perfil["resolucoes"]:
+                for componentes in perfil["componentes"]:
+                    casos.append({"nome": f"exportacao/{largura}x{altura}/{componentes}comp", "etapa": etapa,
+                                  "largura": largura, "altura": altura, "componentes": componentes,
+                                  "colunas": perfil["colunas"][0]})
+    return casos, pulados
+
+
+def _roteador(servidor, config):
+    os.environ["OPENAI_BASE_URL"] = servidor.url
+    os.environ["OPENAI_API_KEY"] = "benchmark"
+    # criar_roteador lê a URL e a chave do ambiente na chamada, não na importação
+    return criar_roteador(max_simultaneas=config["max_chamadas"])
+
+
+def _inventario(componentes, colunas):
+    return montar_inventario(interpretar_resposta(inventario_falso(componentes, colunas)))
+
+
+def _preparar(caso, config, diretorio):
+    # Devolve executar(), que retorna as unidades processadas (linhas, megapixels...),
+    # e o nome da unidade de vazão; o que acontece aqui fora não entra na medição
+    etapa = caso["etapa"]
+    if etapa == "dados":
+        caminho = gerar_dataset(config["dir_dados"], caso["linhas"], caso["colunas"], caso["formato"])
+        dir_cache = os.path.join(diretorio, "cache_colunar")
+        if caso["cache"] == "quente":
+            sondar_com_cache(caminho, dir_cache)
+
+        def executar():
+            # Cache frio: diretório novo a cada repetição, então a conversão para Parquet entra na conta
+            destino = dir_cache if caso["cache"] == "quente" else tempfile.mkdtemp(dir=diretorio)
+            gerar_esquema(sondar_com_cache(caminho, destino), os.path.basename(caminho))
+            return caso["linhas"]
+        return executar, "linhas/s"
+
+    servidor = iniciar_servidor(
+        latencia=config["latencia"], segundos_por_token=config["segundos_por_token"],
+        tokens_resposta=config["tokens_resposta"], componentes=caso["componentes"], colunas=caso.get("colunas", 10)
+    )
+    caso["_servidor"] = servidor
+    llm = _roteador(servidor, config)
+
+    if etapa == "extracao":
+        imagem = gerar_screenshot(caso["largura"], caso["altura"], caso["componentes"])
+        completar = lambda mensagens: llm.completar("extracao", mensagens, 0.3, formato_json=True)
+
+        def executar():
+            if caso["modo"] == "mosaico":
+                componentes, _ = extrair_por_tiles(imagem, completar)
+            else:
+                dados, mime = preprocessar_imagem(imagem)
+                componentes = extrair_inventario(dados, mime, completar)
+            montar_inventario(componentes)
+            return caso["largura"] * caso["altura"] / 1e6
+        return executar, "MP/s"
+
+    if etapa == "compatibilidade":
+        componentes = _inventario(caso["componentes"], caso["colunas"])["componentes"]
+        colunas = [f"coluna_{c:03d}" for c in range(caso["colunas"])]
+        descricao = resumo_componentes(componentes)
+
+        def executar():
+            correspondencias = resolver_campos(campos_componentes(componentes), colunas)
+            mensagens = [{"role": "user", "content": montar_prompt_compatibilidade(descricao, colunas, correspondencias)}]
+            llm.completar("analise", mensagens, 0.2, ao_receber=lambda trecho: None)
+            return caso["colunas"]
+        return executar, "colunas/s"
+
+    if etapa == "roteiro":
+        componentes = _inventario(caso["componentes"], caso["colunas"])["componentes"]
+        colunas = [f"coluna_{c:03d}" for c in range(caso["colunas"])]
+        correspondencias = resolver_campos(campos_componentes(componentes), colunas)
+        tabela = nome_tabela_powerbi("base.csv")
+        completar = lambda etapa_llm, mensagens: llm.completar(etapa_llm, mensagens, 0.2)
+
+        def executar():
+            partes = planejar_partes(componentes, colunas, correspondencias,
+                                     versoes={"origem": "MicroStrategy", "versao_origem": "", "versao_destino": ""},
+                                     tabela=tabela, modelo=None)
+            textos, _ = gerar_partes(partes, {}, completar)
+            textos, _, _ = revisar_medidas(partes, textos, colunas, tabela, completar)
+            montar_documento(partes, textos)
+            return len(partes)
+        return executar, "partes/s"
+
+    if etapa == "comparacao":
+        original = gerar_screenshot(caso["largura"], caso["altura"], caso["componentes"])
+        nova = gerar_screenshot(caso["largura"], caso["altura"], caso["componentes"], alterado=True)
+
+        def executar():
+            resultado = comparar_imagens(original, nova)
+            imagens = [imagem for _, recorte_a, recorte_b in recortes_divergentes(resultado) for imagem in (recorte_a, recorte_b)]
+            if imagens:
+                mensagens = mensagens_imagem("Compare os recortes do original e do Power BI.", *imagens,
+                                             mime=MIME_POR_FORMATO[FORMATO_PADRAO])
+                llm.completar("comparacao", mensagens, 0.3)
+            return caso["largura"] * caso["altura"] / 1e6
+        return executar, "MP/s"
+
+    if etapa == "exportacao":
+        # Roteiro gerado uma vez com o servidor falso; a medição é só da exportação
+        inventario = _inventario(caso["componentes"], caso["colunas"])
+        colunas = [f"coluna_{c:03d}" for c in range(caso["colunas"])]
+        partes = planejar_partes(inventario["componentes"], colunas, {}, versoes={}, tabela=nome_tabela_powerbi("base.csv"), modelo=None)
+        textos, _ = gerar_partes(partes, {}, lambda etapa_llm, mensagens: llm.completar(etapa_llm, mensagens, 0.2))
+        roteiro = montar_documento(partes, textos)
+        caminho_original = os.path.join(diretorio, "original.png")
+        caminho_novo = os.path.join(diretorio, "novo.png")
+        with open(caminho_original, "wb") as f:
+            f.write(gerar_screenshot(caso["largura"], caso["altura"], caso["componentes"]))
+        with open(caminho_novo, "wb") as f:
+            f.write(gerar_screenshot(caso["largura"], caso["altura"], caso["componentes"], alterado=True))
+        dados_relatorio = dict(
+            ocr="\n".join(f"- {c['titulo']}" for c in inventario["componentes"]),
+            roteiro=roteiro,
+            checklist={"comparacao_visual_final": "- Região 1: cores diferentes\n- Região 2: eixo invertido"},
+            progresso={f"Etapa {i}": True for i in range(1, 8)},
+            esquema_dataset={"origem": "base.csv", "total_linhas": 1000, "colunas": [
+                {"nome": c, "tipo": "float64", "nulos": 0.05, "amostras": ["1", "2"]} for c in colunas
+            ]},
+            caminho_img_original=caminho_original,
+            caminho_img_novo=caminho_novo
+        )
+        saidas = [os.path.join(diretorio, nome) for nome in ("relatorio.docx", "relatorio.pdf", "pacote.zip")]
+
+        def executar():
+            gerar_relatorio_docx(saidas[0], **dados_relatorio)
+            gerar_relatorio_pdf(saidas[1], **dados_relatorio)
+            montar_pacote_zip(saidas[2], {"relatorio.docx": saidas[0], "relatorio.pdf": saidas[1]},
+                              {"medidas.dax": texto_medidas_dax(roteiro)})
+            return sum(os.path.getsize(s) for s in saidas) / 1024 / 1024
+        return executar, "MB/s"
+
+    raise ValueError(f"Etapa desconhecida: {etapa}")
+
+
+def executar_caso(caso, config):
+    # Roda no processo filho: prepara, aquece e mede as repetições
+    diretorio = tempfile.mkdtemp(prefix="bench_pipeline_")
+    try:
+        executar, unidade = _preparar(caso, config, diretorio)
+        for _ in range(config["aquecimento"]):
+            executar()
+        memoria_inicial = iniciar_medicao_memoria()
+        servidor = caso.get("_servidor")
+        requisicoes_iniciais = servidor.requisicoes if servidor else 0
+        latencias, unidades = [], 0.0
+        for _ in range(config["repeticoes"]):
+            inicio = time.perf_counter()
+            unidades += executar()
+            latencias.append(time.perf_counter() - inicio)
+        return {
+            "nome": caso["nome"],
+            "repeticoes": len(latencias),
+            "p50": percentil(latencias, 50),
+            "p95": percentil(latencias, 95),
+            "p99": percentil(latencias, 99),
+            "media": statistics.mean(latencias),
+            "pico_memoria_mb": round(max(pico_memoria_mb() - memoria_inicial, 0.0), 1),
+            "vazao": unidades / sum(latencias) if sum(latencias) else 0.0,
+            "unidade_vazao": unidade,
+            "chamadas_llm": ((servidor.requisicoes - requisicoes_iniciais) / len(latencias)) if servidor else 0
+        }
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+
+def comparar_baseline(resultados, baseline, tolerancia):
+    regressoes = []
+    for resultado in resultados:
+        referencia = baseline.get("casos", {}).get(resultado["nome"])
+        if not referencia:
+            continue
+        if (resultado["p50"] > referencia["p50"] * (1 + tolerancia)
+                and resultado["p50"] - referencia["p50"] > REGRESSAO_MIN_SEGUNDOS):
+            regressoes.append(f"{resultado['nome']}: p50 {referencia['p50'] * 1000:.1f} → {resultado['p50'] * 1000:.1f} ms")
+        if (resultado["pico_memoria_mb"] > referencia["pico_memoria_mb"] * (1 + tolerancia)
+                and resultado["pico_memoria_mb"] - referencia["pico_memoria_mb"] > REGRESSAO_MIN_MB):
+            regressoes.append(f"{resultado['nome']}: memória {referencia['pico_memoria_mb']:.0f} → {resultado['pico_memoria_mb']:.0f} MB")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline de migração com LLM falso e dados sintéticos")
+    parser.add_argument("--perfil", choices=sorted(PERFIS), default="rapido")
+    parser.add_argument("--etapas", default=",".join(ETAPAS), help=f"Lista separada por vírgulas entre {', '.join(ETAPAS)}")
+    parser.add_argument("--filtro", default="", help="Roda só os casos cujo nome contém este texto")
+    parser.add_argument("--repeticoes", type=int, help="Padrão: o do perfil")
+    parser.add_argument("--aquecimento", type=int, default=1)
+    parser.add_argument("--latencia", type=float, default=0.05, help="Segundos até o primeiro token no LLM falso")
+    parser.add_argument("--segundos-por-token", type=float, default=0.0)
+    parser.add_argument("--tokens-resposta", type=int, default=200)
+    parser.add_argument("--max-chamadas", type=int, default=8)
+    parser.add_argument("--max-celulas", type=int, default=MAX_CELULAS, help="Bases com mais células são puladas")
+    parser.add_argument("--dir-dados", default=os.path.join(tempfile.gettempdir(), "dashmigrate_bench_dados"))
+    parser.add_argument("--baseline", help="Padrão: benchmarks/baselines/<perfil>-<máquina>.json")
+    parser.add_argument("--gravar-baseline", action="store_true")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Aumento relativo aceito antes de acusar regressão")
+    parser.add_argument("--saida-json", help="Grava os resultados desta execução")
+    args = parser.parse_args()
+
+    perfil = PERFIS[args.perfil]
+    etapas = [e.strip() for e in args.etapas.split(",") if e.strip()]
+    desconhecidas = set(etapas) - set(ETAPAS)
+    if desconhecidas:
+        parser.error(f"Etapas desconhecidas: {', '.join(sorted(desconhecidas))}")
+    casos, pulados = montar_casos(perfil, etapas, args.max_celulas)
+    casos = [c for c in casos if args.filtro in c["nome"]]
+    config = {
+        "repeticoes": args.repeticoes or perfil["repeticoes"], "aquecimento": args.aquecimento,
+        "latencia": args.latencia, "segundos_por_token": args.segundos_por_token,
+        "tokens_resposta": args.tokens_resposta, "max_chamadas": args.max_chamadas,
+        "dir_dados": args.dir_dados
+    }
+    for nome in pulados:
+        print(f"⏭️  {nome}: acima do limite de células (--max-celulas) ou de linhas do Excel")
+
+    # As bases são geradas antes, fora da medição, e reaproveitadas nas próximas execuções
+    for caso in casos:
+        if caso["etapa"] == "dados":
+            gerar_dataset(args.dir_dados, caso["linhas"], caso["colunas"], caso["formato"])
+
+    print(f"{'caso':<44}{'p50 (ms)':>11}{'p95 (ms)':>11}{'p99 (ms)':>11}{'pico (MB)':>11}{'vazão':>21}{'LLM':>6}")
+    resultados = []
+    for caso in casos:
+        # spawn: processo limpo por caso, sem herdar a memória do processo pai
+        with ProcessPoolExecutor(max_workers=1, mp_context=get_context("spawn")) as executor:
+            resultado = executor.submit(executar_caso, caso, config).result()
+        resultados.append(resultado)
+        print(f"{resultado['nome']:<44}{resultado['p50'] * 1000:>11.1f}{resultado['p95'] * 1000:>11.1f}"
+              f"{resultado['p99'] * 1000:>11.1f}{resultado['pico_memoria_mb']:>11.1f}"
+              f"{resultado['vazao']:>10.1f} {resultado['unidade_vazao']:<10}{resultado['chamadas_llm']:>6.0f}")
+
+    execucao = {
+        "perfil": args.perfil,
+        "maquina": platform.node(),
+        "python": platform.python_version(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in config.items() if k != "dir_dados"},
+        "casos": {r["nome"]: r for r in resultados}
+    }
+    if args.saida_json:
+        with open(args.saida_json, "w", encoding="utf-8") as f:
+            json.dump(execucao, f, ensure_ascii=False, indent=2)
+
+    caminho_baseline = args.baseline or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "baselines", f"{args.perfil}-{platform.node() or 'local'}.json"
+    )
+    if args.gravar_baseline:
+        # Casos que não rodaram agora (por --etapas ou --filtro) continuam na referência
+        anterior = {}
+        if os.path.exists(caminho_baseline):
+            with open(caminho_baseline, encoding="utf-8") as f:
+                anterior = json.load(f).get("casos", {})
+        execucao["casos"] = {**anterior, **execucao["casos"]}
+        os.makedirs(os.path.dirname(caminho_baseline), exist_ok=True)
+        with open(caminho_baseline, "w", encoding="utf-8") as f:
+            json.dump(execucao, f, ensure_ascii=False, indent=2)
+        print(f"\n📌 Referência gravada em {caminho_baseline}")
+        return
+
+    if not os.path.exists(caminho_baseline):
+        print(f"\nSem referência em {caminho_baseline}; use --gravar-baseline para criar uma.")
+        return
+    with open(caminho_baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("config") != execucao["config"]:
+        print("\n⚠️ A referência foi gravada com outra configuração (repetições, latência ou tokens do LLM falso)")
+    regressoes = comparar_baseline(resultados, baseline, args.tolerancia)
+    if regressoes:
+        print(f"\n❌ {len(regressoes)} regressões acima de {args.tolerancia:.0%} em relação a {caminho_baseline}:")
+        for regressao in regressoes:
+            print(f"  - {regressao}")
+        raise SystemExit(1)
+    print(f"\n✅ Sem regressões em relação a {caminho_baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+
+from streamlit.testing.v1 import AppTest
+
+from estatisticas import percentil
+
+# Mede a latência de um rerun do app (o que o usuário sente a cada clique).
+# Roda o script em um diretório temporário para não tocar em data/ e output/.
+# Uso: python benchmarks/bench_rerun.py --reruns 50
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(RAIZ, "dashmigrate_app_v4.py")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=30)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark")
+    diretorio = tempfile.mkdtemp(prefix="bench_rerun_")
+    shutil.copy(os.path.join(RAIZ, "logo.png"), diretorio)
+    os.chdir(diretorio)
+    sys.path.insert(0, RAIZ)
+
+    app = AppTest.from_file(APP, default_timeout=60)
+    inicio = time.perf_counter()
+    app.run()
+    primeira = time.perf_counter() - inicio
+    if app.exception:
+        raise SystemExit(f"O app falhou: {app.exception}")
+
+    latencias = []
+    for _ in range(args.reruns):
+        inicio = time.perf_counter()
+        app.run()
+        latencias.append(time.perf_counter() - inicio)
+
+    print(f"primeira execução: {primeira * 1000:.1f} ms")
+    print(f"reruns ({args.reruns}): média {statistics.mean(latencias) * 1000:.1f} ms | "
+          f"p50 {percentil(latencias, 50) * 1000:.1f} ms | p95 {percentil(latencias, 95) * 1000:.1f} ms")
+    shutil.rmtree(diretorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import io
+import os
+
+import numpy as np
+
+# Screenshots e bases sintéticas para os benchmarks, sempre iguais para a mesma
+# semente. As bases são escritas em blocos, então 10M de linhas não precisam caber
+# em memória, e ficam guardadas em disco (o nome do arquivo carrega os parâmetros)
+# para não serem geradas de novo a cada execução.
+
+CELULAS_POR_BLOCO = 2_000_000
+MAX_LINHAS_XLSX = 1_048_575
+CATEGORIAS = np.array(["Norte", "Sul", "Leste", "Oeste", "Centro", "Exterior"], dtype=object)
+
+
+def gerar_screenshot(largura, altura, componentes=12, semente=0, alterado=False):
+    # Dashboard em grade: cartões com título e barras; alterado=True muda título e barras de
+    # alguns cartões, como um dashboard recriado que ficou diferente do original
+    from PIL import Image, ImageDraw
+
+    aleatorio = np.random.default_rng(semente)
+    imagem = Image.new("RGB", (largura, altura), (245, 246, 248))
+    desenho = ImageDraw.Draw(imagem)
+    colunas_grade = 4
+    linhas_grade = (componentes + colunas_grade - 1) // colunas_grade
+    margem = max(largura // 100, 4)
+    largura_cartao = (largura - margem) // colunas_grade - margem
+    altura_cartao = (altura - margem) // linhas_grade - margem
+    for i in range(componentes):
+        linha, coluna = divmod(i, colunas_grade)
+        x0 = margem + coluna * (largura_cartao + margem)
+        y0 = margem + linha * (altura_cartao + margem)
+        desenho.rectangle([x0, y0, x0 + largura_cartao, y0 + altura_cartao], fill="white", outline=(210, 210, 210))
+        mudou = alterado and i % 3 == 0
+        # "Texto" do título como blocos cinza, para o codificador ter bordas finas como em telas reais
+        xt = x0 + largura_cartao // 2 - 8 if mudou else x0 + 8
+        desenho.rectangle([xt, y0 + 8, xt + largura_cartao // 2, y0 + 8 + altura_cartao // 12], fill=(90, 90, 90))
+        alturas = aleatorio.uniform(0.1, 0.9, 8)
+        cor = (31, 119, 180)
+        if mudou:
+            alturas, cor = alturas[::-1], (230, 120, 30)
+        largura_barra = largura_cartao // 12
+        base = y0 + altura_cartao - 10
+        for j, fracao in enumerate(alturas):
+            bx = x0 + 12 + j * (largura_barra + 4)
+            desenho.rectangle([bx, base - int(fracao * altura_cartao * 0.7), bx + largura_barra, base], fill=cor)
+    saida = io.BytesIO()
+    imagem.save(saida, format="PNG")
+    return saida.getvalue()
+
+
+def _bloco(aleatorio, inicio, linhas, colunas):
+    # Tipos em rodízio: inteiro, decimal com nulos, categoria e data
+    import pandas as pd
+
+    dados = {}
+    for c in range(colunas):
+        nome = f"coluna_{c:03d}"
+        tipo = c % 4
+        if tipo == 0:
+            dados[nome] = np.arange(inicio, inicio + linhas, dtype=np.int64) * (c + 1)
+        elif tipo == 1:
+            valores = aleatorio.normal(1000, 250, linhas).round(2)
+            valores[aleatorio.random(linhas) < 0.05] = np.nan
+            dados[nome] = valores
+        elif tipo == 2:
+            dados[nome] = CATEGORIAS[aleatorio.integers(0, len(CATEGORIAS), linhas)]
+        else:
+            dados[nome] = pd.Timestamp("2024-01-01") + pd.to_timedelta(aleatorio.integers(0, 730, linhas), unit="D")
+    return pd.DataFrame(dados)
+
+
+def _blocos(linhas, colunas, semente):
+    aleatorio = np.random.default_rng(semente)
+    tamanho = max(1, CELULAS_POR_BLOCO // colunas)
+    for inicio in range(0, linhas, tamanho):
+        yield _bloco(aleatorio, inicio, min(tamanho, linhas - inicio), colunas)
+
+
+def caminho_dataset(diretorio, linhas, colunas, formato, semente=0):
+    return os.path.join(diretorio, f"base_{linhas}x{colunas}_s{semente}.{formato}")
+
+
+def gerar_dataset(diretorio, linhas, colunas, formato, semente=0):
+    # Devolve o caminho da base, gerando-a só se ainda não existir
+    caminho = caminho_dataset(diretorio, linhas, colunas, formato, semente)
+    if os.path.exists(caminho):
+        return caminho
+    if formato == "xlsx" and linhas > MAX_LINHAS_XLSX:
+        raise ValueError(f"Planilhas .xlsx têm no máximo {MAX_LINHAS_XLSX} linhas de dados")
+    os.makedirs(diretorio, exist_ok=True)
+    temporario = caminho + ".tmp"
+
+    if formato == "csv":
+        with open(temporario, "w", encoding="utf-8", newline="") as f:
+            for n, bloco in enumerate(_blocos(linhas, colunas, semente)):
+                bloco.to_csv(f, header=n == 0, index=False)
+    elif formato == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        escritor = None
+        try:
+            for bloco in _blocos(linhas, colunas, semente):
+                tabela = pa.Table.from_pandas(bloco, preserve_index=False)
+                if escritor is None:
+                    escritor = pq.ParquetWriter(temporario, tabela.schema)
+                escritor.write_table(tabela)
+        finally:
+            if escritor is not None:
+                escritor.close()
+    elif formato == "xlsx":
+        from openpyxl import Workbook
+
+        # write_only grava as linhas em streaming, sem montar a planilha em memória
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append([f"coluna_{c:03d}" for c in range(colunas)])
+        for bloco in _blocos(linhas, colunas, semente):
+            for linha in bloco.astype(object).where(bloco.notna(), None).itertuples(index=False):
+                ws.append([v.to_pydatetime() if hasattr(v, "to_pydatetime") else v for v in linha])
+        wb.save(temporario)
+    else:
+        raise ValueError(f"Formato não suportado: {formato}")
+    os.replace(temporario, caminho)
+    return caminho
@@ -0,0 +1,7 @@
+# Funções compartilhadas pelos benchmarks
+
+
+def percentil(valores, p):
+    # Percentil pelo vizinho mais próximo, sem interpolação
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round(p / 100 * (len(ordenados) - 1))))]
@@ -0,0 +1,175 @@
+import argparse
+import hashlib
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Servidor falso compatível com a API de chat da OpenAI (/v1/chat/completions), para
+# benchmarks e ensaios locais sem rede e sem custo. As respostas são determinísticas:
+# dependem só do pedido (modo JSON, streaming) e da configuração — latência até o
+# primeiro token, tempo por token e tamanho da resposta. As primeiras `falhas`
+# requisições podem ser recusadas com `status_falha` (429, 503...) e retry-after,
+# para ensaiar limites de taxa e novas tentativas.
+# Uso: python benchmarks/servidor_llm_falso.py --porta 8765 --latencia 0.5 --tokens-resposta 400
+# e, no app ou no lote, OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=x
+
+TIPOS_COMPONENTE = ["grafico", "kpi", "tabela", "filtro", "grafico", "kpi"]
+VISUAIS = {"grafico": "barras", "kpi": "cartão", "tabela": "tabela", "filtro": "lista"}
+TOKENS_POR_TRECHO = 8
+
+
+def inventario_falso(componentes, colunas=10):
+    # Componentes em grade 4 x n, com campos que existem nas bases sintéticas
+    itens = []
+    for i in range(componentes):
+        tipo = TIPOS_COMPONENTE[i % len(TIPOS_COMPONENTE)]
+        linha, coluna = divmod(i, 4)
+        linhas_grade = (componentes + 3) // 4
+        x0, y0 = coluna * 250, linha * 1000 // linhas_grade
+        itens.append({
+            "tipo": tipo,
+            "titulo": f"{tipo.capitalize()} {i + 1}",
+            "visual": VISUAIS[tipo],
+            "campos": [f"coluna_{(i + j) % colunas:03d}" for j in range(2)],
+            "filtros": [f"coluna_{(i + 2) % colunas:03d}"] if tipo != "filtro" else [],
+            "caixa": [x0 + 10, y0 + 10, x0 + 240, y0 + 1000 // linhas_grade - 10]
+        })
+    return json.dumps({"componentes": itens}, ensure_ascii=False)
+
+
+def texto_falso(pedido, tokens):
+    # Texto markdown com uma medida DAX válida; o nome vem do prompt para as partes não colidirem
+    sufixo = hashlib.sha256(json.dumps(pedido["messages"], sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    corpo = " ".join(f"palavra{i % 50}" for i in range(max(tokens - 20, 0)))
+    return f"### Passos\n\n- {corpo}\n\n```dax\nMedida_{sufixo} = 1\n```\n"
+
+
+class ServidorLLMFalso(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, endereco, latencia=0.0, segundos_por_token=0.0, tokens_resposta=200, componentes=12, colunas=10,
+                 falhas=0, status_falha=429, retry_after=None, retry_after_ms=None):
+        super().__init__(endereco, _Requisicao)
+        self.latencia = latencia
+        self.segundos_por_token = segundos_por_token
+        self.tokens_resposta = tokens_resposta
+        self.componentes = componentes
+        self.colunas = colunas
+        self.falhas = falhas
+        self.status_falha = status_falha
+        self.retry_after = retry_after
+        self.retry_after_ms = retry_after_ms
+        self.requisicoes = 0
+        self._trava = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}/v1"
+
+
+class _Requisicao(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _enviar(self, corpo, tipo="application/json", status=200, cabecalhos=None):
+        dados = corpo.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def _recusar(self, servidor):
+        cabecalhos = {}
+        if servidor.retry_after is not None:
+            cabecalhos["retry-after"] = str(servidor.retry_after)
+        if servidor.retry_after_ms is not None:
+            cabecalhos["retry-after-ms"] = str(servidor.retry_after_ms)
+        erro = {"message": f"Falha injetada ({servidor.status_falha})", "type": "falha_injetada", "code": str(servidor.status_falha)}
+        self._enviar(json.dumps({"error": erro}), status=servidor.status_falha, cabecalhos=cabecalhos)
+
+    def do_POST(self):
+        servidor = self.server
+        pedido = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with servidor._trava:
+            servidor.requisicoes += 1
+            falhar = servidor.requisicoes <= servidor.falhas
+        if falhar:
+            self._recusar(servidor)
+            return
+        if pedido.get("response_format", {}).get("type") == "json_object":
+            conteudo = inventario_falso(servidor.componentes, servidor.colunas)
+        else:
+            conteudo = texto_falso(pedido, servidor.tokens_resposta)
+        uso = {
+            "prompt_tokens": len(json.dumps(pedido["messages"])) // 4,
+            "completion_tokens": servidor.tokens_resposta,
+            "total_tokens": len(json.dumps(pedido["messages"])) // 4 + servidor.tokens_resposta
+        }
+        base = {"id": "chatcmpl-falso", "created": 0, "model": pedido["model"]}
+        time.sleep(servidor.latencia)
+
+        if not pedido.get("stream"):
+            time.sleep(servidor.segundos_por_token * servidor.tokens_resposta)
+            self._enviar(json.dumps({
+                **base, "object": "chat.completion", "usage": uso,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}]
+            }))
+            return
+
+        # Streaming em trechos de TOKENS_POR_TRECHO palavras, com o uso no último evento
+        palavras = conteudo.split(" ")
+        eventos = []
+        for i in range(0, len(palavras), TOKENS_POR_TRECHO):
+            trecho = " ".join(palavras[i:i + TOKENS_POR_TRECHO]) + (" " if i + TOKENS_POR_TRECHO < len(palavras) else "")
+            eventos.append({**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": trecho}, "finish_reason": None}]})
+        eventos.append({**base, "object": "chat.completion.chunk", "choices": [], "usage": uso})
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        espera_trecho = servidor.segundos_por_token * servidor.tokens_resposta / max(len(eventos) - 1, 1)
+        for evento in eventos:
+            dados = f"data: {json.dumps(evento, ensure_ascii=False)}\n\n".encode("utf-8")
+            self.wfile.write(f"{len(dados):x}\r\n".encode() + dados + b"\r\n")
+            time.sleep(espera_trecho)
+        fim = b"data: [DONE]\n\n"
+        self.wfile.write(f"{len(fim):x}\r\n".encode() + fim + b"\r\n0\r\n\r\n")
+
+
+def iniciar_servidor(porta=0, **configuracao):
+    # porta=0 escolhe uma porta livre; o servidor roda em uma thread daemon
+    servidor = ServidorLLMFalso(("127.0.0.1", porta), **configuracao)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor LLM falso e determinístico compatível com a OpenAI")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia", type=float, default=0.5, help="Segundos até o primeiro token")
+    parser.add_argument("--segundos-por-token", type=float, default=0.0)
+    parser.add_argument("--tokens-resposta", type=int, default=200)
+    parser.add_argument("--componentes", type=int, default=12, help="Componentes devolvidos na extração (modo JSON)")
+    parser.add_argument("--colunas", type=int, default=10, help="Colunas coluna_000... citadas nos campos dos componentes")
+    parser.add_argument("--falhas", type=int, default=0, help="Recusa as primeiras N requisições")
+    parser.add_argument("--status-falha", type=int, default=429)
+    parser.add_argument("--retry-after", type=float, help="Segundos enviados no cabeçalho retry-after das recusas")
+    args = parser.parse_args()
+
+    servidor = ServidorLLMFalso(
+        ("127.0.0.1", args.porta), latencia=args.latencia, segundos_por_token=args.segundos_por_token,
+        tokens_resposta=args.tokens_resposta, componentes=args.componentes, colunas=args.colunas,
+        falhas=args.falhas, status_falha=args.status_falha, retry_after=args.retry_after
+    )
+    print(f"Servidor LLM falso em {servidor.url}")
+    servidor.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import importlib.util
+import os
+import re
+import tempfile
+
+from esquema_dados import LINHAS_PREVIEW, colunas_cabecalho, sondar_arquivo, sondar_parquet
+from estado import hash_arquivo
+
+# Cache colunar das bases enviadas: na primeira carga o CSV/XLSX é convertido uma
+# única vez para Parquet, em blocos (memória limitada mesmo em planilhas de vários
+# GB), e guardado pelo hash do conteúdo. Cargas seguintes, pré-visualização e
+# perfil do esquema leem o Parquet mapeado em memória. Sem pyarrow, cai na
+# sondagem direta do arquivo original.
+
+LINHAS_POR_BLOCO = 50_000
+BYTES_POR_BLOCO_CSV = 16 * 1024 * 1024
+EXTENSOES_CONVERTIDAS = {".csv", ".xlsx"}
+
+
+class _ColunaMista(Exception):
+    # Uma coluna mudou de tipo depois do primeiro bloco; a conversão recomeça com ela como texto
+    def __init__(self, coluna):
+        super().__init__(coluna)
+        self.coluna = coluna
+
+
+def caminho_cache(diretorio_cache, hash_conteudo):
+    return os.path.join(diretorio_cache, f"{hash_conteudo}.parquet")
+
+
+def _csv_para_parquet(caminho, destino, como_texto):
+    import pyarrow as pa
+    import pyarrow.csv as pv
+    import pyarrow.parquet as pq
+
+    leitor = pv.open_csv(
+        caminho,
+        read_options=pv.ReadOptions(block_size=BYTES_POR_BLOCO_CSV),
+        convert_options=pv.ConvertOptions(column_types={c: pa.string() for c in como_texto})
+    )
+    try:
+        with pq.ParquetWriter(destino, leitor.schema) as escritor:
+            for lote in leitor:
+                escritor.write_batch(lote)
+    except pa.ArrowInvalid as e:
+        # O tipo de cada coluna é inferido no primeiro bloco
+        coluna = re.search(r"CSV column #(\d+)", str(e))
+        if not coluna:
+            raise
+        raise _ColunaMista(leitor.schema.names[int(coluna.group(1))]) from e
+
+
+def _blocos(linhas, tamanho):
+    bloco = []
+    for linha in linhas:
+        bloco.append(linha)
+        if len(bloco) == tamanho:
+            yield bloco
+            bloco = []
+    if bloco:
+        yield bloco
+
+
+def _excel_para_parquet(caminho, destino, como_texto):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from openpyxl import load_workbook
+
+    # Modo read-only: as linhas são lidas em streaming e gravadas em blocos
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    escritor = None
+    try:
+        linhas = wb.worksheets[0].iter_rows(values_only=True)
+        colunas = colunas_cabecalho(next(linhas, ()))
+        for bloco in _blocos(linhas, LINHAS_POR_BLOCO):
+            largura = len(colunas)
+            valores = list(zip(*[tuple(linha[:largura]) + (None,) * (largura - len(linha)) for linha in bloco]))
+            arrays = []
+            for i, coluna in enumerate(colunas):
+                tipo = escritor.schema.field(i).type if escritor else None
+                if coluna in como_texto:
+                    tipo = pa.string()
+                    valores[i] = [None if v is None else str(v) for v in valores[i]]
+                elif tipo is not None and pa.types.is_null(tipo) and any(v is not None for v in valores[i]):
+                    raise _ColunaMista(coluna)
+                try:
+                    arrays.append(pa.array(valores[i], type=tipo))
+                except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError) as e:
+                    raise _ColunaMista(coluna) from e
+            tabela = pa.Table.from_arrays(arrays, names=colunas)
+            if escritor is None:
+                escritor = pq.ParquetWriter(destino, tabela.schema)
+            escritor.write_table(tabela)
+        if escritor is None:
+            # Planilha só com cabeçalho
+            escritor = pq.ParquetWriter(destino, pa.schema([(c, pa.string()) for c in colunas]))
+    finally:
+        if escritor is not None:
+            escritor.close()
+        wb.close()
+
+
+def converter_para_parquet(caminho, destino):
+    extensao = os.path.splitext(caminho)[1].lower()
+    conversor = _csv_para_parquet if extensao == ".csv" else _excel_para_parquet
+    diretorio = os.path.dirname(destino) or "."
+    os.makedirs(diretorio, exist_ok=True)
+    como_texto = set()
+    while True:
+        fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".tmp-", suffix=".parquet")
+        os.close(fd)
+        try:
+            conversor(caminho, temporario, como_texto)
+            os.replace(temporario, destino)
+            return destino
+        except _ColunaMista as e:
+            if e.coluna in como_texto:
+                raise
+            como_texto.add(e.coluna)
+        finally:
+            if os.path.exists(temporario):
+                os.unlink(temporario)
+
+
+def sondar_com_cache(caminho, diretorio_cache, hash_conteudo=None, linhas=LINHAS_PREVIEW):
+    # hash_conteudo pode vir do upload (calculado durante a cópia); senão o arquivo é lido uma vez
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao not in EXTENSOES_CONVERTIDAS:
+        return sondar_arquivo(caminho, linhas)
+    if importlib.util.find_spec("pyarrow") is None:
+        return sondar_arquivo(caminho, linhas)
+    destino = caminho_cache(diretorio_cache, hash_conteudo or hash_arquivo(caminho))
+    if not os.path.exists(destino):
+        converter_para_parquet(caminho, destino)
+    return sondar_parquet(destino, linhas)
@@ -0,0 +1,126 @@
+import base64
+import contextlib
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Cache persistente das respostas do LLM, endereçado pelo conteúdo da requisição.
+# O índice fica em SQLite (modo WAL), que pode ser compartilhado com segurança
+# por vários processos do Streamlit no mesmo host.
+
+TAMANHO_MAX_PADRAO = 256 * 1024 * 1024
+IDADE_MAX_PADRAO = 30 * 24 * 3600
+
+
+def _hash_bytes(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+
+def _normalizar_parte(parte):
+    if isinstance(parte, str):
+        return {"type": "text", "text": parte}
+    if parte.get("type") == "image_url":
+        url = parte["image_url"]["url"]
+        if url.startswith("data:") and "," in url:
+            # Imagens embutidas entram na chave apenas pelo hash dos bytes
+            return {"type": "image", "sha256": _hash_bytes(base64.b64decode(url.split(",", 1)[1]))}
+        return {"type": "image", "url": url}
+    return parte
+
+
+def chave_requisicao(modelo, temperatura, mensagens, formato_json=False):
+    # Tudo o que muda a resposta entra na chave: o modo JSON responde outro texto ao mesmo prompt
+    normalizadas = []
+    for mensagem in mensagens:
+        conteudo = mensagem["content"]
+        if isinstance(conteudo, list):
+            conteudo = [_normalizar_parte(p) for p in conteudo]
+        normalizadas.append({"role": mensagem["role"], "content": conteudo})
+    payload = json.dumps(
+        {"modelo": modelo, "temperatura": temperatura, "formato_json": bool(formato_json), "mensagens": normalizadas},
+        sort_keys=True, ensure_ascii=False
+    )
+    return _hash_bytes(payload.encode("utf-8"))
+
+
+class CacheLLM:
+    def __init__(self, diretorio, tamanho_max_bytes=TAMANHO_MAX_PADRAO, idade_max_segundos=IDADE_MAX_PADRAO):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, "cache_llm.sqlite")
+        self.tamanho_max_bytes = tamanho_max_bytes
+        self.idade_max_segundos = idade_max_segundos
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS respostas (
+                    chave TEXT PRIMARY KEY,
+                    conteudo TEXT NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    ultimo_acesso REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acesso ON respostas (ultimo_acesso)")
+            conn.execute("CREATE TABLE IF NOT EXISTS estatisticas (nome TEXT PRIMARY KEY, valor INTEGER NOT NULL)")
+            conn.execute("INSERT OR IGNORE INTO estatisticas VALUES ('hits', 0), ('misses', 0)")
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _contar(self, conn, nome):
+        conn.execute("UPDATE estatisticas SET valor = valor + 1 WHERE nome = ?", (nome,))
+
+    def obter(self, chave):
+        agora = time.time()
+        with self._conectar() as conn:
+            linha = conn.execute(
+                "SELECT conteudo, criado_em FROM respostas WHERE chave = ?", (chave,)
+            ).fetchone()
+            if linha is None or agora - linha[1] > self.idade_max_segundos:
+                self._contar(conn, "misses")
+                return None
+            conn.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (agora, chave))
+            self._contar(conn, "hits")
+            return linha[0]
+
+    def guardar(self, chave, conteudo):
+        agora = time.time()
+        tamanho = len(conteudo.encode("utf-8"))
+        with self._conectar() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO respostas VALUES (?, ?, ?, ?, ?)",
+                (chave, conteudo, tamanho, agora, agora)
+            )
+            self._expurgar(conn, agora)
+
+    def _expurgar(self, conn, agora):
+        conn.execute("DELETE FROM respostas WHERE criado_em < ?", (agora - self.idade_max_segundos,))
+        total = conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.tamanho_max_bytes:
+            return
+        # Remove as entradas menos usadas recentemente até caber no limite
+        removidas = []
+        for chave, tamanho in conn.execute("SELECT chave, tamanho FROM respostas ORDER BY ultimo_acesso"):
+            if total <= self.tamanho_max_bytes:
+                break
+            removidas.append((chave,))
+            total -= tamanho
+        conn.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+
+    def estatisticas(self):
+        with self._conectar() as conn:
+            contadores = dict(conn.execute("SELECT nome, valor FROM estatisticas"))
+            entradas, tamanho = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM respostas"
+            ).fetchone()
+        return {"hits": contadores.get("hits", 0), "misses": contadores.get("misses", 0),
+                "entradas": entradas, "tamanho_bytes": tamanho}
@@ -0,0 +1,281 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+from cache_llm import chave_requisicao
+
+# Cliente LLM compartilhado por todas as sessões do processo: limita requisições
+# e tokens por minuto (token bucket), refaz chamadas com backoff exponencial
+# respeitando retry-after, junta chamadas idênticas em andamento (single-flight)
+# e contabiliza latência e tokens de cada chamada. Cada chamada (inclusive acertos
+# de cache, coalescidas e falhas) também é entregue ao observador, quando houver.
+# O SDK da OpenAI só é importado e o cliente HTTP só é criado na primeira chamada,
+# então montar o cliente não pesa na abertura do app.
+
+logger = logging.getLogger(__name__)
+
+TOKENS_POR_IMAGEM = 1000
+RESERVA_RESPOSTA = 1000
+
+
+def erros_temporarios():
+    import openai
+
+    return (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+
+class ErroLLM(Exception):
+    pass
+
+
+class BaldeTokens:
+    def __init__(self, capacidade_por_minuto):
+        self.capacidade = capacidade_por_minuto
+        self.disponivel = capacidade_por_minuto
+        self.taxa = capacidade_por_minuto / 60
+        self.atualizado = time.monotonic()
+        self.trava = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.disponivel = min(self.capacidade, self.disponivel + (agora - self.atualizado) * self.taxa)
+        self.atualizado = agora
+
+    def consumir(self, quantidade):
+        quantidade = min(quantidade, self.capacidade)
+        while True:
+            with self.trava:
+                self._repor()
+                if self.disponivel >= quantidade:
+                    self.disponivel -= quantidade
+                    return
+                espera = (quantidade - self.disponivel) / self.taxa
+            time.sleep(espera)
+
+    def ajustar(self, diferenca):
+        # Corrige a estimativa com o consumo real; o saldo pode ficar negativo
+        with self.trava:
+            self._repor()
+            self.disponivel -= diferenca
+
+
+def estimar_tokens(mensagens):
+    caracteres, imagens = 0, 0
+    for mensagem in mensagens:
+        conteudo = mensagem["content"]
+        if isinstance(conteudo, str):
+            caracteres += len(conteudo)
+            continue
+        for parte in conteudo:
+            if parte.get("type") == "image_url":
+                imagens += 1
+            else:
+                caracteres += len(parte.get("text", ""))
+    return caracteres // 4 + imagens * TOKENS_POR_IMAGEM
+
+
+def tamanho_payload(mensagens):
+    # Bytes de texto e de imagens (data URLs em base64) enviados na requisição
+    total = 0
+    for mensagem in mensagens:
+        conteudo = mensagem["content"]
+        partes = [{"text": conteudo}] if isinstance(conteudo, str) else conteudo
+        for parte in partes:
+            texto = parte["image_url"]["url"] if parte.get("type") == "image_url" else parte.get("text", "")
+            total += len(texto.encode("utf-8"))
+    return total
+
+
+def _espera_retry_after(erro):
+    resposta = getattr(erro, "response", None)
+    if resposta is None:
+        return None
+    cabecalhos = resposta.headers
+    try:
+        if cabecalhos.get("retry-after-ms"):
+            return float(cabecalhos["retry-after-ms"]) / 1000
+        if cabecalhos.get("retry-after"):
+            return float(cabecalhos["retry-after"])
+    except ValueError:
+        return None
+    return None
+
+
+class ClienteLLM:
+    def __init__(self, criar_client, requisicoes_por_minuto=None, tokens_por_minuto=None, max_simultaneas=8,
+                 max_tentativas=6, espera_base=1.0, espera_maxima=60.0, cache=None, observador=None):
+        # criar_client() devolve o cliente do SDK (openai.OpenAI ou compatível)
+        self._criar_client = criar_client
+        self._client = None
+        self.balde_requisicoes = BaldeTokens(requisicoes_por_minuto) if requisicoes_por_minuto else None
+        self.balde_tokens = BaldeTokens(tokens_por_minuto) if tokens_por_minuto else None
+        self.semaforo = threading.BoundedSemaphore(max_simultaneas)
+        self.max_tentativas = max_tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.cache = cache
+        # observador(chamada) recebe cada chamada registrada (ver metricas.Instrumentacao.registrar_llm)
+        self.observador = observador
+        self._em_andamento = {}
+        self._trava = threading.Lock()
+        self.chamadas = deque(maxlen=500)
+        self.totais = {"chamadas": 0, "cache": 0, "coalescidas": 0, "tentativas_extras": 0,
+                       "tokens_prompt": 0, "tokens_resposta": 0, "latencia_total": 0.0}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._trava:
+                if self._client is None:
+                    self._client = self._criar_client().with_options(max_retries=0)
+        return self._client
+
+    def _registrar(self, **chamada):
+        with self._trava:
+            self.chamadas.append(chamada)
+            self.totais["chamadas"] += 1
+            self.totais["tokens_prompt"] += chamada.get("tokens_prompt", 0)
+            self.totais["tokens_resposta"] += chamada.get("tokens_resposta", 0)
+            self.totais["latencia_total"] += chamada["latencia"]
+        self._observar(chamada)
+
+    def _observar(self, chamada):
+        if self.observador:
+            try:
+                self.observador(chamada)
+            except Exception:
+                logger.exception("Falha ao registrar métricas da chamada")
+
+    def _contar(self, nome):
+        with self._trava:
+            self.totais[nome] += 1
+
+    def estatisticas(self):
+        with self._trava:
+            return dict(self.totais)
+
+    def _aguardar_cotas(self, estimativa):
+        if self.balde_requisicoes:
+            self.balde_requisicoes.consumir(1)
+        if self.balde_tokens:
+            self.balde_tokens.consumir(estimativa)
+
+    def _com_retentativas(self, executar):
+        import openai
+
+        for tentativa in range(self.max_tentativas):
+            try:
+                return executar()
+            except erros_temporarios() as e:
+                if tentativa == self.max_tentativas - 1 or getattr(e, "_trechos_entregues", False):
+                    raise ErroLLM(f"O serviço de IA não respondeu após {tentativa + 1} tentativas: {e}") from e
+                espera = _espera_retry_after(e)
+                if espera is None:
+                    # Backoff exponencial com jitter completo
+                    espera = random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+                self._contar("tentativas_extras")
+                logger.warning("Tentativa %d de %d falhou (%s); nova tentativa em %.1f s",
+                               tentativa + 1, self.max_tentativas, e, espera)
+                time.sleep(espera)
+            except openai.APIStatusError as e:
+                raise ErroLLM(f"O serviço de IA recusou a requisição ({e.status_code}): {e.message}") from e
+
+    def _chamar(self, modelo, mensagens, temperatura, ao_receber, formato_json, etapa):
+        estimativa = estimar_tokens(mensagens) + RESERVA_RESPOSTA
+
+        def executar():
+            self._aguardar_cotas(estimativa)
+            inicio = time.perf_counter()
+            with self.semaforo:
+                if ao_receber is None:
+                    opcoes = {"response_format": {"type": "json_object"}} if formato_json else {}
+                    response = self.client.chat.completions.create(
+                        model=modelo, messages=mensagens, temperature=temperatura, **opcoes
+                    )
+                    conteudo = response.choices[0].message.content
+                    uso = response.usage
+                else:
+                    conteudo, uso = self._chamar_stream(modelo, mensagens, temperatura, ao_receber)
+            tokens_prompt = uso.prompt_tokens if uso else estimar_tokens(mensagens)
+            tokens_resposta = uso.completion_tokens if uso else len(conteudo) // 4
+            if self.balde_tokens:
+                self.balde_tokens.ajustar(tokens_prompt + tokens_resposta - estimativa)
+            self._registrar(
+                etapa=etapa, modelo=modelo, latencia=time.perf_counter() - inicio,
+                tokens_prompt=tokens_prompt, tokens_resposta=tokens_resposta,
+                bytes_payload=tamanho_payload(mensagens), cache="nao"
+            )
+            return conteudo
+
+        return self._com_retentativas(executar)
+
+    def _chamar_stream(self, modelo, mensagens, temperatura, ao_receber):
+        partes, uso = [], None
+        stream = self.client.chat.completions.create(
+            model=modelo, messages=mensagens, temperature=temperatura,
+            stream=True, stream_options={"include_usage": True}
+        )
+        try:
+            for chunk in stream:
+                if chunk.usage:
+                    uso = chunk.usage
+                if chunk.choices and chunk.choices[0].delta.content:
+                    partes.append(chunk.choices[0].delta.content)
+                    ao_receber(chunk.choices[0].delta.content)
+        except erros_temporarios() as e:
+            # Depois que o usuário já viu parte da resposta, não refaz a chamada
+            e._trechos_entregues = bool(partes)
+            raise
+        return "".join(partes), uso
+
+    def completar(self, mensagens, temperatura, modelo="gpt-4o", ao_receber=None, forcar=False, formato_json=False,
+                  etapa=None):
+        # forcar ignora a resposta em cache, mas guarda a nova no lugar dela;
+        # formato_json pede ao modelo um objeto JSON válido (sem streaming);
+        # etapa só rotula a chamada nas métricas
+        chave = chave_requisicao(modelo, temperatura, mensagens, formato_json)
+        inicio = time.perf_counter()
+        if self.cache and not forcar:
+            conteudo = self.cache.obter(chave)
+            if conteudo is not None:
+                self._contar("cache")
+                self._observar({"etapa": etapa, "modelo": modelo, "latencia": time.perf_counter() - inicio, "cache": "acerto"})
+                if ao_receber:
+                    ao_receber(conteudo)
+                return conteudo
+
+        # Single-flight: quem chega com uma requisição idêntica em andamento espera o mesmo resultado
+        with self._trava:
+            futuro = self._em_andamento.get(chave)
+            lider = futuro is None
+            if lider:
+                futuro = Future()
+                self._em_andamento[chave] = futuro
+        if not lider:
+            self._contar("coalescidas")
+            conteudo = futuro.result()
+            self._observar({"etapa": etapa, "modelo": modelo, "latencia": time.perf_counter() - inicio, "cache": "coalescida"})
+            if ao_receber:
+                ao_receber(conteudo)
+            return conteudo
+
+        try:
+            conteudo = self._chamar(modelo, mensagens, temperatura, ao_receber, formato_json, etapa)
+            if self.cache:
+                self.cache.guardar(chave, conteudo)
+            futuro.set_result(conteudo)
+            return conteudo
+        except BaseException as e:
+            futuro.set_exception(e)
+            if isinstance(e, ErroLLM):
+                self._observar({
+                    "etapa": etapa, "modelo": modelo, "latencia": time.perf_counter() - inicio,
+                    "bytes_payload": tamanho_payload(mensagens), "cache": "nao", "erro": str(e)[:200]
+                })
+            raise
+        finally:
+            with self._trava:
+                self._em_andamento.pop(chave, None)
@@ -0,0 +1,152 @@
+import io
+import re
+
+import numpy as np
+
+from imagens import codificar
+
+# Comparação visual local entre o dashboard original e o recriado no Power BI:
+# alinhamento, similaridade estrutural (SSIM) por região e mapa de diferenças.
+# Só as regiões divergentes precisam ser enviadas ao modelo.
+
+LARGURA_TRABALHO = 1280
+JANELA_SSIM = 7
+GRADE_PADRAO = (4, 4)
+LIMIAR_SSIM_PADRAO = 0.85
+MAX_REGIOES_MODELO = 6
+
+TERMOS_ROTEIRO_VISUAL = ["layout", "visual", "gráfico", "grafico", "eixo", "filtro", "slicer", "posicion", "kpi", "cartão", "tabela", "cores"]
+
+
+def _carregar(dados, tamanho=None):
+    from PIL import Image
+
+    with Image.open(io.BytesIO(dados)) as imagem:
+        imagem = imagem.convert("RGB")
+        if tamanho is None:
+            largura = min(LARGURA_TRABALHO, imagem.width)
+            tamanho = (largura, max(1, round(imagem.height * largura / imagem.width)))
+        return np.asarray(imagem.resize(tamanho, Image.BILINEAR), dtype=np.float64)
+
+
+def _cinza(rgb):
+    return rgb @ np.array([0.299, 0.587, 0.114])
+
+
+def _media_local(x, janela=JANELA_SSIM):
+    # Filtro de média com imagem integral: custo constante por pixel
+    margem = janela // 2
+    integral = np.cumsum(np.cumsum(np.pad(x, margem, mode="edge"), axis=0), axis=1)
+    integral = np.pad(integral, ((1, 0), (1, 0)))
+    soma = (integral[janela:, janela:] - integral[:-janela, janela:]
+            - integral[janela:, :-janela] + integral[:-janela, :-janela])
+    return soma / (janela * janela)
+
+
+def mapa_ssim(a, b, janela=JANELA_SSIM):
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mu_a, mu_b = _media_local(a, janela), _media_local(b, janela)
+    var_a = _media_local(a * a, janela) - mu_a ** 2
+    var_b = _media_local(b * b, janela) - mu_b ** 2
+    cov = _media_local(a * b, janela) - mu_a * mu_b
+    return ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+
+
+def estimar_deslocamento(a, b):
+    # Correlação de fase: deslocamento (dy, dx) que leva b até a
+    espectro = np.fft.fft2(a) * np.conj(np.fft.fft2(b))
+    correlacao = np.abs(np.fft.ifft2(espectro / (np.abs(espectro) + 1e-9)))
+    dy, dx = np.unravel_index(np.argmax(correlacao), correlacao.shape)
+    altura, largura = a.shape
+    return (dy - altura if dy > altura // 2 else dy), (dx - largura if dx > largura // 2 else dx)
+
+
+def _deslocar(imagem, dy, dx):
+    altura, largura = imagem.shape[:2]
+    margens = [(max(dy, 0), max(-dy, 0)), (max(dx, 0), max(-dx, 0))] + [(0, 0)] * (imagem.ndim - 2)
+    expandida = np.pad(imagem, margens, mode="edge")
+    y0, x0 = max(-dy, 0), max(-dx, 0)
+    return expandida[y0:y0 + altura, x0:x0 + largura]
+
+
+def _limites(tamanho, partes):
+    return np.linspace(0, tamanho, partes + 1).astype(int)
+
+
+def _mapa_calor(rgb, diferenca, regioes):
+    from PIL import Image, ImageDraw
+
+    base = _cinza(rgb)[..., None].repeat(3, axis=2) * 0.6
+    base[..., 0] += diferenca * 255 * 0.8
+    imagem = Image.fromarray(np.clip(base, 0, 255).astype(np.uint8))
+    desenho = ImageDraw.Draw(imagem)
+    for regiao in regioes:
+        if regiao["divergente"]:
+            desenho.rectangle(regiao["caixa"], outline=(255, 0, 0), width=3)
+    buffer = io.BytesIO()
+    imagem.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def comparar_imagens(original, nova, grade=GRADE_PADRAO, limiar=LIMIAR_SSIM_PADRAO):
+    rgb_a = _carregar(original)
+    altura, largura = rgb_a.shape[:2]
+    rgb_b = _carregar(nova, (largura, altura))
+    cinza_a, cinza_b = _cinza(rgb_a), _cinza(rgb_b)
+
+    # Só corrige deslocamentos pequenos; acima disso as telas têm layouts diferentes
+    dy, dx = estimar_deslocamento(cinza_a, cinza_b)
+    if abs(dy) <= altura * 0.1 and abs(dx) <= largura * 0.1:
+        rgb_b, cinza_b = _deslocar(rgb_b, dy, dx), _deslocar(cinza_b, dy, dx)
+    else:
+        dy, dx = 0, 0
+
+    ssim = mapa_ssim(cinza_a, cinza_b)
+    linhas, colunas = grade
+    ys, xs = _limites(altura, linhas), _limites(largura, colunas)
+    somas = np.add.reduceat(np.add.reduceat(ssim, ys[:-1], axis=0), xs[:-1], axis=1)
+    areas = np.outer(np.diff(ys), np.diff(xs))
+    medias = somas / areas
+
+    regioes = []
+    for i in range(linhas):
+        for j in range(colunas):
+            regioes.append({
+                "linha": i + 1,
+                "coluna": j + 1,
+                "caixa": (int(xs[j]), int(ys[i]), int(xs[j + 1]), int(ys[i + 1])),
+                "ssim": round(float(medias[i, j]), 4),
+                "divergente": bool(medias[i, j] < limiar)
+            })
+
+    diferenca = 1 - np.clip(ssim, 0, 1)
+    return {
+        "ssim_global": round(float(ssim.mean()), 4),
+        "deslocamento": (int(dy), int(dx)),
+        "regioes": regioes,
+        "mapa_calor": _mapa_calor(rgb_a, diferenca, regioes),
+        "imagens": (rgb_a, rgb_b)
+    }
+
+
+def recortes_divergentes(resultado, max_regioes=MAX_REGIOES_MODELO):
+    from PIL import Image
+
+    rgb_a, rgb_b = resultado["imagens"]
+    divergentes = sorted((r for r in resultado["regioes"] if r["divergente"]), key=lambda r: r["ssim"])
+    recortes = []
+    for regiao in divergentes[:max_regioes]:
+        x0, y0, x1, y1 = regiao["caixa"]
+        recortes.append((
+            regiao,
+            codificar(Image.fromarray(rgb_a[y0:y1, x0:x1].astype(np.uint8))),
+            codificar(Image.fromarray(rgb_b[y0:y1, x0:x1].astype(np.uint8)))
+        ))
+    return recortes
+
+
+def recortar_roteiro(roteiro, termos=TERMOS_ROTEIRO_VISUAL):
+    # Mantém só as seções do roteiro que tratam do aspecto visual do dashboard
+    secoes = re.split(r"\n(?=#{1,6} |\d+\. |\*\*)", roteiro)
+    relevantes = [s for s in secoes if any(t in s.lower() for t in termos)]
+    return "\n".join(relevantes).strip() or roteiro
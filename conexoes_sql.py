@@ -0,0 +1,64 @@
+import re
+
+# Conexões com bancos (MySQL, PostgreSQL, SQL Server) e Databricks via SQLAlchemy.
+# Cada fonte tem um pool de conexões reaproveitado entre reruns (o app guarda o
+# engine com st.cache_resource) e as consultas exploratórias são montadas pelo
+# SQLAlchemy, que cita os identificadores e traduz o LIMIT para cada dialeto.
+
+TAMANHO_POOL = 5
+RECICLAR_CONEXOES_SEGUNDOS = 1800
+DRIVERS = {
+    "MySQL": "mysql+pymysql",
+    "PostgreSQL": "postgresql+psycopg2",
+    "SQL Server": "mssql+pyodbc"
+}
+DRIVER_ODBC_SQL_SERVER = "ODBC Driver 17 for SQL Server"
+PADRAO_IDENTIFICADOR = re.compile(r"^[\w$ -]+$")
+# Literais e identificadores citados, onde um ; não separa instruções
+PADRAO_TRECHOS_CITADOS = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`|\[[^\]]*\]")
+
+
+def url_conexao(tipo, host, porta, banco, usuario, senha):
+    from sqlalchemy.engine import URL
+
+    # URL.create escapa usuário e senha; a string completa é a chave do pool no app
+    query = {"driver": DRIVER_ODBC_SQL_SERVER} if tipo == "SQL Server" else {}
+    url = URL.create(DRIVERS[tipo], username=usuario, password=senha, host=host, port=int(porta), database=banco, query=query)
+    return url.render_as_string(hide_password=False)
+
+
+def url_databricks(jdbc_url, token):
+    return f"{jdbc_url};AuthMech=3;UID=token;PWD={token}"
+
+
+def criar_engine(url, tamanho_pool=TAMANHO_POOL):
+    import sqlalchemy
+
+    # pre_ping descarta conexões derrubadas pelo servidor antes de entregá-las
+    return sqlalchemy.create_engine(
+        url, pool_size=tamanho_pool, max_overflow=tamanho_pool,
+        pool_pre_ping=True, pool_recycle=RECICLAR_CONEXOES_SEGUNDOS
+    )
+
+
+def consulta_tabela(nome):
+    import sqlalchemy
+
+    # "tabela" ou "schema.tabela"; o nome nunca é interpolado no SQL
+    partes = [p.strip() for p in str(nome or "").split(".")]
+    if len(partes) > 2 or not all(PADRAO_IDENTIFICADOR.match(p) for p in partes):
+        raise ValueError(f"Nome de tabela inválido: {nome!r}")
+    tabela = sqlalchemy.table(partes[-1], schema=partes[0] if len(partes) == 2 else None)
+    return sqlalchemy.select(sqlalchemy.literal_column("*")).select_from(tabela)
+
+
+def consulta_livre(sql):
+    import sqlalchemy
+
+    # Uma única instrução: "SELECT ...; DROP TABLE ..." é recusada antes de chegar ao banco
+    sql = str(sql or "").strip().rstrip(";").strip()
+    if not sql or ";" in PADRAO_TRECHOS_CITADOS.sub("", sql):
+        raise ValueError("A consulta deve ter uma única instrução SELECT")
+    # A consulta do usuário vira subconsulta para receber o limite de linhas do dialeto
+    subconsulta = sqlalchemy.text(sql).columns().subquery("consulta_origem")
+    return sqlalchemy.select(sqlalchemy.literal_column("*")).select_from(subconsulta)
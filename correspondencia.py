@@ -0,0 +1,143 @@
+import re
+import unicodedata
+
+import numpy as np
+
+# Correspondência local entre os campos do dashboard (inventário da etapa 3) e as
+# colunas da base, sem rede. Os nomes são normalizados (acentos, caixa, snake/camel
+# case, sinônimos PT/EN) e pontuados contra um índice invertido de trigramas e de
+# tokens; só os campos sem correspondência confiável vão para o modelo, cada um com
+# uma lista curta de colunas candidatas.
+
+TAMANHO_NGRAMA = 3
+LIMIAR_CONFIANCA = 0.85
+MARGEM_CONFIANCA = 0.05
+MAX_CANDIDATOS = 5
+
+SINONIMOS = {
+    "receita": ["revenue", "faturamento", "vendas", "venda", "sales", "sale", "income"],
+    "valor": ["value", "amount", "amt", "vlr", "vl", "montante"],
+    "quantidade": ["qtd", "qtde", "quantity", "qty", "volume", "unidades", "units"],
+    "preco": ["price", "prc"],
+    "unitario": ["unit", "unitary"],
+    "custo": ["cost", "custos", "costs"],
+    "lucro": ["profit", "resultado"],
+    "margem": ["margin"],
+    "desconto": ["discount", "desc"],
+    "data": ["date", "dt"],
+    "mes": ["month"],
+    "ano": ["year", "exercicio"],
+    "trimestre": ["quarter", "qtr", "tri"],
+    "semana": ["week", "wk"],
+    "cliente": ["customer", "client", "clientes", "customers"],
+    "produto": ["product", "item", "sku", "produtos", "products"],
+    "categoria": ["category", "cat", "grupo", "group"],
+    "regiao": ["region", "area", "zona", "zone"],
+    "cidade": ["city", "municipio"],
+    "estado": ["state", "uf", "province"],
+    "pais": ["country"],
+    "loja": ["store", "shop", "filial", "branch"],
+    "vendedor": ["seller", "salesperson", "representante", "rep"],
+    "pedido": ["order", "pedidos", "orders"],
+    "codigo": ["code", "cod", "id", "identificador"],
+    "nome": ["name", "nm", "descricao", "description"],
+    "meta": ["target", "goal", "budget", "orcamento"],
+    "percentual": ["percent", "pct", "perc", "taxa", "rate"],
+    "media": ["average", "avg", "mean", "medio"],
+    "funcionario": ["employee", "colaborador", "staff"],
+    "canal": ["channel"],
+    "segmento": ["segment"],
+    "marca": ["brand"],
+    "fornecedor": ["supplier", "vendor"],
+    "status": ["situacao"]
+}
+CANONICO = {variante: canonico for canonico, variantes in SINONIMOS.items() for variante in variantes}
+
+PALAVRAS_VAZIAS = {"de", "da", "do", "das", "dos", "e", "em", "por", "the", "of", "by", "per", "in", "and"}
+# Agregações descrevem a medida do dashboard, não a coluna de origem
+AGREGACOES = {"total", "soma", "sum", "somatorio", "count", "contagem", "max", "min", "maximo", "minimo"}
+
+
+def tokens_nome(nome):
+    nome = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(nome))
+    nome = unicodedata.normalize("NFKD", nome.lower())
+    nome = "".join(c for c in nome if not unicodedata.combining(c))
+    tokens = [CANONICO.get(t, t) for t in re.split(r"[^a-z0-9]+", nome) if t and t not in PALAVRAS_VAZIAS]
+    sem_agregacao = [t for t in tokens if t not in AGREGACOES]
+    return sem_agregacao or tokens
+
+
+def chave_nome(nome):
+    return " ".join(tokens_nome(nome))
+
+
+def _ngramas(chave, n=TAMANHO_NGRAMA):
+    chave = f" {chave} "
+    return {chave[i:i + n] for i in range(max(1, len(chave) - n + 1))}
+
+
+def _indice_invertido(conjuntos):
+    postagens = {}
+    for i, conjunto in enumerate(conjuntos):
+        for termo in conjunto:
+            postagens.setdefault(termo, []).append(i)
+    return {termo: np.array(indices, dtype=np.int64) for termo, indices in postagens.items()}
+
+
+class IndiceColunas:
+    def __init__(self, colunas):
+        self.colunas = [str(c) for c in colunas]
+        self.chaves = [chave_nome(c) for c in self.colunas]
+        ngramas = [_ngramas(chave) for chave in self.chaves]
+        tokens = [set(chave.split()) for chave in self.chaves]
+        self.ngramas = _indice_invertido(ngramas)
+        self.tokens = _indice_invertido(tokens)
+        self.total_ngramas = np.array([len(g) for g in ngramas], dtype=np.float64)
+        self.total_tokens = np.array([len(t) for t in tokens], dtype=np.float64)
+        self.por_chave = {}
+        for i, chave in enumerate(self.chaves):
+            self.por_chave.setdefault(chave, []).append(i)
+
+    def _comuns(self, postagens, termos):
+        listas = [postagens[t] for t in termos if t in postagens]
+        if not listas:
+            return np.zeros(len(self.colunas))
+        return np.bincount(np.concatenate(listas), minlength=len(self.colunas)).astype(np.float64)
+
+    def pontuar(self, campo):
+        # Similaridade de cada coluna com o campo: o maior entre o Dice dos trigramas e a
+        # cobertura dos tokens do campo (colunas costumam ter qualificadores a mais, como id ou vl)
+        chave = chave_nome(campo)
+        ngramas, tokens = _ngramas(chave), set(chave.split())
+        dice = 2 * self._comuns(self.ngramas, ngramas) / (len(ngramas) + self.total_ngramas)
+        comuns_tokens = self._comuns(self.tokens, tokens)
+        cobertura = comuns_tokens / max(len(tokens), 1)
+        jaccard = comuns_tokens / np.maximum(len(tokens) + self.total_tokens - comuns_tokens, 1)
+        pontos = np.maximum(dice, 0.9 * cobertura + 0.1 * jaccard)
+        for i in self.por_chave.get(chave, []):
+            pontos[i] = 1.0
+        return pontos
+
+    def candidatos(self, campo, quantidade=MAX_CANDIDATOS):
+        if not self.colunas:
+            return []
+        pontos = self.pontuar(campo)
+        quantidade = min(quantidade, len(self.colunas))
+        melhores = np.argpartition(-pontos, quantidade - 1)[:quantidade]
+        melhores = melhores[np.argsort(-pontos[melhores], kind="stable")]
+        return [{"coluna": self.colunas[i], "pontuacao": round(float(pontos[i]), 3)} for i in melhores if pontos[i] > 0]
+
+
+def resolver_campos(campos, colunas, limiar=LIMIAR_CONFIANCA, margem=MARGEM_CONFIANCA, max_candidatos=MAX_CANDIDATOS):
+    # Um campo é resolvido quando a melhor coluna passa do limiar e se destaca da segunda
+    indice = IndiceColunas(colunas)
+    resolvidos, pendentes = {}, {}
+    for campo in campos:
+        candidatos = indice.candidatos(campo, max_candidatos)
+        melhor = candidatos[0]["pontuacao"] if candidatos else 0.0
+        segunda = candidatos[1]["pontuacao"] if len(candidatos) > 1 else 0.0
+        if melhor >= limiar and melhor - segunda >= margem:
+            resolvidos[campo] = candidatos[0]
+        else:
+            pendentes[campo] = candidatos
+    return {"resolvidos": resolvidos, "pendentes": pendentes}
@@ -1,36 +1,134 @@
 import streamlit as st
-import pandas as pd
-import openai
-from openai import OpenAI
 import base64
+import hashlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 import os
-import zipfile
 import json
-import csv
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import A4
 from dotenv import load_dotenv
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from estado import EstadoEmMemoria, diretorio_migracao, id_migracao_valido, novo_id_migracao, salvar_bytes, salvar_em_blocos
+import estado
+from fila_jobs import STATUS_ATIVOS, FilaJobs
+from cache_llm import CacheLLM
+from backends_llm import criar_roteador
+from metricas import Instrumentacao
+
+# Só os módulos leves acima são carregados na abertura do app. Os que puxam pandas,
+# numpy, Pillow, o SDK da OpenAI, python-docx ou reportlab são importados dentro das
+# funções e etapas que os usam, para a primeira tela abrir rápido após um cold start.
 
 # Configuração inicial
 st.set_page_config(layout="wide", page_title="DashMigrate Pro+")
-load_dotenv()
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
 # Diretórios
 DATA_DIR = "data"
 OUTPUT_DIR = "output"
-os.makedirs(DATA_DIR, exist_ok=True)
-os.makedirs(OUTPUT_DIR, exist_ok=True)
+
+# Recursos criados uma única vez por processo e reaproveitados entre reruns
+@st.cache_resource
+def obter_cache_llm():
+    return CacheLLM(
+        os.path.join(DATA_DIR, "cache_llm"),
+        tamanho_max_bytes=int(os.getenv("DASHMIGRATE_CACHE_MAX_MB", "256")) * 1024 * 1024,
+        idade_max_segundos=int(os.getenv("DASHMIGRATE_CACHE_MAX_DIAS", "30")) * 24 * 3600
+    )
+
+@st.cache_resource
+def obter_instrumentacao():
+    # Trace JSONL e arquivo do Prometheus (textfile) compartilhados por todas as sessões
+    return Instrumentacao(
+        os.getenv("DASHMIGRATE_DIR_METRICAS", os.path.join(DATA_DIR, "metricas")),
+        tamanho_max_trace=int(os.getenv("DASHMIGRATE_TRACE_MAX_MB", "50")) * 1024 * 1024,
+        intervalo_prometheus=float(os.getenv("DASHMIGRATE_PROMETHEUS_INTERVALO", "10"))
+    )
+
+@st.cache_resource
+def obter_cliente():
+    load_dotenv()
+    os.makedirs(DATA_DIR, exist_ok=True)
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Um único cliente por provedor mantém o pool de conexões HTTP aberto entre as
+    # chamadas e aplica os limites de requisições/tokens por minuto a todas as sessões
+    return criar_roteador(
+        requisicoes_por_minuto=int(os.getenv("DASHMIGRATE_LIMITE_RPM", "500")),
+        tokens_por_minuto=int(os.getenv("DASHMIGRATE_LIMITE_TPM", "30000")),
+        max_simultaneas=int(os.getenv("DASHMIGRATE_MAX_CHAMADAS", "8")),
+        cache=obter_cache_llm(),
+        observador=obter_instrumentacao().registrar_llm
+    )
+
+@st.cache_resource
+def obter_engine(url):
+    from conexoes_sql import criar_engine
+
+    # Um pool de conexões por fonte, reaproveitado entre reruns e sessões
+    return criar_engine(url)
+
+@st.cache_resource
+def obter_cliente_s3(access_key, secret_key):
+    from armazenamento_objetos import criar_cliente_s3
+
+    return criar_cliente_s3(access_key, secret_key)
+
+@st.cache_resource
+def obter_cliente_azure(connection_string):
+    from armazenamento_objetos import criar_cliente_azure
+
+    return criar_cliente_azure(connection_string)
+
+@st.cache_resource
+def obter_fila_jobs():
+    return FilaJobs(os.path.join(DATA_DIR, "jobs"), max_workers=int(os.getenv("DASHMIGRATE_MAX_JOBS", "4")))
+
+@st.cache_resource
+def carregar_logo():
+    # Logo embutido em base64: st.image carregaria numpy e Pillow já na primeira tela
+    with open("logo.png", "rb") as f:
+        return base64.b64encode(f.read()).decode("ascii")
+
+client = obter_cliente()
+instrumentacao = obter_instrumentacao()
+
+# Cada sessão trabalha em uma migração própria; o identificador fica na URL
+# para que recarregar a página continue a mesma migração
+id_migracao = st.query_params.get("migracao", "")
+if not id_migracao_valido(id_migracao):
+    id_migracao = novo_id_migracao()
+    st.query_params["migracao"] = id_migracao
+DIR_MIGRACAO = diretorio_migracao(DATA_DIR, id_migracao)
+# Saídas da etapa 7 também por migração, para exportações simultâneas não se sobrescreverem
+DIR_SAIDA = os.path.join(OUTPUT_DIR, id_migracao)
+CAMINHO_RELATORIO_DOCX = os.path.join(DIR_SAIDA, "relatorio_executivo_dashmigrate.docx")
+CAMINHO_RELATORIO_PDF = os.path.join(DIR_SAIDA, "relatorio_executivo_dashmigrate.pdf")
+CAMINHO_PACOTE = os.path.join(DIR_SAIDA, "dashmigrate_migracao.zip")
 
 # Caminhos
-CAMINHO_IMAGEM = os.path.join(DATA_DIR, "uploaded_image.png")
-CAMINHO_DATASET = os.path.join(DATA_DIR, "user_dataset.xlsx")
-CAMINHO_PROGRESSO = os.path.join(DATA_DIR, "progresso.json")
-CAMINHO_ROTEIRO = os.path.join(DATA_DIR, "roteiro.json")
-CAMINHO_CHECKLIST = os.path.join(DATA_DIR, "checklist.json")
-CAMINHO_OCR = os.path.join(DATA_DIR, "ocr_result.json")
-CAMINHO_PLATAFORMA = os.path.join(DATA_DIR, "plataforma.json")
-CAMINHO_ETAPA_ATUAL = os.path.join(DATA_DIR, "etapa_atual.json")
+CAMINHO_IMAGEM = os.path.join(DIR_MIGRACAO, "uploaded_image.png")
+CAMINHO_DATASET = os.path.join(DIR_MIGRACAO, "user_dataset.xlsx")
+CAMINHO_IMAGEM_POWERBI = os.path.join(DIR_MIGRACAO, "powerbi_dashboard.png")
+CAMINHO_PROGRESSO = os.path.join(DIR_MIGRACAO, "progresso.json")
+CAMINHO_ROTEIRO = os.path.join(DIR_MIGRACAO, "roteiro.json")
+CAMINHO_CHECKLIST = os.path.join(DIR_MIGRACAO, "checklist.json")
+CAMINHO_OCR = os.path.join(DIR_MIGRACAO, "ocr_result.json")
+CAMINHO_INVENTARIO = os.path.join(DIR_MIGRACAO, "inventario.json")
+CAMINHO_CORRESPONDENCIAS = os.path.join(DIR_MIGRACAO, "correspondencias.json")
+CAMINHO_CHECKLIST_EXTRACAO = os.path.join(DIR_MIGRACAO, "checklist_etapa3.json")
+CAMINHO_ROTEIRO_PARTES = os.path.join(DIR_MIGRACAO, "roteiro_partes.json")
+CAMINHO_PLATAFORMA = os.path.join(DIR_MIGRACAO, "plataforma.json")
+CAMINHO_ETAPA_ATUAL = os.path.join(DIR_MIGRACAO, "etapa_atual.json")
+CAMINHO_ANALISE = os.path.join(DIR_MIGRACAO, "analise_compatibilidade.json")
+CAMINHO_ESQUEMA = os.path.join(DIR_MIGRACAO, "esquema_dataset.json")
+CAMINHO_MAPA_CALOR = os.path.join(DIR_MIGRACAO, "comparacao_mapa_calor.png")
+
+# Cache das respostas do LLM (compartilhado entre sessões e processos)
+cache_llm = obter_cache_llm()
+
+# Etapas que chamam o LLM rodam em segundo plano e sobrevivem a recarregamentos da página
+fila_jobs = obter_fila_jobs()
+
+# Estado da migração em memória na sessão, gravado em disco só quando muda
+estado_sessao = EstadoEmMemoria(st.session_state.setdefault("estado_json", {}))
 
 # Etapas
 etapas = [
@@ -43,16 +141,244 @@ etapas = [
     "Exportação final"
 ]
 
+# Pré-processamento das imagens enviadas ao modelo
+IMAGEM_LADO_MAX = int(os.getenv("DASHMIGRATE_IMAGEM_LADO_MAX", "2048"))
+IMAGEM_FORMATO = os.getenv("DASHMIGRATE_IMAGEM_FORMATO", "JPEG")
+IMAGEM_QUALIDADE = int(os.getenv("DASHMIGRATE_IMAGEM_QUALIDADE", "85"))
+DIR_CACHE_IMAGENS = os.path.join(DATA_DIR, "cache_imagens")
+DIR_CACHE_COLUNAR = os.path.join(DATA_DIR, "cache_colunar")
+
 # Funções auxiliares
+# Os jobs rodam em threads do pool, sem contexto de script: leem e gravam direto no disco,
+# sem tocar em st.session_state, e a sessão percebe as gravações pelo mtime dos arquivos
 def salvar_json(caminho, objeto):
-    with open(caminho, "w", encoding="utf-8") as f:
-        json.dump(objeto, f, indent=2, ensure_ascii=False)
+    if get_script_run_ctx(suppress_warning=True) is None:
+        estado.salvar_json(caminho, objeto)
+    else:
+        estado_sessao.salvar(caminho, objeto)
 
 def carregar_json(caminho):
-    if os.path.exists(caminho):
-        with open(caminho, "r", encoding="utf-8") as f:
-            return json.load(f)
-    return {}
+    if get_script_run_ctx(suppress_warning=True) is None:
+        return estado.carregar_json(caminho)
+    return estado_sessao.carregar(caminho)
+
+def modelo_escolhido():
+    return carregar_json(CAMINHO_PLATAFORMA).get("modelo_llm")
+
+def gerar_resposta(etapa, mensagens, temperatura, forcar=False, formato_json=False):
+    # A etapa define o modelo usado a partir do modelo escolhido na etapa 1
+    return client.completar(etapa, mensagens, temperatura, modelo=modelo_escolhido(), forcar=forcar, formato_json=formato_json)
+
+def gerar_resposta_stream(etapa, mensagens, temperatura, ao_receber, forcar=False):
+    # Repassa cada trecho recebido para ao_receber; roda fora da thread do Streamlit
+    return client.completar(etapa, mensagens, temperatura, modelo=modelo_escolhido(), ao_receber=ao_receber, forcar=forcar)
+
+def concluir_etapa(indice, proxima_etapa):
+    progresso_atual = carregar_json(CAMINHO_PROGRESSO)
+    progresso_atual[etapas[indice]] = True
+    salvar_json(CAMINHO_PROGRESSO, progresso_atual)
+    salvar_etapa_atual(proxima_etapa)
+
+@st.fragment(run_every=1)
+def acompanhar_job(id_job, mensagem):
+    job = fila_jobs.obter(id_job)
+    if job is None or job["status"] not in STATUS_ATIVOS:
+        st.rerun()
+    st.info(f"⏳ {mensagem}... ({int(time.time() - job['criado_em'])} s). Você pode recarregar a página: o resultado será salvo ao final.")
+    parciais = fila_jobs.parciais(id_job)
+    if parciais:
+        for coluna, (titulo, texto) in zip(st.columns(len(parciais)), parciais.items()):
+            with coluna:
+                st.markdown(f"#### {titulo}")
+                st.markdown(texto + " ▌")
+
+def exibir_falha_job(tipo):
+    job = fila_jobs.ultimo_job(id_migracao, tipo)
+    if job and job["status"] in ("falhou", "interrompido"):
+        st.error(f"❌ A última execução não terminou: {job['erro'] or job['status']}")
+    return job
+
+# Jobs em segundo plano: recebem o callback parcial(titulo, trecho) e gravam o
+# resultado nos arquivos de estado da migração
+@instrumentacao.medir("job_extracao")
+def executar_extracao(parcial, modo_extracao):
+    from extracao_visual import extrair_inventario, extrair_por_tiles
+    from inventario import montar_inventario, texto_inventario
+
+    completar = lambda mensagens: gerar_resposta("extracao", mensagens, temperatura=0.3, formato_json=True)
+    if modo_extracao == "Imagem inteira":
+        imagem_processada, mime = carregar_imagem_para_llm(CAMINHO_IMAGEM)
+        componentes = extrair_inventario(imagem_processada, mime, completar)
+    else:
+        with open(CAMINHO_IMAGEM, "rb") as f:
+            imagem_bytes = f.read()
+        componentes, _ = extrair_por_tiles(imagem_bytes, completar)
+    inventario = montar_inventario(componentes)
+    salvar_json(CAMINHO_INVENTARIO, inventario)
+    # A versão em texto continua sendo a exibida na tela e no relatório
+    salvar_json(CAMINHO_OCR, {"ocr": texto_inventario(inventario)})
+    concluir_etapa(2, 3)
+
+@instrumentacao.medir("job_analise")
+def executar_analise(parcial, descricao, colunas, correspondencias, assinatura, forcar):
+    from prompts import montar_prompt_compatibilidade
+
+    mensagens = [{"role": "user", "content": montar_prompt_compatibilidade(descricao, colunas, correspondencias)}]
+    # forcar ignora a resposta em cache para obter uma nova análise
+    analise_dados = gerar_resposta_stream("analise", mensagens, 0.2, lambda trecho: parcial("🤖 Análise", trecho), forcar=forcar)
+    salvar_json(CAMINHO_ANALISE, {"assinatura": assinatura, "analise": analise_dados})
+
+@instrumentacao.medir("job_roteiro")
+def executar_roteiro(parcial, descricao, colunas):
+    from geracao_incremental import itens_manuais
+    from prompts import montar_prompt_dax, montar_prompt_roteiro, montar_roteiro_completo
+
+    componentes = carregar_json(CAMINHO_INVENTARIO).get("componentes", []) + itens_manuais(carregar_json(CAMINHO_CHECKLIST_EXTRACAO))
+    if componentes:
+        executar_roteiro_incremental(parcial, componentes, colunas)
+        return
+    # Migrações sem inventário: roteiro e DAX em dois prompts independentes, que
+    # rodam em paralelo e exibem os tokens conforme chegam
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futuro_roteiro = executor.submit(
+            gerar_resposta_stream, "roteiro",
+            [{"role": "user", "content": montar_prompt_roteiro(descricao, colunas)}], 0.2,
+            lambda trecho: parcial("📘 Roteiro Técnico", trecho)
+        )
+        futuro_dax = executor.submit(
+            gerar_resposta_stream, "dax",
+            [{"role": "user", "content": montar_prompt_dax(descricao, colunas)}], 0.2,
+            lambda trecho: parcial("🧮 Medidas DAX", trecho)
+        )
+    roteiro_completo = montar_roteiro_completo(futuro_roteiro.result(), futuro_dax.result())
+    salvar_json(CAMINHO_ROTEIRO, {"conteudo": roteiro_completo})
+    concluir_etapa(4, 5)
+
+def executar_roteiro_incremental(parcial, componentes, colunas):
+    from geracao_incremental import gerar_partes, montar_documento, nome_tabela_powerbi, planejar_partes, revisar_medidas
+
+    # Só as partes cujas entradas mudaram desde a última geração voltam ao modelo
+    plataforma = carregar_json(CAMINHO_PLATAFORMA)
+    tabela = nome_tabela_powerbi(carregar_json(CAMINHO_ESQUEMA).get("origem"))
+    partes = planejar_partes(
+        componentes, colunas, carregar_json(CAMINHO_CORRESPONDENCIAS),
+        versoes={k: plataforma.get(k, "") for k in ("origem", "versao_origem", "versao_destino")},
+        tabela=tabela,
+        modelo=modelo_escolhido()
+    )
+    parcial("🧩 Partes do roteiro", f"{len(partes)} partes; as que não mudaram são reaproveitadas.\n\n")
+    completar = lambda etapa, mensagens: gerar_resposta(etapa, mensagens, temperatura=0.2)
+    textos, geradas = gerar_partes(
+        partes, carregar_json(CAMINHO_ROTEIRO_PARTES), completar,
+        ao_concluir=lambda parte: parcial("🧩 Partes do roteiro", f"- ✅ {parte['rotulo']} ({parte['secao']})\n")
+    )
+    # Verificação local das medidas; só as que têm erro voltam ao modelo
+    textos, violacoes, corrigidas = revisar_medidas(
+        partes, textos, colunas, tabela, completar,
+        ao_corrigir=lambda parte, nomes: parcial("🧩 Partes do roteiro", f"- 🔧 {parte['rotulo']}: {', '.join(nomes)}\n")
+    )
+    salvar_json(CAMINHO_ROTEIRO_PARTES, textos)
+    rotulos = {p["hash"]: p["rotulo"] for p in partes}
+    salvar_json(CAMINHO_ROTEIRO, {
+        "conteudo": montar_documento(partes, textos), "partes": len(partes), "geradas": geradas,
+        "medidas_corrigidas": corrigidas,
+        "violacoes_dax": [dict(v, parte=rotulos.get(v["parte"], "")) for v in violacoes]
+    })
+    concluir_etapa(4, 5)
+
+@instrumentacao.medir("job_comparacao")
+def executar_comparacao(parcial, mensagens, comparacao_local):
+    analise_final = gerar_resposta("comparacao", mensagens, temperatura=0.3)
+    checklist_atual = carregar_json(CAMINHO_CHECKLIST)
+    checklist_atual["comparacao_local"] = comparacao_local
+    checklist_atual["comparacao_visual_final"] = analise_final
+    salvar_json(CAMINHO_CHECKLIST, checklist_atual)
+
+def carregar_imagem_para_llm(caminho):
+    from imagens import preprocessar_imagem
+
+    with instrumentacao.span("preprocessar_imagem"), open(caminho, "rb") as f:
+        return preprocessar_imagem(
+            f.read(),
+            lado_max=IMAGEM_LADO_MAX,
+            formato=IMAGEM_FORMATO,
+            qualidade=IMAGEM_QUALIDADE,
+            diretorio_cache=DIR_CACHE_IMAGENS
+        )
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def comparar_localmente(original, nova, limiar):
+    from comparacao_visual import comparar_imagens
+
+    return comparar_imagens(original, nova, limiar=limiar)
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def corresponder_campos(campos, colunas):
+    from correspondencia import resolver_campos
+
+    return resolver_campos(campos, colunas)
+
+def assinatura_analise(descricao, colunas):
+    conteudo = json.dumps({"ocr": descricao, "colunas": sorted(str(c) for c in colunas)}, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+def descricao_dashboard():
+    from inventario import resumo_componentes
+
+    # Resumo compacto do inventário enviado aos prompts; migrações antigas só têm o texto livre
+    componentes = carregar_json(CAMINHO_INVENTARIO).get("componentes")
+    if componentes:
+        return resumo_componentes(componentes)
+    return carregar_json(CAMINHO_OCR).get("ocr", "")
+
+def ler_arquivo(caminho):
+    with open(caminho, "rb") as f:
+        return f.read()
+
+@instrumentacao.medir("pacote_zip")
+def montar_pacote_migracao():
+    from exportacao import arquivos_estado, montar_pacote_zip, texto_medidas_dax
+
+    # Relatórios, estado em JSON e medidas DAX; o ZIP é montado em disco no clique
+    return montar_pacote_zip(
+        CAMINHO_PACOTE,
+        {
+            "relatorio_executivo_dashmigrate.docx": CAMINHO_RELATORIO_DOCX,
+            "relatorio_executivo_dashmigrate.pdf": CAMINHO_RELATORIO_PDF,
+            **arquivos_estado(DIR_MIGRACAO)
+        },
+        {"medidas.dax": texto_medidas_dax(carregar_json(CAMINHO_ROTEIRO).get("conteudo", ""))}
+    )
+
+OPCAO_LEITURA_COMPLETA = "Baixar o arquivo completo (perfil de todas as linhas)"
+
+def sondar_objeto_remoto(tamanho, ler_intervalo, tipo_arquivo, nome, completo):
+    from armazenamento_objetos import baixar_em_partes, sondar_objeto
+    from cache_colunar import sondar_com_cache
+
+    if not completo:
+        # Só o rodapé do Parquet / o início do CSV, por Range GET
+        return sondar_objeto(tamanho, ler_intervalo, tipo_arquivo)
+    # Leitura completa: download em partes paralelas e cache colunar local
+    nome = os.path.basename(nome)
+    if not nome.lower().endswith(f".{tipo_arquivo}"):
+        nome += f".{tipo_arquivo}"
+    caminho = baixar_em_partes(tamanho, ler_intervalo, os.path.join(DIR_MIGRACAO, nome))
+    return sondar_com_cache(caminho, DIR_CACHE_COLUNAR)
+
+def sondar_medindo(fonte, origem, sondar, bytes_lidos=None):
+    # Duração, bytes e linhas de cada carga de base vão para as métricas
+    inicio = time.perf_counter()
+    sondagem = sondar()
+    linhas = sondagem.perfil["linhas"] if sondagem.perfil else len(sondagem.preview)
+    instrumentacao.registrar_dados(
+        origem, fonte, sondagem.bytes_lidos if sondagem.bytes_lidos is not None else bytes_lidos,
+        linhas, time.perf_counter() - inicio
+    )
+    return sondagem
+
+def carregar_colunas_dataset():
+    return [c["nome"] for c in carregar_json(CAMINHO_ESQUEMA).get("colunas", [])]
 
 def salvar_etapa_atual(indice):
     salvar_json(CAMINHO_ETAPA_ATUAL, {"indice": indice})
@@ -65,6 +391,12 @@ def resetar_progresso():
     salvar_json(CAMINHO_CHECKLIST, {})
     salvar_json(CAMINHO_ROTEIRO, {"conteudo": ""})
     salvar_json(CAMINHO_OCR, {"ocr": ""})
+    salvar_json(CAMINHO_INVENTARIO, {})
+    salvar_json(CAMINHO_CORRESPONDENCIAS, {})
+    salvar_json(CAMINHO_CHECKLIST_EXTRACAO, {})
+    salvar_json(CAMINHO_ROTEIRO_PARTES, {})
+    salvar_json(CAMINHO_ANALISE, {"assinatura": "", "analise": ""})
+    salvar_json(CAMINHO_ESQUEMA, {})
     salvar_json(CAMINHO_ETAPA_ATUAL, {"indice": 0})
     salvar_json(CAMINHO_PLATAFORMA, {"origem": ""})
 
@@ -81,8 +413,13 @@ plataforma_selecionada = carregar_json(CAMINHO_PLATAFORMA).get("origem", "")
 st.title("📊 Migração Assistida")
 
 # Barra lateral interativa
-st.sidebar.image("logo.png", use_container_width=True)
+st.sidebar.markdown(f"<img src='data:image/png;base64,{carregar_logo()}' style='width: 100%'>", unsafe_allow_html=True)
 st.sidebar.header("Progresso")
+st.sidebar.caption(f"🗂️ Migração: `{id_migracao}`")
+if st.sidebar.button("🆕 Nova migração", key="nova_migracao"):
+    st.session_state.clear()
+    st.query_params["migracao"] = novo_id_migracao()
+    st.rerun()
 
 for i, etapa in enumerate(etapas):
     status = progresso.get(etapa, False)
@@ -91,11 +428,49 @@ for i, etapa in enumerate(etapas):
         salvar_etapa_atual(i)
         st.rerun()
 
+estatisticas_cache = cache_llm.estatisticas()
+st.sidebar.caption(f"⚡ Cache LLM: {estatisticas_cache['hits']} hits / {estatisticas_cache['misses']} misses")
+estatisticas_cliente = client.estatisticas()
+if estatisticas_cliente["chamadas"]:
+    st.sidebar.caption(
+        f"📡 API: {estatisticas_cliente['chamadas']} chamadas, "
+        f"{estatisticas_cliente['latencia_total'] / estatisticas_cliente['chamadas']:.1f} s em média, "
+        f"{estatisticas_cliente['tokens_prompt'] + estatisticas_cliente['tokens_resposta']} tokens, "
+        f"{estatisticas_cliente['tentativas_extras']} novas tentativas"
+    )
+
+# Painel de depuração: agregados do processo (trace em DASHMIGRATE_DIR_METRICAS)
+if os.getenv("DASHMIGRATE_DEBUG"):
+    with st.sidebar.expander("🔍 Métricas (depuração)"):
+        metricas = instrumentacao.resumo()
+        custo_total = sum(linha["custo (USD)"] for linha in metricas["llm"])
+        st.caption(f"💲 Custo estimado do LLM: US$ {custo_total:.4f}")
+        for titulo, chave in (("LLM por etapa", "llm"), ("Spans", "spans"), ("Cargas de dados", "dados")):
+            if metricas[chave]:
+                st.markdown(f"**{titulo}**")
+                st.dataframe(metricas[chave], hide_index=True)
+        if metricas["recentes"]:
+            st.markdown("**Eventos recentes**")
+            st.json(metricas["recentes"][:20], expanded=False)
+        st.caption(f"Trace: `{instrumentacao.caminho_trace}` · Prometheus: `{instrumentacao.caminho_prometheus}`")
+
 if plataforma_selecionada:
     st.markdown(f"🧭 Plataforma de origem: **{plataforma_selecionada}**")
+    configuracao_plataforma = carregar_json(CAMINHO_PLATAFORMA)
+    if configuracao_plataforma.get("modelo_llm"):
+        rota_visao = client.rota("extracao", configuracao_plataforma["modelo_llm"])
+        rota_texto = client.rota("roteiro", configuracao_plataforma["modelo_llm"])
+        st.caption(
+            f"🧠 Modelo de IA: {configuracao_plataforma.get('modelo_llm_exibicao', configuracao_plataforma['modelo_llm'])} "
+            f"· imagens em `{rota_visao[0][1] if rota_visao else '-'}` "
+            f"· texto em `{rota_texto[0][1] if rota_texto else '-'}`"
+        )
 
 # st.header(f"Etapa {etapa_atual + 1}: {etapas[etapa_atual]}")
 
+# Tempo de renderização de cada etapa (reruns pedidos com st.rerun() não chegam ao registro)
+inicio_etapa = time.perf_counter()
+
 # Etapa 1: Configuração inicial com layout moderno
 if etapa_atual == 0:
     st.markdown("""
@@ -159,7 +534,7 @@ if etapa_atual == 0:
         "Google - Gemini 1.0 Pro": "gemini-1.0-pro",
         "Meta - LLaMA 3 (70B)": "llama3-70b",
         "Meta - LLaMA 3 (8B)": "llama3-8b",
-        "Mistral - Mixtral 8x7b": "mixtral-8x7b",
+        "Mistral - Mixtral 8x7B": "mixtral-8x7b",
         "Mistral - Mistral 7B Instruct": "mistral-7b-instruct",
         "Cohere - Command R+": "command-r-plus",
         "AWS Bedrock - Titan": "bedrock-titan",
@@ -189,6 +564,8 @@ if etapa_atual == 0:
 
 # Etapa 2: Upload do dashboard com layout moderno
 elif etapa_atual == 1:
+    from imagens import imagem_valida
+
     st.markdown("""
     <div style='background-color:#f0f2f6; padding: 20px 30px; border-radius: 12px; margin-bottom: 25px;'>
         <h2 style='color:#1f77b4; margin-bottom: 10px;'>📥 Etapa 2: Upload do Dashboard</h2>
@@ -202,12 +579,14 @@ elif etapa_atual == 1:
 
     with col1:
         img = st.file_uploader("📷 Envie uma imagem do dashboard (PNG ou JPG):", type=["png", "jpg"])
+        if img and not imagem_valida(img.getvalue()):
+            st.error("❌ O arquivo enviado não é uma imagem PNG ou JPG válida.")
+            img = None
         if img:
-            caminho_img_temp = os.path.join(DATA_DIR, "uploaded_image.png")
-            with open(caminho_img_temp, "wb") as f:
-                f.write(img.read())
+            with instrumentacao.span("upload_imagem", bytes=img.size):
+                salvar_bytes(CAMINHO_IMAGEM, img.getvalue())
             st.success("Imagem enviada com sucesso!")
-            st.image(caminho_img_temp, caption="📊 Dashboard carregado", use_container_width=True)
+            st.image(CAMINHO_IMAGEM, caption="📊 Dashboard carregado", use_container_width=True)
 
     with col2:
         st.info("💡 Dica: Use screenshots diretas da tela do MicroStrategy, Tableau, Qlik etc. Isso ajuda a IA a entender a estrutura visual com mais precisão.")
@@ -223,6 +602,8 @@ elif etapa_atual == 1:
 
 # Etapa 3: Extração visual com layout moderno e checklist
 elif etapa_atual == 2:
+    from inventario import chave_componente, rotulo_componente
+
     st.markdown("""
     <div style='background-color:#f0f2f6; padding: 20px 30px; border-radius: 12px; margin-bottom: 25px;'>
         <h2 style='color:#1f77b4; margin-bottom: 10px;'>🔍 Etapa 3: Extração Visual com IA</h2>
@@ -234,25 +615,21 @@ elif etapa_atual == 2:
 
     st.image(CAMINHO_IMAGEM, caption="📷 Imagem do Dashboard enviado", use_container_width=True)
 
-    if st.button("🤖 Executar extração visual com GPT-4o"):
-        with open(CAMINHO_IMAGEM, "rb") as f:
-            b64 = base64.b64encode(f.read()).decode("utf-8")
-
-        prompt = ("Você é um especialista em BI. Analise a imagem de um dashboard e extraia os elementos visuais, como gráficos, tabelas, indicadores, KPIs, textos, campos, filtros e menus.")
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[{"role": "user", "content": [
-                {"type": "text", "text": prompt},
-                {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{b64}"}}
-            ]}],
-            temperature=0.3
-        )
-        resultado = response.choices[0].message.content
-        salvar_json(CAMINHO_OCR, {"ocr": resultado})
-        progresso[etapas[2]] = True
-        salvar_json(CAMINHO_PROGRESSO, progresso)
-        salvar_etapa_atual(3)
-        st.rerun()
+    modo_extracao = st.radio(
+        "Modo de extração:",
+        ["Imagem inteira", "Mosaico de recortes (alta resolução)"],
+        horizontal=True,
+        help="O mosaico divide a imagem em recortes sobrepostos extraídos em paralelo, o que ajuda a detectar KPIs pequenos em telas 4K."
+    )
+
+    job_extracao = fila_jobs.job_ativo(id_migracao, "extracao")
+    if job_extracao:
+        acompanhar_job(job_extracao["id"], "Extraindo os elementos visuais do dashboard")
+    else:
+        exibir_falha_job("extracao")
+        if st.button("🤖 Executar extração visual com GPT-4o"):
+            fila_jobs.submeter(id_migracao, "extracao", executar_extracao, modo_extracao)
+            st.rerun()
 
     texto_ocr = carregar_json(CAMINHO_OCR).get("ocr", "")
     if texto_ocr:
@@ -269,22 +646,27 @@ elif etapa_atual == 2:
         <p>Marque os itens confirmados na imagem. Se algum elemento não foi detectado, adicione manualmente abaixo.</p>
         """, unsafe_allow_html=True)
 
-        componentes_extraidos = [linha for linha in texto_ocr.split("\n") if any(x in linha.lower() for x in ["gráfico", "kpi", "filtro", "campo", "tabela"])]
-        checklist = st.session_state.get("checklist_etapa3", {})
-
-        for i, comp in enumerate(componentes_extraidos):
-            key = f"comp_{i}"
-            if key not in checklist:
-                checklist[key] = {"texto": comp.strip(), "checado": False}
+        componentes_extraidos = carregar_json(CAMINHO_INVENTARIO).get("componentes", [])
+        # Salvo em disco: os itens manuais entram na geração do roteiro da etapa 5
+        checklist = carregar_json(CAMINHO_CHECKLIST_EXTRACAO)
+
+        # Um item por componente do inventário mais os itens manuais; a chave vem do conteúdo do
+        # componente, então uma nova extração só mantém marcados os componentes que continuam iguais
+        chaves_inventario = {f"comp_{chave_componente(comp)}": comp for comp in componentes_extraidos}
+        checklist = {k: v for k, v in checklist.items() if k in chaves_inventario or k.startswith("manual_")}
+        for key, comp in chaves_inventario.items():
+            checklist[key] = {"texto": rotulo_componente(comp), "checado": checklist.get(key, {}).get("checado", False)}
+        for key in checklist:
             checklist[key]["checado"] = st.checkbox(checklist[key]["texto"], checklist[key]["checado"], key=key)
 
         novo_item = st.text_input("➕ Adicionar elemento manualmente:", key="novo_item_input")
         if st.button("Adicionar item", key="adicionar_item_btn") and novo_item.strip():
-            novo_key = f"manual_{len(checklist)}"
+            novo_key = f"manual_{sum(k.startswith('manual_') for k in checklist)}"
             checklist[novo_key] = {"texto": novo_item.strip(), "checado": False}
+            salvar_json(CAMINHO_CHECKLIST_EXTRACAO, checklist)
             st.rerun()
 
-        st.session_state["checklist_etapa3"] = checklist
+        salvar_json(CAMINHO_CHECKLIST_EXTRACAO, checklist)
 
         if st.button("➡️ Avançar para validação de dados"):
             progresso[etapas[2]] = True
@@ -295,6 +677,12 @@ elif etapa_atual == 2:
 
 # Etapa 4: Validação de dados com layout moderno e conexão flexível
 elif etapa_atual == 3:
+    from armazenamento_objetos import objeto_azure, objeto_s3
+    from cache_colunar import sondar_com_cache
+    from conexoes_sql import consulta_livre, consulta_tabela, url_conexao, url_databricks
+    from esquema_dados import gerar_esquema, sondar_sql
+    from inventario import campos_componentes
+
     st.markdown("""
     <div style='background-color:#f9f9f9; padding: 25px; border-radius: 12px;'>
         <h2 style='color:#1f77b4;'>🔗 Etapa 4: Validação de Dados</h2>
@@ -305,21 +693,33 @@ elif etapa_atual == 3:
     modo_dados = st.radio("Fonte de dados:", ["📁 Upload de arquivo", "🔌 Conectar a banco ou nuvem"])
 
     df = None
-    colunas_disponiveis = []
+    sondagem = None
+    origem_dados = ""
 
     if modo_dados == "📁 Upload de arquivo":
         file = st.file_uploader("📁 Envie a base de dados (.xlsx ou .csv)", type=["xlsx", "csv"])
         if file:
-            caminho_base = os.path.join(DATA_DIR, file.name)
-            with open(caminho_base, "wb") as f:
-                f.write(file.read())
+            caminho_base = os.path.join(DIR_MIGRACAO, os.path.basename(file.name))
+            # O upload é copiado para o disco em blocos uma vez só; nos reruns seguintes
+            # vale o hash guardado, que também identifica a base no cache colunar
+            chave_upload = f"hash_upload_{file.file_id}"
+            novo_upload = chave_upload not in st.session_state or not os.path.exists(caminho_base)
+            if novo_upload:
+                file.seek(0)
+                with instrumentacao.span("upload_base", bytes=file.size):
+                    st.session_state[chave_upload] = salvar_em_blocos(caminho_base, file)
 
             try:
-                if file.name.endswith(".csv"):
-                    df = pd.read_csv(caminho_base)
+                if novo_upload:
+                    sondagem = sondar_medindo(
+                        "arquivo", file.name,
+                        lambda: sondar_com_cache(caminho_base, DIR_CACHE_COLUNAR, st.session_state[chave_upload]),
+                        bytes_lidos=file.size
+                    )
                 else:
-                    df = pd.read_excel(caminho_base, engine="openpyxl")
-                colunas_disponiveis = list(df.columns)
+                    sondagem = sondar_com_cache(caminho_base, DIR_CACHE_COLUNAR, st.session_state[chave_upload])
+                origem_dados = file.name
+                df = sondagem.preview
                 st.success("✅ Base carregada com sucesso!")
                 st.markdown("### 📊 Pré-visualização dos dados")
                 st.dataframe(df.head())
@@ -345,20 +745,10 @@ elif etapa_atual == 3:
 
             if st.button("Conectar e carregar dados"):
                 try:
-                    if tipo_conexao == "MySQL":
-                        import pymysql
-                        conn = pymysql.connect(host=host, user=usuario, password=senha, database=database, port=int(porta))
-                    elif tipo_conexao == "PostgreSQL":
-                        import psycopg2
-                        conn = psycopg2.connect(host=host, user=usuario, password=senha, dbname=database, port=int(porta))
-                    elif tipo_conexao == "SQL Server":
-                        import pyodbc
-                        conn_str = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER={host},{porta};DATABASE={database};UID={usuario};PWD={senha}"
-                        conn = pyodbc.connect(conn_str)
-
-                    df = pd.read_sql(f"SELECT * FROM {tabela}", conn)
-                    conn.close()
-                    colunas_disponiveis = list(df.columns)
+                    engine = obter_engine(url_conexao(tipo_conexao, host, porta, database, usuario, senha))
+                    sondagem = sondar_medindo(tipo_conexao, f"{database}.{tabela}", lambda: sondar_sql(engine, consulta_tabela(tabela)))
+                    origem_dados = f"{tipo_conexao}: {database}.{tabela}"
+                    df = sondagem.preview
                     st.success("✅ Dados carregados com sucesso!")
                     st.dataframe(df.head())
                 except Exception as e:
@@ -371,10 +761,10 @@ elif etapa_atual == 3:
 
             if st.button("Conectar ao Databricks"):
                 try:
-                    import sqlalchemy
-                    engine = sqlalchemy.create_engine(f"{jdbc_url};AuthMech=3;UID=token;PWD={token}")
-                    df = pd.read_sql(query, con=engine)
-                    colunas_disponiveis = list(df.columns)
+                    engine = obter_engine(url_databricks(jdbc_url, token))
+                    sondagem = sondar_medindo("Databricks", "Databricks", lambda: sondar_sql(engine, consulta_livre(query)))
+                    origem_dados = "Databricks"
+                    df = sondagem.preview
                     st.success("✅ Dados carregados do Databricks!")
                     st.dataframe(df.head())
                 except Exception as e:
@@ -386,18 +776,18 @@ elif etapa_atual == 3:
             bucket = st.text_input("Bucket")
             caminho_arquivo = st.text_input("Caminho do arquivo (ex: pasta/arquivo.csv)")
             tipo_arquivo = st.selectbox("Tipo de arquivo", ["csv", "parquet"])
+            leitura_completa = st.checkbox(OPCAO_LEITURA_COMPLETA, key="leitura_completa_s3")
 
             if st.button("Conectar ao S3"):
                 try:
-                    import boto3, io
-                    s3 = boto3.client('s3', aws_access_key_id=access_key, aws_secret_access_key=secret_key)
-                    obj = s3.get_object(Bucket=bucket, Key=caminho_arquivo)
-                    if tipo_arquivo == "csv":
-                        df = pd.read_csv(obj['Body'])
-                    else:
-                        import pyarrow.parquet as pq
-                        df = pq.read_table(obj['Body']).to_pandas()
-                    colunas_disponiveis = list(df.columns)
+                    tamanho, ler_intervalo = objeto_s3(obter_cliente_s3(access_key, secret_key), bucket, caminho_arquivo)
+                    sondagem = sondar_medindo(
+                        "s3", f"s3://{bucket}/{caminho_arquivo}",
+                        lambda: sondar_objeto_remoto(tamanho, ler_intervalo, tipo_arquivo, caminho_arquivo, leitura_completa),
+                        bytes_lidos=tamanho
+                    )
+                    origem_dados = f"s3://{bucket}/{caminho_arquivo}"
+                    df = sondagem.preview
                     st.success("✅ Arquivo carregado do S3!")
                     st.dataframe(df.head())
                 except Exception as e:
@@ -408,52 +798,71 @@ elif etapa_atual == 3:
             container = st.text_input("Nome do container")
             blob = st.text_input("Caminho do arquivo")
             tipo_arquivo = st.selectbox("Tipo de arquivo", ["csv", "parquet"])
+            leitura_completa = st.checkbox(OPCAO_LEITURA_COMPLETA, key="leitura_completa_azure")
 
             if st.button("Conectar ao Azure Blob"):
                 try:
-                    from azure.storage.blob import BlobServiceClient
-                    import io
-                    blob_service_client = BlobServiceClient.from_connection_string(conn_str)
-                    blob_client = blob_service_client.get_blob_client(container=container, blob=blob)
-                    stream = blob_client.download_blob().readall()
-                    if tipo_arquivo == "csv":
-                        df = pd.read_csv(io.BytesIO(stream))
-                    else:
-                        import pyarrow.parquet as pq
-                        df = pq.read_table(io.BytesIO(stream)).to_pandas()
-                    colunas_disponiveis = list(df.columns)
+                    tamanho, ler_intervalo = objeto_azure(obter_cliente_azure(conn_str), container, blob)
+                    sondagem = sondar_medindo(
+                        "azure", f"{container}/{blob}",
+                        lambda: sondar_objeto_remoto(tamanho, ler_intervalo, tipo_arquivo, blob, leitura_completa),
+                        bytes_lidos=tamanho
+                    )
+                    origem_dados = f"{container}/{blob}"
+                    df = sondagem.preview
                     st.success("✅ Arquivo carregado do Azure Blob!")
                     st.dataframe(df.head())
                 except Exception as e:
                     st.error(f"Erro ao acessar Azure Blob: {e}")
 
+    # Snapshot do esquema usado pelas etapas seguintes e pela exportação
+    if sondagem is not None:
+        salvar_json(CAMINHO_ESQUEMA, gerar_esquema(sondagem, origem_dados))
+    elif carregar_colunas_dataset():
+        st.info(f"📄 Usando o esquema salvo da base: {carregar_json(CAMINHO_ESQUEMA).get('origem', '')}")
+    colunas_disponiveis = carregar_colunas_dataset()
+
     # Análise com IA
-    if df is not None and len(colunas_disponiveis) > 0:
-        texto_ocr = carregar_json(CAMINHO_OCR).get("ocr", "")
+    if len(colunas_disponiveis) > 0:
+        descricao = descricao_dashboard()
 
         st.markdown("<br><h4>🤖 Análise de Compatibilidade com o Dashboard</h4>", unsafe_allow_html=True)
-        with st.spinner("Analisando com inteligência artificial..."):
-            prompt = f"""
-Você é um consultor de BI. Um dashboard foi extraído visualmente com o seguinte conteúdo:
-
-{texto_ocr}
-
-A seguir, temos uma base de dados com estas colunas:
-{', '.join(colunas_disponiveis)}
 
-Sua tarefa:
-1. Verifique quais gráficos, KPIs, filtros e tabelas descritos no dashboard podem ser construídos com os dados disponíveis.
-2. Apresente uma tabela listando o nome do componente, os campos correspondentes e se está compatível (Sim/Não).
-3. Quando algum campo não for encontrado, sugira como ele pode ser criado (ex: "Ticket Médio = receita / quantidade").
-4. Apresente tudo de forma clara para o analista entender rapidamente o que pode ser implementado e o que falta.
-"""
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.2
+        # Correspondência local campo -> coluna: só o que ficar pendente vai para o modelo
+        campos_dashboard = campos_componentes(carregar_json(CAMINHO_INVENTARIO).get("componentes", []))
+        correspondencias = None
+        if campos_dashboard:
+            correspondencias = corresponder_campos(tuple(campos_dashboard), tuple(colunas_disponiveis))
+            salvar_json(CAMINHO_CORRESPONDENCIAS, correspondencias)
+            st.markdown(
+                f"🧩 **Correspondência local:** {len(correspondencias['resolvidos'])} de {len(campos_dashboard)} "
+                "campos associados automaticamente às colunas da base"
             )
-            analise_dados = response.choices[0].message.content
-            st.markdown(analise_dados)
+            with st.expander("Ver correspondências campo → coluna"):
+                st.dataframe(
+                    [{"campo": campo, "coluna": c["coluna"], "similaridade": c["pontuacao"], "situação": "resolvido"}
+                     for campo, c in correspondencias["resolvidos"].items()]
+                    + [{"campo": campo, "coluna": ", ".join(c["coluna"] for c in candidatos), "similaridade": candidatos[0]["pontuacao"] if candidatos else 0.0, "situação": "pendente"}
+                       for campo, candidatos in correspondencias["pendentes"].items()],
+                    hide_index=True
+                )
+
+        # A análise só é refeita quando o OCR ou o conjunto de colunas mudam
+        assinatura = assinatura_analise(descricao, colunas_disponiveis)
+        analise_salva = carregar_json(CAMINHO_ANALISE)
+        job_analise = fila_jobs.job_ativo(id_migracao, "analise")
+        if job_analise:
+            acompanhar_job(job_analise["id"], "Analisando com inteligência artificial")
+        else:
+            ultimo_job = exibir_falha_job("analise")
+            falhou = ultimo_job is not None and ultimo_job["status"] in ("falhou", "interrompido")
+            reanalisar = st.button("🔄 Reanalisar compatibilidade")
+            # Após uma falha, só tenta de novo quando o analista pedir
+            if reanalisar or (analise_salva.get("assinatura") != assinatura and not falhou):
+                fila_jobs.submeter(id_migracao, "analise", executar_analise, descricao, colunas_disponiveis, correspondencias, assinatura, reanalisar)
+                st.rerun()
+            if analise_salva.get("assinatura") == assinatura:
+                st.markdown(analise_salva["analise"])
 
         if st.button("➡️ Avançar para geração do roteiro técnico"):
             progresso[etapas[3]] = True
@@ -473,93 +882,34 @@ elif etapa_atual == 4:
     </div>
     """, unsafe_allow_html=True)
 
-    texto_ocr = carregar_json(CAMINHO_OCR).get("ocr", "")
-    colunas_disponiveis = []
-
-    try:
-        arquivos = os.listdir(DATA_DIR)
-        planilhas = [f for f in arquivos if f.endswith((".csv", ".xlsx"))]
-        if planilhas:
-            caminho_arquivo = os.path.join(DATA_DIR, planilhas[0])
-            if caminho_arquivo.endswith(".csv"):
-                df_base = pd.read_csv(caminho_arquivo)
-            else:
-                df_base = pd.read_excel(caminho_arquivo, engine="openpyxl")
-            colunas_disponiveis = list(df_base.columns)
-    except Exception as e:
-        st.warning("⚠️ Não foi possível ler a base de dados.")
-
-    if st.button("🚀 Gerar roteiro técnico completo"):
-        with st.spinner("Gerando roteiro com instruções e medidas DAX..."):
-            prompt_roteiro = f"""
-Você é um especialista em BI migrando dashboards do MicroStrategy para o Power BI.
-
-Dashboard extraído visualmente:
-{texto_ocr}
-
-Base de dados com colunas:
-{', '.join(colunas_disponiveis)}
-
-Gere um roteiro completo com:
-1. Conexão da base
-2. Transformações necessárias (Power Query)
-3. Layout visual do dashboard
-4. Tipo de gráficos, eixos, valores e filtros
-5. Interações como drill-down e slicers
-6. Onde e como posicionar os elementos visuais
-7. Recomendações práticas para performance e usabilidade
-"""
-            response_roteiro = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt_roteiro}],
-                temperature=0.2
-            )
-            roteiro = response_roteiro.choices[0].message.content
-
-            prompt_dax = f"""
-Você é um especialista em Power BI.
-
-Com base no seguinte dashboard (extraído do MicroStrategy):
-{texto_ocr}
-
-E nesta base de dados com colunas:
-{', '.join(colunas_disponiveis)}
-
-Gere as principais **medidas DAX** que devem ser criadas no Power BI.
-
-Para cada medida informe:
-- Nome da Medida
-- Fórmula DAX
-- Descrição do que ela faz
-- Onde ela deve ser usada (gráfico, KPI, filtro etc.)
-"""
-            response_dax = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "user", "content": prompt_dax}],
-                temperature=0.2
-            )
-            medidas_dax = response_dax.choices[0].message.content
+    descricao = descricao_dashboard()
+    colunas_disponiveis = carregar_colunas_dataset()
 
-            roteiro_completo = f"""
-## 📘 Roteiro Técnico
+    if not colunas_disponiveis:
+        st.warning("⚠️ Nenhuma base de dados validada na etapa 4.")
 
-{roteiro}
-
----
-
-## 🧮 Medidas DAX Recomendadas
-
-{medidas_dax}
-"""
-            salvar_json(CAMINHO_ROTEIRO, {"conteudo": roteiro_completo})
-            progresso[etapas[4]] = True
-            salvar_json(CAMINHO_PROGRESSO, progresso)
-            salvar_etapa_atual(5)
+    job_roteiro = fila_jobs.job_ativo(id_migracao, "roteiro")
+    if job_roteiro:
+        acompanhar_job(job_roteiro["id"], "Gerando roteiro com instruções e medidas DAX")
+    else:
+        exibir_falha_job("roteiro")
+        rotulo_botao = "🔄 Atualizar roteiro (só as partes alteradas)" if carregar_json(CAMINHO_ROTEIRO).get("partes") else "🚀 Gerar roteiro técnico completo"
+        if st.button(rotulo_botao):
+            fila_jobs.submeter(id_migracao, "roteiro", executar_roteiro, descricao, colunas_disponiveis)
             st.rerun()
 
-    roteiro_salvo = carregar_json(CAMINHO_ROTEIRO).get("conteudo", "")
+    dados_roteiro = carregar_json(CAMINHO_ROTEIRO)
+    roteiro_salvo = dados_roteiro.get("conteudo", "")
     if roteiro_salvo:
         st.subheader("📄 Roteiro Técnico + Medidas DAX")
+        if dados_roteiro.get("partes"):
+            st.caption(f"♻️ {dados_roteiro['partes'] - dados_roteiro['geradas']} de {dados_roteiro['partes']} partes reaproveitadas da geração anterior")
+        if dados_roteiro.get("medidas_corrigidas"):
+            st.caption(f"🔧 {dados_roteiro['medidas_corrigidas']} medida(s) DAX corrigida(s) após a verificação local")
+        if dados_roteiro.get("violacoes_dax"):
+            with st.expander(f"⚠️ {len(dados_roteiro['violacoes_dax'])} problema(s) nas medidas DAX que não foram corrigidos"):
+                for violacao in dados_roteiro["violacoes_dax"]:
+                    st.markdown(f"- **[{violacao['medida']}]** ({violacao['parte']}): {violacao['mensagem']}")
         st.markdown(roteiro_salvo, unsafe_allow_html=True)
 
         if st.button("➡️ Avançar para checklist visual"):
@@ -570,6 +920,11 @@ Para cada medida informe:
 
 # Etapa 6: Checklist visual com comparação de imagens e elementos modernizado
 elif etapa_atual == 5:
+    from comparacao_visual import recortar_roteiro, recortes_divergentes
+    from extracao_visual import mensagens_imagem
+    from imagens import imagem_valida
+    from inventario import componentes_nas_regioes, resumo_componentes
+
     st.markdown("""
     <div style='background-color:#f5f5f5; padding: 25px; border-radius: 12px;'>
         <h2 style='color:#1f77b4;'>🖼️ Etapa 6: Checklist Visual e Comparação de Dashboards</h2>
@@ -577,17 +932,22 @@ elif etapa_atual == 5:
     </div>
     """, unsafe_allow_html=True)
 
-    texto_ocr = carregar_json(CAMINHO_OCR).get("ocr", "")
+    inventario = carregar_json(CAMINHO_INVENTARIO)
     roteiro = carregar_json(CAMINHO_ROTEIRO).get("conteudo", "")
     checklist_por_componente = carregar_json(CAMINHO_CHECKLIST)
+    colunas_disponiveis = carregar_colunas_dataset()
     caminho_img_original = CAMINHO_IMAGEM
 
     uploaded_powerbi_img = st.file_uploader("📤 Envie o screenshot do dashboard recriado no Power BI", type=["png", "jpg"], key="powerbi_img")
+    if uploaded_powerbi_img and not imagem_valida(uploaded_powerbi_img.getvalue()):
+        st.error("❌ O arquivo enviado não é uma imagem PNG ou JPG válida.")
+        uploaded_powerbi_img = None
+
+    job_comparacao = fila_jobs.job_ativo(id_migracao, "comparacao")
 
     if uploaded_powerbi_img:
-        caminho_img_nova = os.path.join(DATA_DIR, "powerbi_dashboard.png")
-        with open(caminho_img_nova, "wb") as f:
-            f.write(uploaded_powerbi_img.read())
+        caminho_img_nova = CAMINHO_IMAGEM_POWERBI
+        salvar_bytes(caminho_img_nova, uploaded_powerbi_img.getvalue())
 
         st.markdown("### 🔍 Visualização lado a lado")
         col1, col2 = st.columns(2)
@@ -596,42 +956,95 @@ elif etapa_atual == 5:
         with col2:
             st.image(caminho_img_nova, caption="Novo - Power BI", use_container_width=True)
 
-        if st.button("🔎 Comparar dashboards e gerar checklist"):
-            with open(caminho_img_original, "rb") as f1, open(caminho_img_nova, "rb") as f2:
-                img_original_b64 = base64.b64encode(f1.read()).decode("utf-8")
-                img_nova_b64 = base64.b64encode(f2.read()).decode("utf-8")
+        # Pré-comparação local: roda sem rede e define o que precisa ir para o modelo
+        st.markdown("### 🌡️ Diferenças detectadas localmente")
+        limiar = st.slider("Similaridade mínima para considerar uma região idêntica", 0.50, 0.99, 0.85, 0.01)
+        with open(caminho_img_original, "rb") as f1, open(caminho_img_nova, "rb") as f2:
+            comparacao_local = comparar_localmente(f1.read(), f2.read(), limiar)
+        salvar_bytes(CAMINHO_MAPA_CALOR, comparacao_local["mapa_calor"])
+        regioes_divergentes = [r for r in comparacao_local["regioes"] if r["divergente"]]
+
+        col_mapa, col_regioes = st.columns([2, 1])
+        with col_mapa:
+            st.image(comparacao_local["mapa_calor"], caption="Mapa de diferenças (vermelho = divergente)", use_container_width=True)
+        with col_regioes:
+            st.metric("Similaridade global (SSIM)", f"{comparacao_local['ssim_global']:.2f}")
+            st.metric("Regiões divergentes", f"{len(regioes_divergentes)} de {len(comparacao_local['regioes'])}")
+            st.dataframe(
+                [{"linha": r["linha"], "coluna": r["coluna"], "ssim": r["ssim"], "divergente": r["divergente"]} for r in comparacao_local["regioes"]],
+                hide_index=True
+            )
+
+        if not job_comparacao and st.button("🔎 Comparar dashboards e gerar checklist"):
+            checklist_por_componente["comparacao_local"] = {
+                "ssim_global": comparacao_local["ssim_global"],
+                "regioes": comparacao_local["regioes"]
+            }
+            if not regioes_divergentes:
+                checklist_por_componente["comparacao_visual_final"] = (
+                    f"✅ Nenhuma região divergente encontrada (similaridade global {comparacao_local['ssim_global']:.2f}). "
+                    "O dashboard recriado no Power BI corresponde visualmente ao original."
+                )
+                salvar_json(CAMINHO_CHECKLIST, checklist_por_componente)
+                st.rerun()
+
+            recortes = recortes_divergentes(comparacao_local)
+            imagens_recortes = []
+            descricao_regioes = []
+            for n, (regiao, recorte_original, recorte_novo) in enumerate(recortes, start=1):
+                imagens_recortes += [recorte_original, recorte_novo]
+                descricao_regioes.append(
+                    f"- Região {n}: linha {regiao['linha']}, coluna {regiao['coluna']} da grade, similaridade {regiao['ssim']:.2f} "
+                    f"(imagens {2 * n - 1} e {2 * n})"
+                )
+            descricao_regioes = "\n".join(descricao_regioes)
+            roteiro_visual = recortar_roteiro(roteiro)
+
+            # Só os componentes do inventário que aparecem nas regiões enviadas
+            altura_trabalho, largura_trabalho = comparacao_local["imagens"][0].shape[:2]
+            caixas_enviadas = [
+                [x0 * 1000 / largura_trabalho, y0 * 1000 / altura_trabalho, x1 * 1000 / largura_trabalho, y1 * 1000 / altura_trabalho]
+                for (x0, y0, x1, y1) in (regiao["caixa"] for regiao, _, _ in recortes)
+            ]
+            componentes_afetados = componentes_nas_regioes(inventario, caixas_enviadas)
+            descricao_componentes = (
+                "Componentes do dashboard original nessas regiões (id | tipo | título | visual | campos | filtros):\n"
+                + resumo_componentes(componentes_afetados)
+            ) if componentes_afetados else ""
 
             prompt = f"""
-Você é um consultor de BI. Compare as imagens de dois dashboards:
+Você é um consultor de BI. Compare o dashboard gerado no MicroStrategy com o recriado no Power BI.
+
+Uma comparação local dividiu as telas em uma grade e encontrou as regiões divergentes abaixo; as regiões idênticas foram omitidas.
+Para cada região, a primeira imagem é o recorte do original (MicroStrategy) e a segunda é o recorte do Power BI:
+{descricao_regioes}
 
-- O primeiro foi gerado no MicroStrategy (imagem 1)
-- O segundo foi recriado no Power BI (imagem 2)
+{descricao_componentes}
 
 Objetivo:
 1. Verifique se os elementos visuais (gráficos, KPIs, filtros, layout) foram mantidos.
 2. Liste os componentes como "Compatível", "Parcial" ou "Incompatível".
 3. Quando houver discrepâncias, explique o motivo e gere instruções para o analista corrigir no Power BI.
-4. Considere também o roteiro abaixo, que foi usado como base para construir o novo dashboard:
+4. Considere também o trecho visual do roteiro abaixo, que foi usado como base para construir o novo dashboard:
 
-{roteiro}
+{roteiro_visual}
+
+Colunas disponíveis na base de dados: {', '.join(colunas_disponiveis)}
 
 Responda com uma tabela comparativa seguida das instruções de correção.
 """
 
-            with st.spinner("Executando comparação visual com IA..."):
-                response = client.chat.completions.create(
-                    model="gpt-4o",
-                    messages=[{"role": "user", "content": [
-                        {"type": "text", "text": prompt},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_original_b64}"}},
-                        {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{img_nova_b64}"}}
-                    ]}],
-                    temperature=0.3
-                )
-                analise_final = response.choices[0].message.content
-                checklist_por_componente["comparacao_visual_final"] = analise_final
-                salvar_json(CAMINHO_CHECKLIST, checklist_por_componente)
-                st.rerun()
+            fila_jobs.submeter(
+                id_migracao, "comparacao", executar_comparacao,
+                mensagens_imagem(prompt, *imagens_recortes, mime="image/jpeg"),
+                checklist_por_componente["comparacao_local"]
+            )
+            st.rerun()
+
+    if job_comparacao:
+        acompanhar_job(job_comparacao["id"], "Executando comparação visual com IA")
+    else:
+        exibir_falha_job("comparacao")
 
     if "comparacao_visual_final" in checklist_por_componente:
         st.subheader("📋 Resultado da Análise Visual")
@@ -647,6 +1060,8 @@ Responda com uma tabela comparativa seguida das instruções de correção.
 
 # Etapa 7: Exportação Final com Relatório Executivo Modernizado
 elif etapa_atual == 6:
+    from relatorio import gerar_relatorio_docx, gerar_relatorio_pdf
+
     st.markdown("""
     <div style='background-color:#e8f4ff; padding: 25px; border-radius: 12px;'>
         <h2 style='color:#1f77b4;'>📤 Etapa Final: Exportação e Relatório Executivo</h2>
@@ -661,83 +1076,47 @@ elif etapa_atual == 6:
     </div>
     """, unsafe_allow_html=True)
 
-    if st.button("📄 Gerar Relatório Executivo (.docx)"):
-        from docx import Document
-        from docx.shared import Inches
-        from datetime import datetime
-
-        caminho_img_original = os.path.join(DATA_DIR, "uploaded_image.png")
-        caminho_img_novo = os.path.join(DATA_DIR, "powerbi_dashboard.png")
-        ocr = carregar_json(CAMINHO_OCR).get("ocr", "")
-        roteiro = carregar_json(CAMINHO_ROTEIRO).get("conteudo", "")
-        checklist = carregar_json(CAMINHO_CHECKLIST)
-        progresso = carregar_json(CAMINHO_PROGRESSO)
-
-        doc = Document()
-        doc.add_heading("Relatório Executivo de Migração de Dashboard", 0)
-        doc.add_paragraph(f"Projeto: DashMigrate Pro+")
-        doc.add_paragraph(f"Data da Migração: {datetime.now().strftime('%d/%m/%Y')}")
-        doc.add_paragraph("Plataforma Origem: MicroStrategy")
-        doc.add_paragraph("Plataforma Destino: Power BI")
-        doc.add_paragraph("Analista Responsável: __________________________")
-        doc.add_page_break()
-
-        doc.add_heading("Resumo Executivo", level=1)
-        doc.add_paragraph("Este relatório apresenta a análise completa da migração de um dashboard da plataforma MicroStrategy para o Power BI, incluindo os resultados da extração visual, validação dos dados, roteiro técnico, comparação visual e checklist final de qualidade.")
-
-        doc.add_heading("Status das Etapas", level=2)
-        table = doc.add_table(rows=1, cols=2)
-        table.style = "Table Grid"
-        hdr_cells = table.rows[0].cells
-        hdr_cells[0].text = 'Etapa'
-        hdr_cells[1].text = 'Status'
-        for etapa, status in progresso.items():
-            row = table.add_row().cells
-            row[0].text = etapa
-            row[1].text = "✅ Completa" if status else "⏳ Pendente"
-        doc.add_page_break()
-
-        doc.add_heading("Comparação Visual dos Dashboards", level=1)
-        doc.add_paragraph("As imagens abaixo representam o dashboard original (MicroStrategy) e o novo dashboard criado no Power BI.")
-        if os.path.exists(caminho_img_original):
-            doc.add_picture(caminho_img_original, width=Inches(5.5))
-            doc.add_paragraph("🔼 Dashboard Original (MicroStrategy)")
-        if os.path.exists(caminho_img_novo):
-            doc.add_picture(caminho_img_novo, width=Inches(5.5))
-            doc.add_paragraph("🔼 Dashboard Novo (Power BI)")
-        doc.add_page_break()
-
-        doc.add_heading("Componentes Migrados - Visão Inicial", level=1)
-        doc.add_paragraph("Resumo dos componentes identificados no dashboard original via OCR:")
-        doc.add_paragraph(ocr)
-        doc.add_page_break()
-
-        doc.add_heading("Roteiro Técnico de Migração", level=1)
-        doc.add_paragraph(roteiro)
-        doc.add_page_break()
-
-        doc.add_heading("Checklist de Verificação e Comparação Final", level=1)
-        comparacao = checklist.get("comparacao_visual_final", checklist.get("analise_comparativa", ""))
-        doc.add_paragraph(comparacao)
-        doc.add_page_break()
-
-        doc.add_heading("Considerações Finais", level=1)
-        doc.add_paragraph(
-            "A migração apresenta alto grau de compatibilidade. Recomenda-se revisar campos marcados como parcialmente compatíveis ou incompatíveis e aplicar os ajustes listados no roteiro técnico. "
-            "A abordagem automatizada do DashMigrate Pro+ facilita a reprodutibilidade, reduz erros e padroniza o processo de migração de dashboards."
+    if st.button("📄 Gerar Relatório Executivo (.docx e .pdf)"):
+        dados_relatorio = dict(
+            ocr=carregar_json(CAMINHO_OCR).get("ocr", ""),
+            roteiro=carregar_json(CAMINHO_ROTEIRO).get("conteudo", ""),
+            checklist=carregar_json(CAMINHO_CHECKLIST),
+            progresso=carregar_json(CAMINHO_PROGRESSO),
+            esquema_dataset=carregar_json(CAMINHO_ESQUEMA),
+            caminho_img_original=CAMINHO_IMAGEM,
+            caminho_img_novo=CAMINHO_IMAGEM_POWERBI,
+            diretorio_cache_imagens=DIR_CACHE_IMAGENS
         )
-
-        caminho_saida = os.path.join("output", "relatorio_executivo_dashmigrate.docx")
-        os.makedirs("output", exist_ok=True)
-        doc.save(caminho_saida)
-
-        with open(caminho_saida, "rb") as file:
+        with st.spinner("Gerando relatório..."):
+            with instrumentacao.span("relatorio_docx"):
+                gerar_relatorio_docx(CAMINHO_RELATORIO_DOCX, **dados_relatorio)
+            with instrumentacao.span("relatorio_pdf"):
+                gerar_relatorio_pdf(CAMINHO_RELATORIO_PDF, **dados_relatorio)
+
+    if os.path.exists(CAMINHO_RELATORIO_DOCX):
+        # Os arquivos só são lidos quando o botão é clicado, não a cada rerun
+        col_docx, col_pdf, col_zip = st.columns(3)
+        with col_docx:
             st.download_button(
-                label="📥 Baixar Relatório Executivo (.docx)",
-                data=file,
+                label="📥 Baixar Relatório (.docx)",
+                data=lambda: ler_arquivo(CAMINHO_RELATORIO_DOCX),
                 file_name="relatorio_executivo_dashmigrate.docx",
                 mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
             )
+        with col_pdf:
+            st.download_button(
+                label="📥 Baixar Relatório (.pdf)",
+                data=lambda: ler_arquivo(CAMINHO_RELATORIO_PDF),
+                file_name="relatorio_executivo_dashmigrate.pdf",
+                mime="application/pdf"
+            )
+        with col_zip:
+            st.download_button(
+                label="📦 Baixar pacote completo (.zip)",
+                data=lambda: ler_arquivo(montar_pacote_migracao()),
+                file_name=f"dashmigrate_{id_migracao}.zip",
+                mime="application/zip"
+            )
 
     if st.button("✅ Encerrar e avaliar experiência"):
         salvar_etapa_atual(7)
@@ -796,6 +1175,7 @@ elif etapa_atual == 7:
             st.session_state.clear()
             st.rerun()
 
-
-
-
+# Um span por entrada na etapa: os reruns de cada clique e digitação na mesma etapa não entram
+if st.session_state.get("etapa_medida") != (id_migracao, etapa_atual):
+    st.session_state["etapa_medida"] = (id_migracao, etapa_atual)
+    instrumentacao.registrar_span(f"etapa_{etapa_atual + 1}", time.perf_counter() - inicio_etapa, id_migracao=id_migracao)
@@ -0,0 +1,155 @@
+import os
+
+import pandas as pd
+
+# Sondagem de esquema: descobre as colunas e uma pequena pré-visualização de
+# cada fonte sem carregar a base inteira em memória.
+
+LINHAS_PREVIEW = 100
+# Limites das leituras exploratórias em bancos
+MAX_LINHAS_EXPLORACAO = 10_000
+MAX_BYTES_EXPLORACAO = 64 * 1024 * 1024
+LINHAS_POR_BLOCO_SQL = 1_000
+
+
+class SondagemDados:
+    def __init__(self, colunas, preview, total_linhas=None, perfil=None, bytes_lidos=None):
+        self.colunas = colunas
+        self.preview = preview
+        self.total_linhas = total_linhas
+        # Perfil calculado sobre mais linhas que a pré-visualização: {"linhas", "nulos": {coluna: fração}}
+        self.perfil = perfil
+        # Bytes efetivamente transferidos da fonte, quando conhecidos (instrumentação)
+        self.bytes_lidos = bytes_lidos
+
+
+def _nomes_colunas(colunas):
+    return [str(c) for c in colunas]
+
+
+def contar_linhas_arquivo(caminho, tamanho_bloco=1024 * 1024):
+    # Conta quebras de linha em blocos, sem interpretar o conteúdo
+    total = 0
+    with open(caminho, "rb") as f:
+        while True:
+            bloco = f.read(tamanho_bloco)
+            if not bloco:
+                break
+            total += bloco.count(b"\n")
+    return total
+
+
+def gerar_esquema(sondagem, origem, amostras_por_coluna=3):
+    preview = sondagem.preview.infer_objects()
+    nulos = sondagem.perfil["nulos"] if sondagem.perfil else None
+    colunas = []
+    for nome, coluna in zip(sondagem.colunas, preview.columns):
+        valores = preview[coluna]
+        exemplos = valores.dropna().astype(str).unique()[:amostras_por_coluna]
+        if nulos is not None:
+            fracao_nulos = nulos.get(nome, 0.0)
+        else:
+            fracao_nulos = round(float(valores.isna().mean()), 4) if len(valores) else 0.0
+        colunas.append({
+            "nome": nome,
+            "tipo": str(valores.dtype),
+            "nulos": fracao_nulos,
+            "amostras": [str(v) for v in exemplos]
+        })
+    return {
+        "origem": origem,
+        "total_linhas": sondagem.total_linhas,
+        "linhas_amostradas": sondagem.perfil["linhas"] if sondagem.perfil else len(preview),
+        "colunas": colunas
+    }
+
+
+def sondar_csv(origem, linhas=LINHAS_PREVIEW):
+    # Com nrows o pandas lê apenas o cabeçalho e as primeiras linhas
+    preview = pd.read_csv(origem, nrows=linhas)
+    return SondagemDados(_nomes_colunas(preview.columns), preview)
+
+
+def colunas_cabecalho(cabecalho):
+    # Primeira linha da planilha -> nomes das colunas, como o pandas faria
+    cabecalho = list(cabecalho)
+    while cabecalho and cabecalho[-1] is None:
+        cabecalho.pop()
+    return [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(cabecalho)]
+
+
+def sondar_excel(caminho, linhas=LINHAS_PREVIEW):
+    from openpyxl import load_workbook
+
+    # Modo read-only do openpyxl percorre a planilha em streaming
+    wb = load_workbook(caminho, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+        iterador = ws.iter_rows(values_only=True, max_row=linhas + 1)
+        cabecalho = list(next(iterador, ()))
+        dados = list(iterador)
+        total_linhas = ws.max_row - 1 if ws.max_row else None
+    finally:
+        wb.close()
+
+    colunas = colunas_cabecalho(cabecalho)
+    preview = pd.DataFrame([list(linha[:len(colunas)]) for linha in dados], columns=colunas)
+    return SondagemDados(colunas, preview, total_linhas)
+
+
+def sondar_parquet(origem, linhas=LINHAS_PREVIEW):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # O esquema e a contagem de linhas vêm só do rodapé do arquivo; caminhos locais
+    # são mapeados em memória em vez de lidos
+    arquivo = pq.ParquetFile(origem, memory_map=isinstance(origem, str))
+    esquema = arquivo.schema_arrow
+    # Só os primeiros grupos de linhas são lidos (em arquivos remotos, cada um é um Range GET)
+    grupos, lidas = [], 0
+    for i in range(arquivo.num_row_groups):
+        if lidas >= linhas:
+            break
+        grupos.append(arquivo.read_row_group(i))
+        lidas += grupos[-1].num_rows
+    preview = pa.concat_tables(grupos).slice(0, linhas).to_pandas() if grupos else esquema.empty_table().to_pandas()
+    return SondagemDados(_nomes_colunas(esquema.names), preview.head(linhas), arquivo.metadata.num_rows)
+
+
+def sondar_arquivo(caminho, linhas=LINHAS_PREVIEW):
+    extensao = os.path.splitext(caminho)[1].lower()
+    if extensao == ".csv":
+        sondagem = sondar_csv(caminho, linhas)
+        sondagem.total_linhas = max(contar_linhas_arquivo(caminho) - 1, 0)
+        return sondagem
+    if extensao == ".xlsx":
+        return sondar_excel(caminho, linhas)
+    if extensao == ".parquet":
+        return sondar_parquet(caminho, linhas)
+    raise ValueError(f"Formato de arquivo não suportado: {extensao}")
+
+
+def sondar_sql(engine, consulta, linhas=LINHAS_PREVIEW, max_linhas=MAX_LINHAS_EXPLORACAO,
+               max_bytes=MAX_BYTES_EXPLORACAO, tamanho_bloco=LINHAS_POR_BLOCO_SQL):
+    # Leitura exploratória com cursor no servidor: os blocos chegam em sequência,
+    # alimentam a pré-visualização e o perfil de nulos e a leitura para no limite
+    # de linhas (aplicado também no SQL) ou de bytes
+    preview, nulos, lidas, bytes_lidos = None, None, 0, 0
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=tamanho_bloco)
+        for bloco in pd.read_sql(consulta.limit(max_linhas), conn, chunksize=tamanho_bloco):
+            if preview is None:
+                preview, nulos = bloco.head(linhas), bloco.isna().sum()
+            else:
+                if len(preview) < linhas:
+                    preview = pd.concat([preview, bloco.head(linhas - len(preview))], ignore_index=True)
+                nulos = nulos.add(bloco.isna().sum(), fill_value=0)
+            lidas += len(bloco)
+            bytes_lidos += int(bloco.memory_usage(deep=True).sum())
+            if bytes_lidos >= max_bytes:
+                break
+    perfil = {
+        "linhas": lidas,
+        "nulos": {str(c): round(float(n) / lidas, 4) if lidas else 0.0 for c, n in nulos.items()}
+    }
+    return SondagemDados(_nomes_colunas(preview.columns), preview, perfil=perfil, bytes_lidos=bytes_lidos)
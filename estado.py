@@ -0,0 +1,123 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import tempfile
+import uuid
+
+# Estado das migrações: cada migração tem seu próprio diretório de trabalho e
+# todas as gravações são atômicas (arquivo temporário + rename), de modo que
+# leitores nunca veem um JSON pela metade.
+
+PADRAO_ID_MIGRACAO = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def novo_id_migracao():
+    return uuid.uuid4().hex[:12]
+
+
+def id_migracao_valido(id_migracao):
+    return bool(id_migracao) and bool(PADRAO_ID_MIGRACAO.match(id_migracao))
+
+
+def diretorio_migracao(base, id_migracao):
+    if not id_migracao_valido(id_migracao):
+        raise ValueError(f"Identificador de migração inválido: {id_migracao!r}")
+    caminho = os.path.join(base, "migracoes", id_migracao)
+    os.makedirs(caminho, exist_ok=True)
+    return caminho
+
+
+TAMANHO_BLOCO = 8 * 1024 * 1024
+
+
+def salvar_em_blocos(caminho, origem, tamanho_bloco=TAMANHO_BLOCO):
+    # Copia um arquivo aberto (ex.: upload do Streamlit) em blocos, sem montar o
+    # conteúdo inteiro em memória; devolve o SHA-256 do que foi gravado
+    diretorio = os.path.dirname(caminho) or "."
+    fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".tmp-")
+    resumo = hashlib.sha256()
+    try:
+        with os.fdopen(fd, "wb") as f:
+            while True:
+                bloco = origem.read(tamanho_bloco)
+                if not bloco:
+                    break
+                resumo.update(bloco)
+                f.write(bloco)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+    return resumo.hexdigest()
+
+
+def hash_arquivo(caminho, tamanho_bloco=TAMANHO_BLOCO):
+    resumo = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        while True:
+            bloco = f.read(tamanho_bloco)
+            if not bloco:
+                break
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def salvar_bytes(caminho, dados):
+    diretorio = os.path.dirname(caminho) or "."
+    fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dados)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporario, caminho)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+
+
+def salvar_json(caminho, objeto):
+    salvar_bytes(caminho, json.dumps(objeto, indent=2, ensure_ascii=False).encode("utf-8"))
+
+
+def carregar_json(caminho):
+    if os.path.exists(caminho):
+        with open(caminho, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return {}
+
+
+class EstadoEmMemoria:
+    # Mantém os JSON já lidos em memória (ex.: st.session_state) e só toca o disco
+    # quando o arquivo mudou (mtime diferente) ou quando o conteúdo salvo muda
+    def __init__(self, armazenamento):
+        self._entradas = armazenamento
+
+    def _mtime(self, caminho):
+        try:
+            return os.stat(caminho).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def carregar(self, caminho):
+        mtime = self._mtime(caminho)
+        if mtime is None:
+            return {}
+        entrada = self._entradas.get(caminho)
+        if entrada is None or entrada[0] != mtime:
+            entrada = (mtime, carregar_json(caminho))
+            self._entradas[caminho] = entrada
+        return copy.deepcopy(entrada[1])
+
+    def salvar(self, caminho, objeto):
+        entrada = self._entradas.get(caminho)
+        if entrada is not None and entrada[1] == objeto and entrada[0] == self._mtime(caminho):
+            return
+        salvar_json(caminho, objeto)
+        self._entradas[caminho] = (self._mtime(caminho), copy.deepcopy(objeto))
@@ -0,0 +1,49 @@
+import glob
+import os
+import tempfile
+import zipfile
+
+from lint_dax import extrair_medidas
+
+# Pacote ZIP da etapa 7 com tudo o que a migração produziu: relatório (.docx e
+# .pdf), estado em JSON e as medidas DAX num arquivo próprio. O ZIP é montado em
+# disco, arquivo por arquivo (o zipfile copia cada um em blocos), sem juntar os
+# artefatos em memória.
+
+
+def texto_medidas_dax(roteiro):
+    # Medidas dos blocos ```dax do roteiro, sem repetir nomes, prontas para colar no Power BI
+    medidas = {}
+    for medida in extrair_medidas(roteiro or ""):
+        medidas.setdefault(medida["nome"].lower(), medida["texto"].strip())
+    return "\n\n".join(medidas.values()) + "\n" if medidas else ""
+
+
+def montar_pacote_zip(caminho_zip, arquivos, textos=None):
+    # arquivos: {nome dentro do ZIP: caminho em disco}; textos: {nome: conteúdo}
+    diretorio = os.path.dirname(caminho_zip) or "."
+    os.makedirs(diretorio, exist_ok=True)
+    fd, temporario = tempfile.mkstemp(dir=diretorio, prefix=".tmp-", suffix=".zip")
+    os.close(fd)
+    try:
+        with zipfile.ZipFile(temporario, "w", compression=zipfile.ZIP_DEFLATED) as pacote:
+            for nome, caminho in arquivos.items():
+                if caminho and os.path.exists(caminho):
+                    pacote.write(caminho, nome)
+            for nome, texto in (textos or {}).items():
+                if texto:
+                    pacote.writestr(nome, texto)
+        os.replace(temporario, caminho_zip)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.unlink(temporario)
+        raise
+    return caminho_zip
+
+
+def arquivos_estado(diretorio_migracao):
+    # JSONs de estado da migração, dentro da pasta "estado/" do pacote
+    return {
+        f"estado/{os.path.basename(caminho)}": caminho
+        for caminho in sorted(glob.glob(os.path.join(diretorio_migracao, "*.json")))
+    }
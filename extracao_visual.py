@@ -0,0 +1,91 @@
+import base64
+import io
+import math
+from concurrent.futures import ThreadPoolExecutor
+
+from imagens import FORMATO_PADRAO, MIME_POR_FORMATO, codificar
+from inventario import converter_caixa, interpretar_resposta, mesclar_componentes
+
+# Extração visual do dashboard: envio da imagem inteira ou em mosaico de recortes
+# sobrepostos, extraídos em paralelo e mesclados em um único inventário de componentes.
+
+FORMATO_INVENTARIO = """Responda apenas com um objeto JSON, sem comentários, no formato:
+{"componentes": [{"tipo": "grafico|tabela|kpi|filtro|campo|texto|menu", "titulo": "<título visível ou descrição curta>", "visual": "<ex.: barras, linhas, pizza, cartão>", "campos": ["<campos, medidas ou eixos exibidos>"], "filtros": ["<filtros aplicados ao componente>"], "caixa": [x0, y0, x1, y1]}]}
+A caixa é a posição do componente na imagem, em coordenadas de 0 a 1000 (0,0 = canto superior esquerdo; 1000,1000 = canto inferior direito).
+Liste cada componente uma única vez, escreva os títulos exatamente como aparecem na tela e use listas vazias quando não houver campos ou filtros."""
+
+PROMPT_EXTRACAO = ("Você é um especialista em BI. Analise a imagem de um dashboard e extraia os elementos visuais, como gráficos, tabelas, indicadores, KPIs, textos, campos, filtros e menus.\n"
+                   + FORMATO_INVENTARIO)
+
+PROMPT_EXTRACAO_TILE = """Você é um especialista em BI. A imagem é um recorte da região ({x0}, {y0})-({x1}, {y1}) de um dashboard com {largura}x{altura} pixels.
+Liste todos os elementos visuais visíveis neste recorte (gráficos, tabelas, indicadores, KPIs, textos, campos, filtros e menus), inclusive os pequenos.
+As coordenadas da caixa são relativas a este recorte.
+""" + FORMATO_INVENTARIO.replace("{", "{{").replace("}", "}}")
+
+LADO_TILE_PADRAO = 1024
+SOBREPOSICAO_PADRAO = 0.1
+MAX_TILES_PARALELOS = 4
+
+
+def mensagens_imagem(prompt, *imagens, mime="image/png"):
+    conteudo = [{"type": "text", "text": prompt}]
+    for imagem in imagens:
+        b64 = base64.b64encode(imagem).decode("utf-8")
+        conteudo.append({"type": "image_url", "image_url": {"url": f"data:{mime};base64,{b64}"}})
+    return [{"role": "user", "content": conteudo}]
+
+
+def _intervalos(tamanho, partes, sobreposicao):
+    passo = tamanho / partes
+    margem = int(passo * sobreposicao)
+    return [
+        (max(0, int(i * passo) - margem), min(tamanho, int((i + 1) * passo) + margem))
+        for i in range(partes)
+    ]
+
+
+def dividir_em_tiles(imagem_bytes, lado_tile=LADO_TILE_PADRAO, sobreposicao=SOBREPOSICAO_PADRAO):
+    from PIL import Image
+
+    tiles = []
+    with Image.open(io.BytesIO(imagem_bytes)) as imagem:
+        imagem.load()
+        largura, altura = imagem.size
+        colunas = max(1, math.ceil(largura / lado_tile))
+        linhas = max(1, math.ceil(altura / lado_tile))
+        for y0, y1 in _intervalos(altura, linhas, sobreposicao):
+            for x0, x1 in _intervalos(largura, colunas, sobreposicao):
+                tiles.append({
+                    "regiao": (x0, y0, x1, y1),
+                    "tamanho": (largura, altura),
+                    "dados": codificar(imagem.crop((x0, y0, x1, y1))),
+                    "mime": MIME_POR_FORMATO[FORMATO_PADRAO]
+                })
+    return tiles
+
+
+def mensagens_tile(tile):
+    x0, y0, x1, y1 = tile["regiao"]
+    largura, altura = tile["tamanho"]
+    prompt = PROMPT_EXTRACAO_TILE.format(x0=x0, y0=y0, x1=x1, y1=y1, largura=largura, altura=altura)
+    return mensagens_imagem(prompt, tile["dados"], mime=tile["mime"])
+
+
+def extrair_inventario(imagem, mime, completar):
+    # completar recebe a lista de mensagens e devolve o texto do modelo
+    return interpretar_resposta(completar(mensagens_imagem(PROMPT_EXTRACAO, imagem, mime=mime)))
+
+
+def _extrair_tile(tile, completar):
+    componentes = interpretar_resposta(completar(mensagens_tile(tile)))
+    for componente in componentes:
+        componente["caixa"] = converter_caixa(componente["caixa"], tile["regiao"], tile["tamanho"])
+    return componentes
+
+
+def extrair_por_tiles(imagem_bytes, completar, max_paralelos=MAX_TILES_PARALELOS, lado_tile=LADO_TILE_PADRAO):
+    # Devolve os componentes mesclados de todos os recortes e o número de recortes
+    tiles = dividir_em_tiles(imagem_bytes, lado_tile=lado_tile)
+    with ThreadPoolExecutor(max_workers=max_paralelos) as executor:
+        respostas = list(executor.map(lambda tile: _extrair_tile(tile, completar), tiles))
+    return mesclar_componentes(respostas), len(tiles)
@@ -0,0 +1,130 @@
+import contextlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Fila de jobs em segundo plano para as etapas que chamam o LLM. Os jobs rodam
+# em um pool de threads do processo do Streamlit, independente da sessão que os
+# criou; o registro de cada job fica em SQLite e os resultados são gravados
+# pelo próprio job nos arquivos de estado da migração.
+
+logger = logging.getLogger(__name__)
+
+STATUS_ATIVOS = ("pendente", "executando")
+
+
+def _processo_vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class FilaJobs:
+    def __init__(self, diretorio, max_workers=4):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho = os.path.join(diretorio, "jobs.sqlite")
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="dashmigrate-job")
+        self._parciais = {}
+        self._trava = threading.Lock()
+        with self._conectar() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    migracao TEXT NOT NULL,
+                    tipo TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    criado_em REAL NOT NULL,
+                    iniciado_em REAL,
+                    finalizado_em REAL,
+                    erro TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_migracao ON jobs (migracao, tipo, criado_em)")
+        self._marcar_interrompidos()
+
+    @contextlib.contextmanager
+    def _conectar(self):
+        conn = sqlite3.connect(self.caminho, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _marcar_interrompidos(self):
+        # Jobs de processos que já morreram nunca vão terminar
+        with self._conectar() as conn:
+            ativos = conn.execute(
+                "SELECT id, pid FROM jobs WHERE status IN (?, ?)", STATUS_ATIVOS
+            ).fetchall()
+            for job in ativos:
+                if job["pid"] != os.getpid() and not _processo_vivo(job["pid"]):
+                    conn.execute(
+                        "UPDATE jobs SET status = 'interrompido', finalizado_em = ? WHERE id = ?",
+                        (time.time(), job["id"])
+                    )
+
+    def _atualizar(self, id_job, **campos):
+        atribuicoes = ", ".join(f"{nome} = ?" for nome in campos)
+        with self._conectar() as conn:
+            conn.execute(f"UPDATE jobs SET {atribuicoes} WHERE id = ?", (*campos.values(), id_job))
+
+    def submeter(self, id_migracao, tipo, funcao, *args):
+        # funcao recebe como primeiro argumento um callback parcial(nome, trecho)
+        id_job = uuid.uuid4().hex
+        with self._conectar() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, migracao, tipo, status, pid, criado_em) VALUES (?, ?, ?, 'pendente', ?, ?)",
+                (id_job, id_migracao, tipo, os.getpid(), time.time())
+            )
+        self.executor.submit(self._executar, id_job, funcao, args)
+        return id_job
+
+    def _executar(self, id_job, funcao, args):
+        self._atualizar(id_job, status="executando", iniciado_em=time.time())
+        try:
+            funcao(lambda nome, trecho: self._acrescentar_parcial(id_job, nome, trecho), *args)
+        except Exception as e:
+            logger.exception("job %s falhou", id_job)
+            self._atualizar(id_job, status="falhou", finalizado_em=time.time(), erro=f"{type(e).__name__}: {e}")
+        else:
+            self._atualizar(id_job, status="concluido", finalizado_em=time.time())
+        finally:
+            with self._trava:
+                self._parciais.pop(id_job, None)
+
+    def _acrescentar_parcial(self, id_job, nome, trecho):
+        with self._trava:
+            self._parciais.setdefault(id_job, {}).setdefault(nome, []).append(trecho)
+
+    def parciais(self, id_job):
+        with self._trava:
+            return {nome: "".join(trechos) for nome, trechos in self._parciais.get(id_job, {}).items()}
+
+    def obter(self, id_job):
+        with self._conectar() as conn:
+            linha = conn.execute("SELECT * FROM jobs WHERE id = ?", (id_job,)).fetchone()
+        return dict(linha) if linha else None
+
+    def ultimo_job(self, id_migracao, tipo):
+        with self._conectar() as conn:
+            linha = conn.execute(
+                "SELECT * FROM jobs WHERE migracao = ? AND tipo = ? ORDER BY criado_em DESC LIMIT 1",
+                (id_migracao, tipo)
+            ).fetchone()
+        return dict(linha) if linha else None
+
+    def job_ativo(self, id_migracao, tipo):
+        job = self.ultimo_job(id_migracao, tipo)
+        return job if job and job["status"] in STATUS_ATIVOS else None
@@ -0,0 +1,196 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from correspondencia import IndiceColunas
+from inventario import resumo_componentes, rotulo_componente
+from lint_dax import IndiceModelo, extrair_medidas, verificar_medidas
+from prompts import (
+    LIMITE_COLUNAS_PROMPT,
+    montar_prompt_correcao_dax,
+    montar_prompt_dax_componente,
+    montar_prompt_roteiro_componente,
+    montar_prompt_roteiro_geral,
+    montar_roteiro_completo,
+)
+
+# Geração incremental do roteiro (etapa 5): uma parte geral e, para cada componente
+# do inventário (e cada item manual do checklist da etapa 3), uma seção do roteiro
+# e as medidas DAX. Cada parte é guardada pelo hash das próprias entradas; ao gerar
+# de novo, só as partes cujas entradas mudaram voltam ao modelo, em paralelo, e o
+# documento é remontado. As medidas DAX passam pela verificação local de lint_dax
+# e só as que têm erro são pedidas de novo.
+
+VERSAO_PROMPTS = 1
+TIPOS_COM_MEDIDAS = {"grafico", "tabela", "kpi", "campo", "manual"}
+MAX_PARTES_PARALELAS = 6
+MAX_COLUNAS_COMPONENTE = 8
+MAX_RODADAS_CORRECAO = 2
+
+
+def nome_tabela_powerbi(origem):
+    # Nome que a tabela recebe ao ser importada no Power BI (arquivo sem extensão ou nome da tabela SQL)
+    origem = str(origem or "")
+    if ": " in origem:
+        # Bancos: "MySQL: banco.tabela"
+        return origem.split(": ", 1)[1].split(".")[-1].strip() or "Dados"
+    return os.path.splitext(os.path.basename(origem))[0] or "Dados"
+
+
+def _hash(*partes):
+    conteudo = json.dumps([VERSAO_PROMPTS, *partes], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+
+def itens_manuais(checklist_extracao):
+    # Itens adicionados à mão no checklist da etapa 3 viram componentes sem campos conhecidos
+    return [
+        {"id": chave, "tipo": "manual", "titulo": item["texto"], "visual": "", "campos": [], "filtros": [], "caixa": None}
+        for chave, item in checklist_extracao.items() if chave.startswith("manual_")
+    ]
+
+
+def colunas_do_componente(componente, correspondencias, indice):
+    colunas = []
+    for campo in componente["campos"] + componente["filtros"]:
+        if campo in correspondencias.get("resolvidos", {}):
+            colunas.append(correspondencias["resolvidos"][campo]["coluna"])
+        else:
+            colunas += [c["coluna"] for c in correspondencias.get("pendentes", {}).get(campo, [])[:2]]
+    if not colunas:
+        # Sem campos reconhecidos (ex.: item manual): procura pelo título
+        colunas = [c["coluna"] for c in indice.candidatos(componente["titulo"], 3)]
+    return list(dict.fromkeys(colunas))[:MAX_COLUNAS_COMPONENTE]
+
+
+def planejar_partes(componentes, colunas, correspondencias, versoes, tabela, modelo):
+    # Lista ordenada de partes do documento, cada uma com o hash das suas entradas e o prompt
+    indice = IndiceColunas(colunas)
+    # A parte geral só depende de quais componentes existem, não dos campos de cada um
+    layout = "\n".join(" | ".join(filter(None, (c["id"], c["tipo"], c["titulo"], c["visual"]))) for c in componentes)
+    partes = [{
+        "secao": "geral",
+        "etapa": "roteiro",
+        "rotulo": "Visão geral",
+        "hash": _hash("geral", layout, list(colunas), versoes, tabela, modelo),
+        "prompt": lambda: montar_prompt_roteiro_geral(layout, colunas, versoes, tabela)
+    }]
+    for componente in componentes:
+        linha = resumo_componentes([componente])
+        colunas_componente = colunas_do_componente(componente, correspondencias, indice)
+        entradas = {k: componente[k] for k in ("tipo", "titulo", "visual", "campos", "filtros")}
+        partes.append({
+            "secao": "roteiro",
+            "etapa": "roteiro",
+            "rotulo": rotulo_componente(componente),
+            "hash": _hash("roteiro", entradas, colunas_componente, versoes, tabela, modelo),
+            "prompt": lambda linha=linha, cols=colunas_componente: montar_prompt_roteiro_componente(linha, cols, versoes, tabela)
+        })
+        if componente["tipo"] in TIPOS_COM_MEDIDAS:
+            partes.append({
+                "secao": "dax",
+                "etapa": "dax",
+                "rotulo": rotulo_componente(componente),
+                "hash": _hash("dax", entradas, colunas_componente, versoes, tabela, modelo),
+                "colunas": colunas_componente,
+                "prompt": lambda linha=linha, cols=colunas_componente: montar_prompt_dax_componente(linha, cols, versoes, tabela)
+            })
+    return partes
+
+
+def gerar_partes(partes, salvas, completar, ao_concluir=None, max_paralelos=MAX_PARTES_PARALELAS):
+    # completar(etapa, mensagens) chama o modelo; devolve {hash: texto} só com as
+    # partes atuais e quantas foram geradas de novo
+    textos = {p["hash"]: salvas[p["hash"]] for p in partes if p["hash"] in salvas}
+    pendentes = {p["hash"]: p for p in partes if p["hash"] not in textos}
+    if pendentes:
+        with ThreadPoolExecutor(max_workers=max_paralelos) as executor:
+            futuros = {
+                executor.submit(completar, p["etapa"], [{"role": "user", "content": p["prompt"]()}]): p
+                for p in pendentes.values()
+            }
+            for futuro in as_completed(futuros):
+                parte = futuros[futuro]
+                textos[parte["hash"]] = futuro.result().strip()
+                if ao_concluir:
+                    ao_concluir(parte)
+    return textos, len(pendentes)
+
+
+def medidas_das_partes(partes, textos):
+    # Medidas de todas as partes DAX, cada uma marcada com o hash da parte de origem
+    medidas, vistas = [], set()
+    for parte in partes:
+        if parte["secao"] == "dax" and parte["hash"] not in vistas:
+            vistas.add(parte["hash"])
+            medidas += [dict(m, parte=parte["hash"]) for m in extrair_medidas(textos[parte["hash"]])]
+    return medidas
+
+
+def _prompt_correcao(parte, erros, textos, medidas, colunas, indice, tabela):
+    com_erro = [m for m in extrair_medidas(textos[parte["hash"]]) if m["nome"] in erros]
+    if len(colunas) <= LIMITE_COLUNAS_PROMPT:
+        permitidas = list(colunas)
+    else:
+        permitidas = list(parte["colunas"])
+        for medida in com_erro:
+            permitidas += [c["coluna"] for c in indice.candidatos(medida["nome"], 3)]
+    return montar_prompt_correcao_dax(
+        "\n".join(m["texto"].strip() for m in com_erro),
+        "\n".join(f"- [{nome}]: {mensagem}" for nome, mensagens in erros.items() for mensagem in mensagens),
+        list(dict.fromkeys(permitidas)),
+        sorted({m["nome"] for m in medidas} - set(erros)),
+        tabela
+    )
+
+
+def revisar_medidas(partes, textos, colunas, tabela, completar, ao_corrigir=None,
+                    max_rodadas=MAX_RODADAS_CORRECAO, max_paralelos=MAX_PARTES_PARALELAS):
+    # Verifica as medidas DAX localmente e pede ao modelo (completar(etapa, mensagens))
+    # só as medidas com erro de cada parte; devolve os textos corrigidos, as violações
+    # que sobraram e quantas medidas foram corrigidas
+    indice_modelo = IndiceModelo({tabela: colunas})
+    indice = IndiceColunas(colunas)
+    por_hash = {p["hash"]: p for p in partes if p["secao"] == "dax"}
+    textos = dict(textos)
+    corrigidas = set()
+    medidas = medidas_das_partes(partes, textos)
+    violacoes = verificar_medidas(medidas, indice_modelo)
+    for _ in range(max_rodadas):
+        if not violacoes:
+            break
+        erros_por_parte = {}
+        for violacao in violacoes:
+            erros_por_parte.setdefault(violacao["parte"], {}).setdefault(violacao["medida"], []).append(violacao["mensagem"])
+        with ThreadPoolExecutor(max_workers=max_paralelos) as executor:
+            futuros = {
+                executor.submit(completar, "dax", [{"role": "user", "content": _prompt_correcao(
+                    por_hash[hash_parte], erros, textos, medidas, colunas, indice, tabela
+                )}]): hash_parte
+                for hash_parte, erros in erros_por_parte.items()
+            }
+            for futuro in as_completed(futuros):
+                hash_parte = futuros[futuro]
+                novas = {m["nome"].lower(): m for m in extrair_medidas(futuro.result())}
+                texto = textos[hash_parte]
+                # Só as medidas com erro são trocadas; o resto da parte fica como estava
+                for medida in extrair_medidas(texto):
+                    nova = novas.get(medida["nome"].lower())
+                    if nova and medida["nome"] in erros_por_parte[hash_parte]:
+                        texto = texto.replace(medida["texto"].strip(), nova["texto"].strip(), 1)
+                        corrigidas.add((hash_parte, medida["nome"]))
+                textos[hash_parte] = texto
+                if ao_corrigir:
+                    ao_corrigir(por_hash[hash_parte], sorted(erros_por_parte[hash_parte]))
+        medidas = medidas_das_partes(partes, textos)
+        violacoes = verificar_medidas(medidas, indice_modelo)
+    return textos, violacoes, len(corrigidas)
+
+
+def montar_documento(partes, textos):
+    geral = [textos[p["hash"]] for p in partes if p["secao"] == "geral"]
+    secoes = [f"#### {p['rotulo']}\n\n{textos[p['hash']]}" for p in partes if p["secao"] == "roteiro"]
+    medidas = [f"#### {p['rotulo']}\n\n{textos[p['hash']]}" for p in partes if p["secao"] == "dax"]
+    roteiro = "\n\n".join(geral + (["### Componentes"] + secoes if secoes else []))
+    return montar_roteiro_completo(roteiro, "\n\n".join(medidas))
@@ -0,0 +1,80 @@
+import hashlib
+import io
+import os
+
+# Pré-processamento das imagens enviadas ao modelo: detecta o formato real,
+# limita a resolução, recodifica sem metadados e guarda o resultado por hash.
+
+LADO_MAX_PADRAO = 2048
+FORMATO_PADRAO = "JPEG"
+QUALIDADE_PADRAO = 85
+
+MIME_POR_FORMATO = {
+    "PNG": "image/png",
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "GIF": "image/gif",
+}
+
+
+def detectar_formato(dados):
+    # Formato real pelo conteúdo (não pela extensão); None se não for uma imagem legível
+    from PIL import Image, UnidentifiedImageError
+
+    try:
+        with Image.open(io.BytesIO(dados)) as imagem:
+            imagem.verify()
+            return imagem.format
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        return None
+
+
+def imagem_valida(dados):
+    return detectar_formato(dados) in MIME_POR_FORMATO
+
+
+def codificar(imagem, formato=FORMATO_PADRAO, qualidade=QUALIDADE_PADRAO):
+    from PIL import Image
+
+    if formato == "JPEG" and imagem.mode != "RGB":
+        # JPEG não tem transparência: compõe sobre fundo branco
+        fundo = Image.new("RGB", imagem.size, (255, 255, 255))
+        imagem = imagem.convert("RGBA")
+        fundo.paste(imagem, mask=imagem.getchannel("A"))
+        imagem = fundo
+    buffer = io.BytesIO()
+    # Salvar sem repassar exif/info descarta os metadados da imagem original
+    if formato == "PNG":
+        imagem.save(buffer, format="PNG", optimize=True)
+    else:
+        imagem.save(buffer, format=formato, quality=qualidade, optimize=True)
+    return buffer.getvalue()
+
+
+def preprocessar_imagem(dados, lado_max=LADO_MAX_PADRAO, formato=FORMATO_PADRAO,
+                        qualidade=QUALIDADE_PADRAO, diretorio_cache=None):
+    from PIL import Image
+
+    mime = MIME_POR_FORMATO[formato]
+    caminho_cache = None
+    if diretorio_cache:
+        parametros = f"{lado_max}-{formato}-{qualidade}".encode("utf-8")
+        chave = hashlib.sha256(dados + parametros).hexdigest()
+        caminho_cache = os.path.join(diretorio_cache, f"{chave}.{formato.lower()}")
+        if os.path.exists(caminho_cache):
+            with open(caminho_cache, "rb") as f:
+                return f.read(), mime
+
+    with Image.open(io.BytesIO(dados)) as imagem:
+        imagem.load()
+        if max(imagem.size) > lado_max:
+            imagem.thumbnail((lado_max, lado_max), Image.LANCZOS)
+        processada = codificar(imagem, formato, qualidade)
+
+    if caminho_cache:
+        os.makedirs(diretorio_cache, exist_ok=True)
+        temporario = f"{caminho_cache}.{os.getpid()}.tmp"
+        with open(temporario, "wb") as f:
+            f.write(processada)
+        os.replace(temporario, caminho_cache)
+    return processada, mime
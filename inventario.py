@@ -0,0 +1,237 @@
+import hashlib
+import json
+import re
+import unicodedata
+from difflib import SequenceMatcher
+
+# Inventário estruturado dos componentes do dashboard, extraído como JSON na
+# etapa 3. Cada componente tem tipo, título, campos, filtros e a posição na tela
+# (caixa em coordenadas 0-1000 da imagem inteira); o inventário é salvo com
+# índices por tipo e por campo, e as etapas seguintes enviam ao modelo só o
+# resumo compacto dos componentes que interessam.
+
+TIPOS = {
+    "grafico": "Gráfico",
+    "tabela": "Tabela",
+    "kpi": "KPI",
+    "filtro": "Filtro",
+    "campo": "Campo",
+    "texto": "Texto",
+    "menu": "Menu"
+}
+
+SINONIMOS_TIPO = {
+    "chart": "grafico", "graph": "grafico", "visual": "grafico", "plot": "grafico",
+    "table": "tabela", "grid": "tabela", "matriz": "tabela", "matrix": "tabela",
+    "card": "kpi", "cartao": "kpi", "indicador": "kpi", "indicator": "kpi", "metric": "kpi", "metrica": "kpi",
+    "filter": "filtro", "slicer": "filtro", "segmentacao": "filtro", "prompt": "filtro", "seletor": "filtro",
+    "field": "campo", "text": "texto", "titulo": "texto", "title": "texto", "label": "texto", "rotulo": "texto",
+    "navegacao": "menu", "navigation": "menu", "botao": "menu", "button": "menu"
+}
+
+ESCALA_CAIXA = 1000
+LIMIAR_TITULO_DUPLICADO = 0.85
+LIMIAR_SOBREPOSICAO_DUPLICADA = 0.5
+
+
+def normalizar_texto(texto):
+    texto = unicodedata.normalize("NFKD", texto.lower())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", texto).strip()
+
+
+def _normalizar_tipo(tipo):
+    chave = normalizar_texto(str(tipo or "")).replace(" ", "_")
+    if chave in TIPOS:
+        return chave
+    for palavra in chave.split("_"):
+        if palavra in TIPOS:
+            return palavra
+        if palavra in SINONIMOS_TIPO:
+            return SINONIMOS_TIPO[palavra]
+        if palavra.startswith(("grafico", "chart")):
+            return "grafico"
+    return "texto"
+
+
+def _lista_textos(valor):
+    if isinstance(valor, str):
+        valor = [valor]
+    if not isinstance(valor, list):
+        return []
+    return [str(v).strip() for v in valor if str(v).strip()]
+
+
+def _caixa(valor):
+    if isinstance(valor, dict):
+        valor = [valor.get(k) for k in ("x0", "y0", "x1", "y1")]
+    if not isinstance(valor, (list, tuple)) or len(valor) != 4:
+        return None
+    try:
+        x0, y0, x1, y1 = (min(ESCALA_CAIXA, max(0, int(round(float(v))))) for v in valor)
+    except (TypeError, ValueError):
+        return None
+    if x1 <= x0 or y1 <= y0:
+        return None
+    return [x0, y0, x1, y1]
+
+
+def _extrair_json(texto):
+    # Aceita a resposta pura ou dentro de um bloco ```json
+    bloco = re.search(r"```(?:json)?\s*(.*?)```", texto, re.DOTALL)
+    if bloco:
+        texto = bloco.group(1)
+    inicio = min((i for i in (texto.find("{"), texto.find("[")) if i >= 0), default=-1)
+    if inicio < 0:
+        raise ValueError("A resposta do modelo não contém JSON")
+    objeto, _ = json.JSONDecoder().raw_decode(texto[inicio:])
+    return objeto
+
+
+def interpretar_resposta(texto):
+    # Valida o JSON devolvido pelo modelo e normaliza cada componente; itens sem
+    # título ou com formato inválido são descartados
+    objeto = _extrair_json(texto)
+    itens = objeto.get("componentes") if isinstance(objeto, dict) else objeto
+    if not isinstance(itens, list):
+        raise ValueError("O JSON do modelo não tem a lista 'componentes'")
+    componentes = []
+    for item in itens:
+        if not isinstance(item, dict):
+            continue
+        titulo = str(item.get("titulo") or item.get("title") or "").strip()
+        if not titulo:
+            continue
+        componentes.append({
+            "tipo": _normalizar_tipo(item.get("tipo") or item.get("type")),
+            "titulo": titulo,
+            "visual": str(item.get("visual") or "").strip(),
+            "campos": _lista_textos(item.get("campos", item.get("fields"))),
+            "filtros": _lista_textos(item.get("filtros", item.get("filters"))),
+            "caixa": _caixa(item.get("caixa", item.get("bbox")))
+        })
+    return componentes
+
+
+def converter_caixa(caixa, regiao, tamanho):
+    # Caixa relativa a um recorte (0-1000) -> caixa relativa à imagem inteira (0-1000)
+    if caixa is None:
+        return None
+    x0, y0, x1, y1 = regiao
+    largura, altura = tamanho
+    escala_x, escala_y = (x1 - x0) / ESCALA_CAIXA, (y1 - y0) / ESCALA_CAIXA
+    return _caixa([
+        (x0 + caixa[0] * escala_x) * ESCALA_CAIXA / largura,
+        (y0 + caixa[1] * escala_y) * ESCALA_CAIXA / altura,
+        (x0 + caixa[2] * escala_x) * ESCALA_CAIXA / largura,
+        (y0 + caixa[3] * escala_y) * ESCALA_CAIXA / altura
+    ])
+
+
+def _area(caixa):
+    return (caixa[2] - caixa[0]) * (caixa[3] - caixa[1])
+
+
+def _intersecao(a, b):
+    largura = min(a[2], b[2]) - max(a[0], b[0])
+    altura = min(a[3], b[3]) - max(a[1], b[1])
+    return max(0, largura) * max(0, altura)
+
+
+def _duplicado(a, b):
+    if a["tipo"] != b["tipo"]:
+        return False
+    titulo_a, titulo_b = normalizar_texto(a["titulo"]), normalizar_texto(b["titulo"])
+    if titulo_a == titulo_b or SequenceMatcher(None, titulo_a, titulo_b).ratio() >= LIMIAR_TITULO_DUPLICADO:
+        return True
+    if a["caixa"] and b["caixa"]:
+        # Recortes sobrepostos podem ler o título de forma diferente; a posição desempata
+        menor = min(_area(a["caixa"]), _area(b["caixa"]))
+        return _intersecao(a["caixa"], b["caixa"]) >= LIMIAR_SOBREPOSICAO_DUPLICADA * menor
+    return False
+
+
+def mesclar_componentes(listas):
+    # Mantém a primeira ocorrência de cada componente e completa campos/filtros com as repetições
+    mesclados = []
+    for componentes in listas:
+        for componente in componentes:
+            existente = next((m for m in mesclados if _duplicado(m, componente)), None)
+            if existente is None:
+                mesclados.append(dict(componente))
+                continue
+            for chave in ("campos", "filtros"):
+                existente[chave] = existente[chave] + [v for v in componente[chave] if v not in existente[chave]]
+            existente["caixa"] = existente["caixa"] or componente["caixa"]
+    return mesclados
+
+
+def montar_inventario(componentes):
+    componentes = [dict(c, id=f"c{i}") for i, c in enumerate(componentes, start=1)]
+    por_tipo, por_campo = {}, {}
+    for componente in componentes:
+        por_tipo.setdefault(componente["tipo"], []).append(componente["id"])
+        for campo in componente["campos"] + componente["filtros"]:
+            ids = por_campo.setdefault(normalizar_texto(campo), [])
+            if componente["id"] not in ids:
+                ids.append(componente["id"])
+    return {"componentes": componentes, "indice": {"por_tipo": por_tipo, "por_campo": por_campo}}
+
+
+def campos_componentes(componentes):
+    # Campos e filtros citados no dashboard, sem repetição e na ordem em que aparecem
+    campos = {}
+    for componente in componentes:
+        for campo in componente["campos"] + componente["filtros"]:
+            campos.setdefault(normalizar_texto(campo), campo)
+    return list(campos.values())
+
+
+def rotulo_componente(componente):
+    return f"{TIPOS.get(componente['tipo'], componente['tipo'])}: {componente['titulo']}"
+
+
+def chave_componente(componente):
+    # Identifica o componente pelo conteúdo, e não pelo id (c1, c2... mudam a cada
+    # extração); a caixa fica de fora porque oscila entre extrações da mesma tela
+    conteudo = json.dumps([componente["tipo"], componente["titulo"], componente["campos"], componente["filtros"]],
+                          ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()[:12]
+
+
+def texto_inventario(inventario):
+    # Versão legível do inventário, exibida na etapa 3 e usada no relatório
+    linhas = ["## Componentes identificados", ""]
+    for componente in inventario.get("componentes", []):
+        linha = f"- **{rotulo_componente(componente)}**"
+        if componente.get("visual"):
+            linha += f" ({componente['visual']})"
+        if componente["campos"]:
+            linha += f" — campos: {', '.join(componente['campos'])}"
+        if componente["filtros"]:
+            linha += f" — filtros: {', '.join(componente['filtros'])}"
+        linhas.append(linha)
+    return "\n".join(linhas)
+
+
+def resumo_componentes(componentes):
+    # Uma linha por componente, no formato mais curto que ainda identifica campos e filtros
+    linhas = []
+    for c in componentes:
+        partes = [c["id"], c["tipo"], c["titulo"]]
+        if c.get("visual"):
+            partes.append(c["visual"])
+        if c["campos"]:
+            partes.append("campos=" + ",".join(c["campos"]))
+        if c["filtros"]:
+            partes.append("filtros=" + ",".join(c["filtros"]))
+        linhas.append(" | ".join(partes))
+    return "\n".join(linhas)
+
+
+def componentes_nas_regioes(inventario, caixas):
+    # Componentes cuja caixa cruza alguma das caixas dadas (coordenadas 0-1000)
+    return [
+        c for c in inventario.get("componentes", [])
+        if c["caixa"] and any(_intersecao(c["caixa"], caixa) > 0 for caixa in caixas)
+    ]
@@ -0,0 +1,215 @@
+import re
+
+# Verificação local das medidas DAX geradas na etapa 5: tokeniza cada medida,
+# resolve as referências Tabela[Coluna] e [Medida] contra um índice montado a
+# partir do esquema da base, detecta ciclos entre medidas e funções
+# desconhecidas. Só as medidas com problemas voltam ao modelo.
+
+FUNCOES_DAX = set("""
+ABS ACOS ACOSH ACOT ACOTH ADDCOLUMNS ADDMISSINGITEMS ALL ALLCROSSFILTERED ALLEXCEPT ALLNOBLANKROW ALLSELECTED AND
+APPROXIMATEDISTINCTCOUNT ASIN ASINH ATAN ATANH AVERAGE AVERAGEA AVERAGEX BITAND BITLSHIFT BITOR BITRSHIFT BITXOR BLANK
+CALCULATE CALCULATETABLE CALENDAR CALENDARAUTO CEILING CLOSINGBALANCEMONTH CLOSINGBALANCEQUARTER CLOSINGBALANCEYEAR
+COALESCE COMBINEVALUES CONCATENATE CONCATENATEX CONTAINS CONTAINSROW CONTAINSSTRING CONTAINSSTRINGEXACT CONVERT COS COSH
+COT COTH COUNT COUNTA COUNTAX COUNTBLANK COUNTROWS COUNTX CROSSFILTER CROSSJOIN CURRENCY CURRENTGROUP CUSTOMDATA DATATABLE
+DATE DATEADD DATEDIFF DATESBETWEEN DATESINPERIOD DATESMTD DATESQTD DATESYTD DATEVALUE DAY DEGREES DETAILROWS DISTINCT
+DISTINCTCOUNT DISTINCTCOUNTNOBLANK DIVIDE EARLIER EARLIEST EDATE ENDOFMONTH ENDOFQUARTER ENDOFYEAR EOMONTH ERROR
+EVALUATEANDLOG EVEN EXACT EXCEPT EXP EXPON.DIST FACT FALSE FILTER FILTERS FIND FIRSTDATE FIRSTNONBLANK FIRSTNONBLANKVALUE
+FIXED FLOOR FORMAT GCD GENERATE GENERATEALL GENERATESERIES GEOMEAN GEOMEANX GROUPBY HASONEFILTER HASONEVALUE HOUR IF
+IF.EAGER IFERROR IGNORE INDEX INT INTERSECT ISAFTER ISBLANK ISCROSSFILTERED ISEMPTY ISERROR ISEVEN ISFILTERED ISINSCOPE
+ISLOGICAL ISNONTEXT ISNUMBER ISO.CEILING ISODD ISONORAFTER ISSELECTEDMEASURE ISSUBTOTAL ISTEXT KEEPFILTERS LASTDATE
+LASTNONBLANK LASTNONBLANKVALUE LCM LEFT LEN LINEST LINESTX LN LOG LOG10 LOOKUPVALUE LOWER MATCHBY MAX MAXA MAXX MEDIAN
+MEDIANX MID MIN MINA MINUTE MINX MOD MONTH MROUND NATURALINNERJOIN NATURALLEFTOUTERJOIN NETWORKDAYS NEXTDAY NEXTMONTH
+NEXTQUARTER NEXTYEAR NONVISUAL NORM.DIST NORM.INV NORM.S.DIST NORM.S.INV NOT NOW ODD OFFSET OPENINGBALANCEMONTH
+OPENINGBALANCEQUARTER OPENINGBALANCEYEAR OR ORDERBY PARALLELPERIOD PARTITIONBY PATH PATHCONTAINS PATHITEM PATHITEMREVERSE
+PATHLENGTH PERCENTILE.EXC PERCENTILE.INC PERCENTILEX.EXC PERCENTILEX.INC PI POISSON.DIST POWER PREVIOUSDAY PREVIOUSMONTH
+PREVIOUSQUARTER PREVIOUSYEAR PRODUCT PRODUCTX QUARTER QUOTIENT RADIANS RAND RANDBETWEEN RANK RANK.EQ RANKX RELATED
+RELATEDTABLE REMOVEFILTERS REPLACE REPT RIGHT ROLLUP ROLLUPADDISSUBTOTAL ROLLUPGROUP ROLLUPISSUBTOTAL ROUND ROUNDDOWN
+ROUNDUP ROW ROWNUMBER SAMEPERIODLASTYEAR SEARCH SECOND SELECTCOLUMNS SELECTEDMEASURE SELECTEDMEASUREFORMATSTRING
+SELECTEDMEASURENAME SELECTEDVALUE SIGN SIN SINH SQRT SQRTPI STARTOFMONTH STARTOFQUARTER STARTOFYEAR STDEV.P STDEV.S
+STDEVX.P STDEVX.S SUBSTITUTE SUBSTITUTEWITHINDEX SUM SUMMARIZE SUMMARIZECOLUMNS SUMX SWITCH TAN TANH TIME TIMEVALUE TODAY
+TOPN TOPNSKIP TOTALMTD TOTALQTD TOTALYTD TREATAS TRIM TRUE TRUNC UNICHAR UNICODE UNION UPPER USERELATIONSHIP USERNAME
+USEROBJECTID USERPRINCIPALNAME UTCNOW UTCTODAY VALUE VALUES VAR.P VAR.S VARX.P VARX.S WEEKDAY WEEKNUM WINDOW YEAR YEARFRAC
+""".split())
+
+PALAVRAS_CHAVE = {"VAR", "RETURN", "IN", "TRUE", "FALSE", "ASC", "DESC", "DEFINE", "MEASURE", "EVALUATE", "NOT", "DAY", "MONTH", "QUARTER", "YEAR"}
+
+PADRAO_TOKEN = re.compile(r"""
+    (?P<comentario>//[^\n]*|--[^\n]*|/\*.*?\*/)
+  | (?P<texto>"(?:[^"]|"")*")
+  | (?P<tabela>'(?:[^']|'')+')
+  | (?P<coluna>\[(?:[^\]]|\]\])*\])
+  | (?P<numero>\d+(?:\.\d+)?(?:[eE][+-]?\d+)?)
+  | (?P<nome>[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<operador>:=|<=|>=|<>|&&|\|\||==|[-+*/^&=<>(),{}])
+  | (?P<espaco>\s+)
+  | (?P<outro>.)
+""", re.VERBOSE | re.DOTALL)
+
+PADRAO_BLOCO_DAX = re.compile(r"```dax\s*\n(.*?)```", re.DOTALL | re.IGNORECASE)
+# "Nome = expr", "[Nome] := expr" ou "MEASURE Tabela[Nome] := expr"
+PADRAO_CABECALHO = re.compile(r"^\s*(?:MEASURE\s+)?(?:(?:'[^']+'|[A-Za-z_]\w*)(?=\[))?(\[[^\]]+\]|[^=:\[\]()\"']+?)\s*:?=(?!=)(.*)$")
+
+
+def tokenizar(expressao):
+    tokens = []
+    for encontrado in PADRAO_TOKEN.finditer(expressao):
+        tipo = encontrado.lastgroup
+        if tipo not in ("comentario", "espaco"):
+            tokens.append((tipo, encontrado.group()))
+    return tokens
+
+
+def _nome_tabela(token):
+    return token[1:-1].replace("''", "'") if token.startswith("'") else token
+
+
+def _nome_coluna(token):
+    return token[1:-1].replace("]]", "]").strip()
+
+
+class IndiceModelo:
+    # Tabelas e colunas do modelo do Power BI, com busca sem diferenciar maiúsculas (como no DAX)
+    def __init__(self, tabelas):
+        self.tabelas = {nome.lower(): (nome, {str(c).lower(): str(c) for c in colunas}) for nome, colunas in tabelas.items()}
+
+    def tem_tabela(self, tabela):
+        return tabela.lower() in self.tabelas
+
+    def tem_coluna(self, tabela, coluna):
+        return coluna.lower() in self.tabelas.get(tabela.lower(), (None, {}))[1]
+
+    def coluna_em_alguma_tabela(self, coluna):
+        return any(coluna.lower() in colunas for _, colunas in self.tabelas.values())
+
+
+def _profundidade(linha):
+    tokens = [t for tipo, t in tokenizar(linha) if tipo == "operador"]
+    return tokens.count("(") - tokens.count(")")
+
+
+def extrair_medidas(texto):
+    # Medidas no formato "Nome = expressão" dentro dos blocos ```dax do texto gerado
+    medidas = []
+    for bloco in PADRAO_BLOCO_DAX.findall(texto):
+        atual, profundidade = None, 0
+        for linha in bloco.split("\n"):
+            # Um cabeçalho só começa outra medida fora de parênteses e depois de a atual ter expressão
+            livre = profundidade <= 0 and (atual is None or atual["expressao"].strip())
+            cabecalho = PADRAO_CABECALHO.match(linha) if livre and not linha.lstrip().startswith(("//", "--")) else None
+            nome = cabecalho.group(1).strip().strip("[]").strip() if cabecalho else ""
+            if nome and nome.split()[0].upper() not in ("VAR", "RETURN"):
+                if atual:
+                    medidas.append(atual)
+                atual = {"nome": nome, "expressao": cabecalho.group(2), "texto": linha}
+                profundidade = _profundidade(cabecalho.group(2))
+            elif atual is not None:
+                atual["expressao"] += "\n" + linha
+                atual["texto"] += "\n" + linha
+                profundidade += _profundidade(linha)
+        if atual:
+            medidas.append(atual)
+    for medida in medidas:
+        medida["texto"] = medida["texto"].rstrip()
+        medida["expressao"] = medida["expressao"].strip()
+    return [m for m in medidas if m["expressao"]]
+
+
+def _referencias(medida):
+    # (tipo, valor) de cada referência da expressão
+    tokens = tokenizar(medida["expressao"])
+    variaveis = {tokens[i + 1][1].lower() for i, (tipo, t) in enumerate(tokens[:-1]) if t.upper() == "VAR" and tokens[i + 1][0] == "nome"}
+    referencias = []
+    for i, (tipo, token) in enumerate(tokens):
+        proximo = tokens[i + 1] if i + 1 < len(tokens) else (None, None)
+        anterior = tokens[i - 1] if i > 0 else (None, None)
+        if tipo == "coluna":
+            if anterior[0] in ("tabela", "nome") and not (anterior[0] == "nome" and anterior[1].lower() in variaveis):
+                referencias.append(("coluna", (_nome_tabela(anterior[1]), _nome_coluna(token))))
+            else:
+                referencias.append(("medida", _nome_coluna(token)))
+        elif tipo == "nome" and proximo[1] == "(":
+            referencias.append(("funcao", token))
+        elif tipo in ("nome", "tabela") and proximo[0] != "coluna":
+            nome = _nome_tabela(token)
+            if tipo == "tabela" or (nome.lower() not in variaveis and nome.upper() not in PALAVRAS_CHAVE):
+                referencias.append(("tabela", nome))
+        elif tipo == "outro":
+            referencias.append(("simbolo", token))
+    return referencias
+
+
+def _violacao(medida, tipo, mensagem):
+    # "parte" identifica de onde a medida veio, quando quem chamou informou
+    return {"medida": medida["nome"], "parte": medida.get("parte"), "tipo": tipo, "mensagem": mensagem}
+
+
+def _normalizar(expressao):
+    return [t for _, t in tokenizar(expressao)]
+
+
+def verificar_medidas(medidas, indice):
+    # Devolve a lista de violações ({medida, parte, tipo, mensagem}) de todas as medidas juntas
+    nomes = {}
+    violacoes = []
+    for medida in medidas:
+        chave = medida["nome"].lower()
+        # Componentes diferentes podem repetir a mesma medida; só nomes iguais com fórmulas diferentes conflitam
+        if chave in nomes and _normalizar(nomes[chave]["expressao"]) != _normalizar(medida["expressao"]):
+            violacoes.append(_violacao(medida, "duplicada", f"A medida [{medida['nome']}] foi definida mais de uma vez com fórmulas diferentes"))
+        nomes.setdefault(chave, medida)
+
+    dependencias = {}
+    for medida in medidas:
+        usadas = set()
+        for tipo, valor in _referencias(medida):
+            if tipo == "coluna":
+                tabela, coluna = valor
+                if not indice.tem_tabela(tabela):
+                    violacoes.append(_violacao(medida, "tabela", f"Tabela '{tabela}' não existe no modelo"))
+                elif not indice.tem_coluna(tabela, coluna):
+                    if coluna.lower() in nomes:
+                        usadas.add(coluna.lower())
+                    else:
+                        violacoes.append(_violacao(medida, "coluna", f"Coluna '{tabela}'[{coluna}] não existe na base"))
+            elif tipo == "medida":
+                if valor.lower() in nomes:
+                    usadas.add(valor.lower())
+                elif not indice.coluna_em_alguma_tabela(valor):
+                    violacoes.append(_violacao(medida, "referencia", f"[{valor}] não é uma medida definida nem uma coluna da base"))
+            elif tipo == "funcao":
+                if valor.upper() not in FUNCOES_DAX:
+                    violacoes.append(_violacao(medida, "funcao", f"Função desconhecida no DAX: {valor}"))
+            elif tipo == "tabela":
+                if not indice.tem_tabela(valor):
+                    violacoes.append(_violacao(medida, "tabela", f"Tabela ou variável '{valor}' não existe no modelo"))
+            elif tipo == "simbolo":
+                violacoes.append(_violacao(medida, "sintaxe", f"Símbolo inesperado: {valor}"))
+        dependencias[medida["nome"].lower()] = usadas
+
+    for ciclo in _ciclos(dependencias):
+        caminho = " → ".join(f"[{nomes[n]['nome']}]" for n in ciclo + [ciclo[0]])
+        for nome in ciclo:
+            violacoes.append(_violacao(nomes[nome], "ciclo", f"Dependência circular entre medidas: {caminho}"))
+    # A mesma referência errada repetida na expressão conta uma vez só
+    return list({(v["medida"], v["parte"], v["mensagem"]): v for v in violacoes}.values())
+
+
+def _ciclos(dependencias):
+    # Busca em profundidade; cada ciclo é reportado uma vez
+    estado, pilha, ciclos = {}, [], []
+
+    def visitar(no):
+        estado[no] = "visitando"
+        pilha.append(no)
+        for vizinho in sorted(dependencias.get(no, ())):
+            if estado.get(vizinho) == "visitando":
+                ciclos.append(pilha[pilha.index(vizinho):])
+            elif vizinho not in estado:
+                visitar(vizinho)
+        pilha.pop()
+        estado[no] = "concluido"
+
+    for no in sorted(dependencias):
+        if no not in estado:
+            visitar(no)
+    return ciclos
@@ -0,0 +1,216 @@
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+# Instrumentação do app e do modo em lote: spans de cada etapa e de cada job,
+# cada chamada ao LLM (latência, tokens, bytes enviados, cache, custo) e cada
+# carga de base (bytes, linhas, duração). Cada evento vira uma linha do trace
+# JSONL e atualiza os agregados, reescritos no formato textfile do Prometheus
+# (node_exporter --collector.textfile) para acompanhar regressões e cotas. O
+# arquivo do Prometheus é reescrito no máximo uma vez por intervalo, com todos os
+# eventos do período; exportar() grava na hora (o modo em lote chama ao terminar).
+
+# Preço por milhão de tokens (entrada, saída) em USD, pelo nome do modelo na API;
+# modelos fora da tabela (locais, por exemplo) contam custo zero
+PRECOS_POR_MILHAO = {
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4": (30.00, 60.00),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "claude-3-opus-20240229": (15.00, 75.00),
+    "claude-3-sonnet-20240229": (3.00, 15.00),
+    "claude-3-haiku-20240307": (0.25, 1.25),
+    "gemini-1.5-pro": (1.25, 5.00),
+    "gemini-1.5-flash": (0.075, 0.30),
+    "gemini-1.0-pro": (0.50, 1.50),
+    "command-r-plus": (2.50, 10.00)
+}
+TAMANHO_MAX_TRACE = 50 * 1024 * 1024
+INTERVALO_PROMETHEUS = 10
+EVENTOS_RECENTES = 200
+
+
+def custo_estimado(modelo, tokens_prompt, tokens_resposta):
+    entrada, saida = PRECOS_POR_MILHAO.get(modelo, (0.0, 0.0))
+    return (tokens_prompt * entrada + tokens_resposta * saida) / 1_000_000
+
+
+def _rotulos_prometheus(rotulos):
+    escapar = lambda valor: str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{nome}="{escapar(valor)}"' for nome, valor in rotulos)
+
+
+class Instrumentacao:
+    def __init__(self, diretorio, tamanho_max_trace=TAMANHO_MAX_TRACE, intervalo_prometheus=INTERVALO_PROMETHEUS):
+        os.makedirs(diretorio, exist_ok=True)
+        self.caminho_trace = os.path.join(diretorio, "trace.jsonl")
+        self.caminho_prometheus = os.path.join(diretorio, "dashmigrate.prom")
+        self.tamanho_max_trace = tamanho_max_trace
+        self.intervalo_prometheus = intervalo_prometheus
+        self._exportacao_agendada = None
+        self.recentes = deque(maxlen=EVENTOS_RECENTES)
+        # (métrica, ((rótulo, valor), ...)) -> valor
+        self.contadores = {}
+        self._trava = threading.Lock()
+
+    def _somar(self, metrica, valor, **rotulos):
+        chave = (metrica, tuple(sorted((nome, str(valor)) for nome, valor in rotulos.items())))
+        self.contadores[chave] = self.contadores.get(chave, 0) + valor
+
+    def _registrar(self, evento, agregar):
+        evento = {"momento": round(time.time(), 3), **evento}
+        linha = json.dumps(evento, ensure_ascii=False, default=str) + "\n"
+        with self._trava:
+            agregar()
+            self.recentes.append(evento)
+            if os.path.exists(self.caminho_trace) and os.path.getsize(self.caminho_trace) > self.tamanho_max_trace:
+                os.replace(self.caminho_trace, self.caminho_trace + ".1")
+            with open(self.caminho_trace, "a", encoding="utf-8") as f:
+                f.write(linha)
+            self._agendar_exportacao()
+
+    def _agendar_exportacao(self):
+        # Chamado com a trava: o primeiro evento depois de uma exportação agenda a próxima
+        if self.intervalo_prometheus <= 0:
+            self._exportar_prometheus()
+        elif self._exportacao_agendada is None:
+            self._exportacao_agendada = threading.Timer(self.intervalo_prometheus, self.exportar)
+            self._exportacao_agendada.daemon = True
+            self._exportacao_agendada.start()
+
+    def exportar(self):
+        with self._trava:
+            if self._exportacao_agendada is not None:
+                self._exportacao_agendada.cancel()
+                self._exportacao_agendada = None
+            self._exportar_prometheus()
+
+    def registrar_span(self, nome, duracao, erro=None, **atributos):
+        def agregar():
+            self._somar("dashmigrate_span_segundos_sum", duracao, nome=nome)
+            self._somar("dashmigrate_span_segundos_count", 1, nome=nome)
+            if erro:
+                self._somar("dashmigrate_span_erros_total", 1, nome=nome)
+        self._registrar({"tipo": "span", "nome": nome, "duracao": round(duracao, 4), "erro": erro, **atributos}, agregar)
+
+    @contextlib.contextmanager
+    def span(self, nome, **atributos):
+        # Quem usa pode acrescentar atributos ao dicionário devolvido
+        inicio, erro = time.perf_counter(), None
+        try:
+            yield atributos
+        except Exception as e:
+            erro = type(e).__name__
+            raise
+        finally:
+            self.registrar_span(nome, time.perf_counter() - inicio, erro, **atributos)
+
+    def medir(self, nome):
+        # Decorador: um span por execução da função
+        def decorador(funcao):
+            def medida(*args, **kwargs):
+                with self.span(nome):
+                    return funcao(*args, **kwargs)
+            return medida
+        return decorador
+
+    def registrar_llm(self, chamada):
+        # chamada vem do ClienteLLM: etapa, modelo, latencia, tokens_prompt, tokens_resposta,
+        # bytes_payload, cache ("nao", "acerto" ou "coalescida") e erro
+        etapa, modelo = chamada.get("etapa") or "-", chamada.get("modelo") or "-"
+        tokens_prompt, tokens_resposta = chamada.get("tokens_prompt", 0), chamada.get("tokens_resposta", 0)
+        custo = custo_estimado(modelo, tokens_prompt, tokens_resposta) if chamada.get("cache") == "nao" else 0.0
+
+        def agregar():
+            self._somar("dashmigrate_llm_chamadas_total", 1, etapa=etapa, modelo=modelo, cache=chamada.get("cache", "nao"))
+            self._somar("dashmigrate_llm_latencia_segundos_sum", chamada.get("latencia", 0.0), etapa=etapa, modelo=modelo)
+            self._somar("dashmigrate_llm_latencia_segundos_count", 1, etapa=etapa, modelo=modelo)
+            self._somar("dashmigrate_llm_tokens_total", tokens_prompt, etapa=etapa, modelo=modelo, tipo="prompt")
+            self._somar("dashmigrate_llm_tokens_total", tokens_resposta, etapa=etapa, modelo=modelo, tipo="resposta")
+            self._somar("dashmigrate_llm_payload_bytes_total", chamada.get("bytes_payload", 0), etapa=etapa)
+            self._somar("dashmigrate_llm_custo_usd_total", custo, etapa=etapa, modelo=modelo)
+            if chamada.get("erro"):
+                self._somar("dashmigrate_llm_erros_total", 1, etapa=etapa, modelo=modelo)
+        self._registrar({"tipo": "llm", **chamada, "custo_usd": round(custo, 6)}, agregar)
+
+    def registrar_dados(self, origem, tipo, bytes_lidos, linhas, duracao):
+        def agregar():
+            self._somar("dashmigrate_dados_bytes_total", bytes_lidos or 0, tipo=tipo)
+            self._somar("dashmigrate_dados_linhas_total", linhas or 0, tipo=tipo)
+            self._somar("dashmigrate_dados_segundos_sum", duracao, tipo=tipo)
+            self._somar("dashmigrate_dados_segundos_count", 1, tipo=tipo)
+        self._registrar({
+            "tipo": "dados", "origem": origem, "fonte": tipo, "bytes_lidos": bytes_lidos,
+            "linhas": linhas, "duracao": round(duracao, 4)
+        }, agregar)
+
+    def _exportar_prometheus(self):
+        # Chamado com a trava; o arquivo é trocado de uma vez para o coletor nunca ler pela metade
+        linhas, tipos_escritos = [], set()
+        for (metrica, rotulos), valor in sorted(self.contadores.items()):
+            familia = metrica.rsplit("_", 1)[0] if metrica.endswith(("_sum", "_count")) else metrica
+            if familia not in tipos_escritos:
+                tipos_escritos.add(familia)
+                linhas.append(f"# TYPE {familia} {'summary' if familia != metrica else 'counter'}")
+            linhas.append(f"{metrica}{{{_rotulos_prometheus(rotulos)}}} {valor:g}" if rotulos else f"{metrica} {valor:g}")
+        fd, temporario = tempfile.mkstemp(dir=os.path.dirname(self.caminho_prometheus), prefix=".tmp-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write("\n".join(linhas) + "\n")
+        os.replace(temporario, self.caminho_prometheus)
+
+    def resumo(self):
+        # Tabelas do painel de depuração: uma linha por etapa do LLM, por span e por fonte de dados
+        with self._trava:
+            grupos = {}
+            for (metrica, rotulos), valor in self.contadores.items():
+                rotulos = dict(rotulos)
+                if metrica.startswith("dashmigrate_llm_"):
+                    chave, campo = ("llm", rotulos["etapa"]), metrica
+                    if metrica == "dashmigrate_llm_tokens_total":
+                        campo += "_" + rotulos["tipo"]
+                    elif metrica == "dashmigrate_llm_chamadas_total" and rotulos["cache"] != "nao":
+                        campo = "dashmigrate_llm_reaproveitadas"
+                elif metrica.startswith("dashmigrate_span_"):
+                    chave, campo = ("span", rotulos["nome"]), metrica
+                else:
+                    chave, campo = ("dados", rotulos["tipo"]), metrica
+                linha = grupos.setdefault(chave, {})
+                linha[campo] = linha.get(campo, 0) + valor
+            recentes = list(self.recentes)
+
+        media = lambda soma, contagem: round(soma / contagem, 3) if contagem else 0.0
+        tabelas = {"llm": [], "spans": [], "dados": [], "recentes": recentes[::-1]}
+        for (tipo, nome), m in sorted(grupos.items()):
+            if tipo == "llm":
+                tabelas["llm"].append({
+                    "etapa": nome,
+                    "chamadas": int(m.get("dashmigrate_llm_chamadas_total", 0)),
+                    "cache/coalescidas": int(m.get("dashmigrate_llm_reaproveitadas", 0)),
+                    "latência média (s)": media(m.get("dashmigrate_llm_latencia_segundos_sum", 0), m.get("dashmigrate_llm_latencia_segundos_count", 0)),
+                    "tokens prompt": int(m.get("dashmigrate_llm_tokens_total_prompt", 0)),
+                    "tokens resposta": int(m.get("dashmigrate_llm_tokens_total_resposta", 0)),
+                    "KB enviados": round(m.get("dashmigrate_llm_payload_bytes_total", 0) / 1024, 1),
+                    "custo (USD)": round(m.get("dashmigrate_llm_custo_usd_total", 0), 4),
+                    "erros": int(m.get("dashmigrate_llm_erros_total", 0))
+                })
+            elif tipo == "span":
+                tabelas["spans"].append({
+                    "span": nome,
+                    "execuções": int(m.get("dashmigrate_span_segundos_count", 0)),
+                    "média (s)": media(m.get("dashmigrate_span_segundos_sum", 0), m.get("dashmigrate_span_segundos_count", 0)),
+                    "total (s)": round(m.get("dashmigrate_span_segundos_sum", 0), 3),
+                    "erros": int(m.get("dashmigrate_span_erros_total", 0))
+                })
+            else:
+                tabelas["dados"].append({
+                    "fonte": nome,
+                    "cargas": int(m.get("dashmigrate_dados_segundos_count", 0)),
+                    "média (s)": media(m.get("dashmigrate_dados_segundos_sum", 0), m.get("dashmigrate_dados_segundos_count", 0)),
+                    "MB lidos": round(m.get("dashmigrate_dados_bytes_total", 0) / 1024 / 1024, 2),
+                    "linhas": int(m.get("dashmigrate_dados_linhas_total", 0))
+                })
+        return tabelas
@@ -0,0 +1,236 @@
+import argparse
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from dotenv import load_dotenv
+
+from cache_llm import CacheLLM
+from backends_llm import MODELO_PADRAO, criar_roteador
+from cache_colunar import sondar_com_cache
+from esquema_dados import gerar_esquema
+from estado import carregar_json, salvar_json
+from extracao_visual import extrair_inventario
+from imagens import preprocessar_imagem
+from correspondencia import resolver_campos
+from inventario import campos_componentes, montar_inventario, resumo_componentes, texto_inventario
+from geracao_incremental import gerar_partes, montar_documento, nome_tabela_powerbi, planejar_partes, revisar_medidas
+from prompts import montar_prompt_compatibilidade
+from relatorio import gerar_relatorio_docx
+from metricas import Instrumentacao
+
+# Migração em lote, sem interface: processa um manifesto de pares
+# (screenshot, base de dados) com os mesmos prompts do app.
+#
+# Uso:
+#   python migracao_lote.py manifesto.csv --saida lote/ --dashboards-paralelos 8 --max-chamadas 4
+#
+# O manifesto (CSV ou JSON) tem as colunas id, imagem e dataset (e, opcionalmente,
+# modelo, com uma chave de backends_llm.CATALOGO, e origem, versao_origem e
+# versao_destino, usadas nos prompts do roteiro); caminhos relativos
+# são resolvidos a partir da pasta do manifesto. Cada dashboard grava seus
+# checkpoints em <saida>/<id>/ e, ao rodar de novo, as etapas já concluídas são puladas.
+# As chamadas ao LLM ficam registradas em <saida>/metricas/ (trace JSONL e textfile do Prometheus).
+
+ETAPAS = [
+    "Seleção da plataforma",
+    "Upload do dashboard",
+    "Extração visual",
+    "Validação dos dados",
+    "Geração do roteiro",
+    "Checklist visual",
+    "Exportação final"
+]
+
+NOME_RELATORIO = "relatorio_executivo_dashmigrate.docx"
+
+
+def carregar_manifesto(caminho):
+    base = os.path.dirname(os.path.abspath(caminho))
+    with open(caminho, encoding="utf-8") as f:
+        if caminho.lower().endswith(".json"):
+            itens = json.load(f)
+        else:
+            itens = list(csv.DictReader(f))
+    # Ids que viram o mesmo nome de pasta (inclusive só pela caixa, em sistemas de arquivos
+    # que não a diferenciam) misturariam os checkpoints de dashboards diferentes
+    originais = {}
+    for item in itens:
+        original = str(item["id"])
+        item["id"] = re.sub(r"[^A-Za-z0-9_-]+", "_", original).strip("_")
+        if not item["id"]:
+            raise ValueError(f"Id inválido no manifesto: {original!r}")
+        if item["id"].lower() in originais:
+            raise ValueError(f"Os ids {originais[item['id'].lower()]!r} e {original!r} do manifesto "
+                             f"usariam a mesma pasta de saída ({item['id']})")
+        originais[item["id"].lower()] = original
+        for campo in ("imagem", "dataset"):
+            item[campo] = os.path.join(base, item[campo])
+    return itens
+
+
+def processar_dashboard(item, dir_saida, llm):
+    dir_item = os.path.join(dir_saida, item["id"])
+    os.makedirs(dir_item, exist_ok=True)
+    caminho_ocr = os.path.join(dir_item, "ocr_result.json")
+    caminho_inventario = os.path.join(dir_item, "inventario.json")
+    caminho_esquema = os.path.join(dir_item, "esquema_dataset.json")
+    caminho_analise = os.path.join(dir_item, "analise_compatibilidade.json")
+    caminho_roteiro = os.path.join(dir_item, "roteiro.json")
+    caminho_roteiro_partes = os.path.join(dir_item, "roteiro_partes.json")
+    caminho_correspondencias = os.path.join(dir_item, "correspondencias.json")
+    caminho_progresso = os.path.join(dir_item, "progresso.json")
+    caminho_relatorio = os.path.join(dir_item, NOME_RELATORIO)
+
+    progresso = carregar_json(caminho_progresso) or {etapa: False for etapa in ETAPAS}
+    progresso[ETAPAS[0]] = progresso[ETAPAS[1]] = True
+    etapas_executadas = []
+    modelo = item.get("modelo") or None
+
+    inventario = carregar_json(caminho_inventario)
+    if not inventario.get("componentes"):
+        with open(item["imagem"], "rb") as f:
+            imagem, mime = preprocessar_imagem(f.read())
+        inventario = montar_inventario(extrair_inventario(
+            imagem, mime,
+            lambda mensagens: llm.completar("extracao", mensagens, temperatura=0.3, modelo=modelo, formato_json=True)
+        ))
+        salvar_json(caminho_inventario, inventario)
+        salvar_json(caminho_ocr, {"ocr": texto_inventario(inventario)})
+        etapas_executadas.append("extracao")
+    texto_ocr = carregar_json(caminho_ocr).get("ocr", "")
+    descricao = resumo_componentes(inventario["componentes"])
+    progresso[ETAPAS[2]] = True
+
+    esquema = carregar_json(caminho_esquema)
+    if not esquema.get("colunas"):
+        # Dashboards que usam a mesma base compartilham a conversão para Parquet
+        sondagem = sondar_com_cache(item["dataset"], os.path.join(dir_saida, "cache_colunar"))
+        esquema = gerar_esquema(sondagem, os.path.basename(item["dataset"]))
+        salvar_json(caminho_esquema, esquema)
+        etapas_executadas.append("esquema")
+    colunas = [c["nome"] for c in esquema["colunas"]]
+
+    correspondencias = carregar_json(caminho_correspondencias)
+    if not correspondencias:
+        campos = campos_componentes(inventario["componentes"])
+        correspondencias = resolver_campos(campos, colunas) if campos else {}
+        salvar_json(caminho_correspondencias, correspondencias)
+
+    if not carregar_json(caminho_analise).get("analise"):
+        analise = llm.completar("analise", [{"role": "user", "content": montar_prompt_compatibilidade(descricao, colunas, correspondencias or None)}], temperatura=0.2, modelo=modelo)
+        salvar_json(caminho_analise, {"analise": analise})
+        etapas_executadas.append("compatibilidade")
+    progresso[ETAPAS[3]] = True
+
+    roteiro_completo = carregar_json(caminho_roteiro).get("conteudo", "")
+    if not roteiro_completo:
+        tabela = nome_tabela_powerbi(esquema.get("origem"))
+        partes = planejar_partes(
+            inventario["componentes"], colunas, correspondencias,
+            versoes={"origem": item.get("origem", ""), "versao_origem": item.get("versao_origem", ""), "versao_destino": item.get("versao_destino", "")},
+            tabela=tabela,
+            modelo=modelo
+        )
+        completar = lambda etapa, mensagens: llm.completar(etapa, mensagens, temperatura=0.2, modelo=modelo)
+        textos, geradas = gerar_partes(partes, carregar_json(caminho_roteiro_partes), completar)
+        textos, violacoes, corrigidas = revisar_medidas(partes, textos, colunas, tabela, completar)
+        salvar_json(caminho_roteiro_partes, textos)
+        roteiro_completo = montar_documento(partes, textos)
+        rotulos = {p["hash"]: p["rotulo"] for p in partes}
+        salvar_json(caminho_roteiro, {
+            "conteudo": roteiro_completo, "partes": len(partes), "geradas": geradas,
+            "medidas_corrigidas": corrigidas,
+            "violacoes_dax": [dict(v, parte=rotulos.get(v["parte"], "")) for v in violacoes]
+        })
+        etapas_executadas.append("roteiro")
+    progresso[ETAPAS[4]] = True
+    salvar_json(caminho_progresso, progresso)
+
+    if not os.path.exists(caminho_relatorio):
+        gerar_relatorio_docx(
+            caminho_relatorio,
+            ocr=texto_ocr,
+            roteiro=roteiro_completo,
+            checklist={},
+            progresso=progresso,
+            esquema_dataset=esquema,
+            caminho_img_original=item["imagem"],
+            diretorio_cache_imagens=os.path.join(dir_saida, "cache_imagens")
+        )
+        etapas_executadas.append("relatorio")
+    return etapas_executadas
+
+
+def executar_lote(itens, dir_saida, llm, dashboards_paralelos):
+    inicio = time.perf_counter()
+    concluidos, retomados, falhas = [], [], []
+    with ThreadPoolExecutor(max_workers=dashboards_paralelos) as executor:
+        futuros = {executor.submit(processar_dashboard, item, dir_saida, llm): item for item in itens}
+        for futuro in as_completed(futuros):
+            item = futuros[futuro]
+            try:
+                etapas_executadas = futuro.result()
+            except Exception as e:
+                falhas.append({"id": item["id"], "erro": f"{type(e).__name__}: {e}"})
+                print(f"❌ {item['id']}: {e}")
+                continue
+            (concluidos if etapas_executadas else retomados).append(item["id"])
+            print(f"✅ {item['id']}: {', '.join(etapas_executadas) or 'já concluído'}")
+
+    duracao = time.perf_counter() - inicio
+    processados = len(concluidos) + len(retomados)
+    return {
+        "total": len(itens),
+        "concluidos": len(concluidos),
+        "ja_concluidos": len(retomados),
+        "falhas": falhas,
+        "duracao_segundos": round(duracao, 2),
+        "dashboards_por_minuto": round(processados / duracao * 60, 2) if duracao else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migração em lote de dashboards para o Power BI")
+    parser.add_argument("manifesto")
+    parser.add_argument("--saida", default=os.path.join("output", "lote"))
+    parser.add_argument("--dashboards-paralelos", type=int, default=8)
+    parser.add_argument("--max-chamadas", type=int, default=4, help="Limite global de chamadas simultâneas à API")
+    parser.add_argument("--modelo", default=MODELO_PADRAO, help="Modelo usado quando o manifesto não define a coluna modelo")
+    parser.add_argument("--limite-rpm", type=int, default=500, help="Requisições por minuto permitidas pela conta")
+    parser.add_argument("--limite-tpm", type=int, default=30000, help="Tokens por minuto permitidos pela conta")
+    parser.add_argument("--sem-cache", action="store_true")
+    args = parser.parse_args()
+
+    load_dotenv()
+    # OPENAI_BASE_URL e DASHMIGRATE_<PROVEDOR>_BASE_URL permitem apontar o lote para endpoints compatíveis locais
+    cache = None if args.sem_cache else CacheLLM(os.path.join("data", "cache_llm"))
+    instrumentacao = Instrumentacao(os.path.join(args.saida, "metricas"))
+    llm = criar_roteador(
+        requisicoes_por_minuto=args.limite_rpm,
+        tokens_por_minuto=args.limite_tpm,
+        max_simultaneas=args.max_chamadas,
+        cache=cache,
+        modelo_padrao=args.modelo,
+        observador=instrumentacao.registrar_llm
+    )
+
+    itens = carregar_manifesto(args.manifesto)
+    os.makedirs(args.saida, exist_ok=True)
+    resumo = executar_lote(itens, args.saida, llm, args.dashboards_paralelos)
+    instrumentacao.exportar()
+    resumo["llm_por_etapa"] = instrumentacao.resumo()["llm"]
+    resumo["custo_usd_estimado"] = round(sum(linha["custo (USD)"] for linha in resumo["llm_por_etapa"]), 4)
+    salvar_json(os.path.join(args.saida, "resumo_lote.json"), resumo)
+
+    print(f"\n{resumo['concluidos']} processados, {resumo['ja_concluidos']} já concluídos, "
+          f"{len(resumo['falhas'])} falhas em {resumo['duracao_segundos']} s "
+          f"({resumo['dashboards_por_minuto']} dashboards/min, custo estimado US$ {resumo['custo_usd_estimado']})")
+    raise SystemExit(1 if resumo["falhas"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+# Prompts das etapas de análise e geração, compartilhados pelo app e pelo modo em lote.
+# descricao_dashboard é o resumo do inventário de componentes (uma linha por componente:
+# id | tipo | título | visual | campos | filtros) ou, em migrações antigas, o texto da extração.
+
+# Bases mais largas que isso só têm as colunas candidatas enviadas na análise de compatibilidade
+LIMITE_COLUNAS_PROMPT = 60
+
+
+def montar_prompt_compatibilidade(descricao_dashboard, colunas_disponiveis, correspondencias=None):
+    if not correspondencias:
+        return f"""
+Você é um consultor de BI. Um dashboard foi extraído visualmente com o seguinte conteúdo:
+
+{descricao_dashboard}
+
+A seguir, temos uma base de dados com estas colunas:
+{', '.join(colunas_disponiveis)}
+
+Sua tarefa:
+1. Verifique quais gráficos, KPIs, filtros e tabelas descritos no dashboard podem ser construídos com os dados disponíveis.
+2. Apresente uma tabela listando o nome do componente, os campos correspondentes e se está compatível (Sim/Não).
+3. Quando algum campo não for encontrado, sugira como ele pode ser criado (ex: "Ticket Médio = receita / quantidade").
+4. Apresente tudo de forma clara para o analista entender rapidamente o que pode ser implementado e o que falta.
+"""
+
+    # Com a correspondência local, o modelo só decide os campos pendentes e recebe
+    # as colunas candidatas deles em vez da lista completa da base
+    resolvidos = "\n".join(f"- {campo} → {c['coluna']}" for campo, c in correspondencias["resolvidos"].items()) or "- (nenhum)"
+    pendentes = "\n".join(
+        f"- {campo}: {', '.join(c['coluna'] for c in candidatos) or 'nenhuma coluna parecida'}"
+        for campo, candidatos in correspondencias["pendentes"].items()
+    ) or "- (nenhum)"
+    if len(colunas_disponiveis) <= LIMITE_COLUNAS_PROMPT:
+        colunas = f"Colunas da base:\n{', '.join(colunas_disponiveis)}"
+    else:
+        colunas = f"A base tem {len(colunas_disponiveis)} colunas; só as candidatas acima foram listadas."
+    return f"""
+Você é um consultor de BI. Um dashboard foi extraído visualmente com o seguinte conteúdo:
+
+{descricao_dashboard}
+
+Campos do dashboard já associados a colunas da base por uma correspondência automática (considere corretos):
+{resolvidos}
+
+Campos ainda sem correspondência, com as colunas candidatas mais parecidas:
+{pendentes}
+
+{colunas}
+
+Sua tarefa:
+1. Verifique quais gráficos, KPIs, filtros e tabelas descritos no dashboard podem ser construídos com os dados disponíveis.
+2. Para cada campo pendente, escolha a coluna candidata correta ou indique que ele não existe na base.
+3. Apresente uma tabela listando o nome do componente, os campos correspondentes e se está compatível (Sim/Não).
+4. Quando algum campo não for encontrado, sugira como ele pode ser criado (ex: "Ticket Médio = receita / quantidade").
+5. Apresente tudo de forma clara para o analista entender rapidamente o que pode ser implementado e o que falta.
+"""
+
+
+def montar_prompt_roteiro(descricao_dashboard, colunas_disponiveis):
+    return f"""
+Você é um especialista em BI migrando dashboards do MicroStrategy para o Power BI.
+
+Dashboard extraído visualmente:
+{descricao_dashboard}
+
+Base de dados com colunas:
+{', '.join(colunas_disponiveis)}
+
+Gere um roteiro completo com:
+1. Conexão da base
+2. Transformações necessárias (Power Query)
+3. Layout visual do dashboard
+4. Tipo de gráficos, eixos, valores e filtros
+5. Interações como drill-down e slicers
+6. Onde e como posicionar os elementos visuais
+7. Recomendações práticas para performance e usabilidade
+"""
+
+
+def montar_prompt_dax(descricao_dashboard, colunas_disponiveis):
+    return f"""
+Você é um especialista em Power BI.
+
+Com base no seguinte dashboard (extraído do MicroStrategy):
+{descricao_dashboard}
+
+E nesta base de dados com colunas:
+{', '.join(colunas_disponiveis)}
+
+Gere as principais **medidas DAX** que devem ser criadas no Power BI.
+
+Para cada medida informe:
+- Nome da Medida
+- Fórmula DAX
+- Descrição do que ela faz
+- Onde ela deve ser usada (gráfico, KPI, filtro etc.)
+"""
+
+
+def montar_roteiro_completo(roteiro, medidas_dax):
+    return f"""
+## 📘 Roteiro Técnico
+
+{roteiro}
+
+---
+
+## 🧮 Medidas DAX Recomendadas
+
+{medidas_dax}
+"""
+
+
+# Prompts da geração incremental: versoes traz origem, versao_origem e versao_destino
+# da etapa 1 e tabela é o nome da tabela da base no modelo do Power BI
+
+
+def _plataformas(versoes):
+    origem = f"{versoes.get('origem') or 'MicroStrategy'} {versoes.get('versao_origem') or ''}".strip()
+    return origem, versoes.get("versao_destino") or "Power BI"
+
+
+def montar_prompt_roteiro_geral(descricao_dashboard, colunas_disponiveis, versoes, tabela):
+    origem, destino = _plataformas(versoes)
+    if len(colunas_disponiveis) <= LIMITE_COLUNAS_PROMPT:
+        colunas = ', '.join(colunas_disponiveis)
+    else:
+        colunas = f"{', '.join(colunas_disponiveis[:LIMITE_COLUNAS_PROMPT])} (e mais {len(colunas_disponiveis) - LIMITE_COLUNAS_PROMPT})"
+    return f"""
+Você é um especialista em BI migrando dashboards do {origem} para o {destino}.
+
+Componentes do dashboard (id | tipo | título | visual):
+{descricao_dashboard}
+
+Base de dados (tabela "{tabela}") com colunas:
+{colunas}
+
+Gere a parte geral do roteiro de migração, com:
+1. Conexão da base
+2. Transformações necessárias (Power Query)
+3. Layout visual do dashboard e onde posicionar cada componente
+4. Interações como drill-down e slicers
+5. Recomendações práticas para performance e usabilidade
+
+Não detalhe a configuração de cada componente nem escreva medidas DAX: isso é feito à parte.
+"""
+
+
+def montar_prompt_roteiro_componente(componente, colunas, versoes, tabela):
+    origem, destino = _plataformas(versoes)
+    return f"""
+Você é um especialista em BI migrando um dashboard do {origem} para o {destino}.
+
+Componente (id | tipo | título | visual | campos | filtros):
+{componente}
+
+Colunas da tabela "{tabela}" associadas a ele: {', '.join(colunas) or 'nenhuma identificada'}
+
+Explique como recriar este componente no Power BI: tipo de visual, campos em eixos, valores e legenda,
+filtros e formatação. Responda em no máximo 10 linhas de markdown, sem título.
+"""
+
+
+def montar_prompt_dax_componente(componente, colunas, versoes, tabela):
+    origem, destino = _plataformas(versoes)
+    return f"""
+Você é um especialista em Power BI ({destino}) migrando um dashboard do {origem}.
+
+Componente (id | tipo | título | visual | campos | filtros):
+{componente}
+
+Colunas da tabela "{tabela}" associadas a ele: {', '.join(colunas) or 'nenhuma identificada'}
+
+Gere as medidas DAX que este componente precisa. Para cada medida informe:
+- Nome da Medida
+- Fórmula DAX, em um bloco ```dax no formato Nome = expressão, referenciando colunas como '{tabela}'[coluna]
+- Descrição do que ela faz
+
+Se o componente não precisar de medidas, responda apenas "Nenhuma medida necessária."
+"""
+
+
+def montar_prompt_correcao_dax(medidas, erros, colunas, outras_medidas, tabela):
+    return f"""
+Você é um especialista em Power BI. As medidas DAX abaixo foram verificadas contra o modelo e têm erros.
+
+```dax
+{medidas}
+```
+
+Erros encontrados:
+{erros}
+
+Colunas da tabela "{tabela}" que podem ser usadas: {', '.join(colunas) or 'nenhuma identificada'}
+Outras medidas já existentes no modelo: {', '.join(f'[{m}]' for m in outras_medidas) or 'nenhuma'}
+
+Corrija apenas essas medidas, mantendo os mesmos nomes. Use somente funções DAX existentes, colunas da lista
+acima no formato '{tabela}'[coluna] e as medidas existentes, sem dependências circulares.
+Responda apenas com um bloco ```dax contendo as medidas corrigidas no formato Nome = expressão.
+"""
@@ -0,0 +1,264 @@
+import io
+import os
+import re
+from datetime import datetime
+
+from imagens import preprocessar_imagem
+
+# Relatório executivo da migração em .docx e .pdf, usado pela etapa 7 e pelo modo
+# em lote. O conteúdo é montado uma vez como lista de blocos (título, parágrafo,
+# item, tabela, código, imagem, quebra de página) e cada formato só renderiza os
+# blocos. Textos gerados pelo modelo chegam em markdown e têm tabelas convertidas
+# em tabelas de verdade; as capturas de tela são reduzidas uma vez e ficam em cache.
+
+LADO_MAX_IMAGEM_RELATORIO = 1600
+QUALIDADE_IMAGEM_RELATORIO = 80
+PADRAO_TITULO = re.compile(r"^(#{1,6})\s+(.*)$")
+PADRAO_ITEM = re.compile(r"^\s*([-*+]|\d+[.)])\s+(.*)$")
+PADRAO_NEGRITO = re.compile(r"\*\*(.+?)\*\*")
+
+
+def _celulas(linha):
+    return [c.strip() for c in linha.strip().strip("|").split("|")]
+
+
+def _separador_tabela(linha):
+    linha = linha.strip()
+    return "-" in linha and set(linha) <= set("|:- ")
+
+
+def _especial(linhas, i):
+    limpa = linhas[i].strip()
+    return (
+        limpa.startswith("```") or PADRAO_TITULO.match(limpa) or PADRAO_ITEM.match(linhas[i])
+        or (limpa.startswith("|") and i + 1 < len(linhas) and _separador_tabela(linhas[i + 1]))
+    )
+
+
+def blocos_markdown(texto):
+    # Markdown simples (títulos, listas, tabelas, blocos de código e parágrafos) -> blocos
+    blocos, linhas, i = [], (texto or "").splitlines(), 0
+    while i < len(linhas):
+        limpa = linhas[i].strip()
+        if not limpa or re.match(r"^(-{3,}|\*{3,}|_{3,})$", limpa):
+            i += 1
+        elif limpa.startswith("```"):
+            fim = i + 1
+            while fim < len(linhas) and not linhas[fim].strip().startswith("```"):
+                fim += 1
+            blocos.append(("codigo", "\n".join(linhas[i + 1:fim])))
+            i = fim + 1
+        elif PADRAO_TITULO.match(limpa):
+            marcadores, titulo = PADRAO_TITULO.match(limpa).groups()
+            # Títulos do markdown ficam abaixo das seções do relatório
+            blocos.append(("titulo", titulo.strip(), min(len(marcadores) + 1, 4)))
+            i += 1
+        elif limpa.startswith("|") and i + 1 < len(linhas) and _separador_tabela(linhas[i + 1]):
+            tabela = [_celulas(limpa)]
+            i += 2
+            while i < len(linhas) and linhas[i].strip().startswith("|"):
+                tabela.append(_celulas(linhas[i]))
+                i += 1
+            blocos.append(("tabela", tabela))
+        elif PADRAO_ITEM.match(linhas[i]):
+            marcador, item = PADRAO_ITEM.match(linhas[i]).groups()
+            blocos.append(("item", item, marcador[0].isdigit()))
+            i += 1
+        else:
+            paragrafo = [limpa]
+            i += 1
+            while i < len(linhas) and linhas[i].strip() and not _especial(linhas, i):
+                paragrafo.append(linhas[i].strip())
+                i += 1
+            blocos.append(("paragrafo", " ".join(paragrafo)))
+    return blocos
+
+
+def _trechos(texto):
+    # (texto, negrito) de cada trecho da linha; crases e <br> do markdown são descartados
+    texto = texto.replace("`", "").replace("<br>", " ")
+    partes = PADRAO_NEGRITO.split(texto)
+    return [(parte, i % 2 == 1) for i, parte in enumerate(partes) if parte]
+
+
+def _imagem_relatorio(caminho, diretorio_cache):
+    # Capturas de tela reduzidas e recodificadas uma vez; as gerações seguintes usam o cache
+    with open(caminho, "rb") as f:
+        dados, _ = preprocessar_imagem(
+            f.read(), lado_max=LADO_MAX_IMAGEM_RELATORIO, formato="JPEG",
+            qualidade=QUALIDADE_IMAGEM_RELATORIO, diretorio_cache=diretorio_cache
+        )
+    return dados
+
+
+def blocos_relatorio(ocr, roteiro, checklist, progresso, esquema_dataset,
+                     caminho_img_original=None, caminho_img_novo=None, diretorio_cache_imagens=None):
+    blocos = [
+        ("titulo", "Relatório Executivo de Migração de Dashboard", 0),
+        ("paragrafo", "Projeto: DashMigrate Pro+"),
+        ("paragrafo", f"Data da Migração: {datetime.now().strftime('%d/%m/%Y')}"),
+        ("paragrafo", "Plataforma Origem: MicroStrategy"),
+        ("paragrafo", "Plataforma Destino: Power BI"),
+        ("paragrafo", "Analista Responsável: __________________________"),
+        ("quebra",),
+        ("titulo", "Resumo Executivo", 1),
+        ("paragrafo", "Este relatório apresenta a análise completa da migração de um dashboard da plataforma MicroStrategy para o Power BI, incluindo os resultados da extração visual, validação dos dados, roteiro técnico, comparação visual e checklist final de qualidade."),
+        ("titulo", "Status das Etapas", 2),
+        ("tabela", [["Etapa", "Status"]] + [[etapa, "✅ Completa" if status else "⏳ Pendente"] for etapa, status in progresso.items()]),
+        ("quebra",),
+        ("titulo", "Comparação Visual dos Dashboards", 1),
+        ("paragrafo", "As imagens abaixo representam o dashboard original (MicroStrategy) e o novo dashboard criado no Power BI.")
+    ]
+    for caminho, legenda in ((caminho_img_original, "🔼 Dashboard Original (MicroStrategy)"), (caminho_img_novo, "🔼 Dashboard Novo (Power BI)")):
+        if caminho and os.path.exists(caminho):
+            blocos.append(("imagem", _imagem_relatorio(caminho, diretorio_cache_imagens), legenda))
+    blocos += [
+        ("quebra",),
+        ("titulo", "Componentes Migrados - Visão Inicial", 1),
+        ("paragrafo", "Resumo dos componentes identificados no dashboard original via OCR:")
+    ]
+    blocos += blocos_markdown(ocr) + [("quebra",)]
+
+    if esquema_dataset.get("colunas"):
+        total_linhas = esquema_dataset.get("total_linhas")
+        blocos += [
+            ("titulo", "Base de Dados Utilizada", 1),
+            ("paragrafo", f"Origem: {esquema_dataset.get('origem', '')}"),
+            ("paragrafo", f"Total de linhas: {total_linhas if total_linhas is not None else 'não informado'}"),
+            ("tabela", [["Coluna", "Tipo", "% Nulos (amostra)", "Exemplos"]] + [
+                [coluna["nome"], coluna["tipo"], f"{coluna['nulos'] * 100:.1f}%", ", ".join(coluna["amostras"])]
+                for coluna in esquema_dataset["colunas"]
+            ]),
+            ("quebra",)
+        ]
+
+    comparacao = checklist.get("comparacao_visual_final", checklist.get("analise_comparativa", ""))
+    blocos += [("titulo", "Roteiro Técnico de Migração", 1)] + blocos_markdown(roteiro) + [("quebra",)]
+    blocos += [("titulo", "Checklist de Verificação e Comparação Final", 1)] + blocos_markdown(comparacao) + [("quebra",)]
+    blocos += [
+        ("titulo", "Considerações Finais", 1),
+        ("paragrafo", "A migração apresenta alto grau de compatibilidade. Recomenda-se revisar campos marcados como parcialmente compatíveis ou incompatíveis e aplicar os ajustes listados no roteiro técnico. "
+                      "A abordagem automatizada do DashMigrate Pro+ facilita a reprodutibilidade, reduz erros e padroniza o processo de migração de dashboards.")
+    ]
+    return blocos
+
+
+def _paragrafo_docx(paragrafo, texto):
+    for trecho, negrito in _trechos(texto):
+        paragrafo.add_run(trecho).bold = negrito
+    return paragrafo
+
+
+def _renderizar_docx(blocos, caminho_saida):
+    from docx import Document
+    from docx.shared import Inches, Pt
+    from PIL import Image as PILImage
+
+    doc = Document()
+    for bloco in blocos:
+        tipo = bloco[0]
+        if tipo == "titulo":
+            doc.add_heading(bloco[1], level=bloco[2])
+        elif tipo == "paragrafo":
+            _paragrafo_docx(doc.add_paragraph(), bloco[1])
+        elif tipo == "item":
+            _paragrafo_docx(doc.add_paragraph(style="List Number" if bloco[2] else "List Bullet"), bloco[1])
+        elif tipo == "tabela":
+            colunas = max(len(linha) for linha in bloco[1])
+            tabela = doc.add_table(rows=len(bloco[1]), cols=colunas)
+            tabela.style = "Table Grid"
+            for linha, valores in zip(tabela.rows, bloco[1]):
+                for celula, valor in zip(linha.cells, valores):
+                    celula.text = valor.replace("**", "")
+            for celula in tabela.rows[0].cells:
+                for run in celula.paragraphs[0].runs:
+                    run.bold = True
+        elif tipo == "codigo":
+            run = doc.add_paragraph().add_run(bloco[1])
+            run.font.name = "Consolas"
+            run.font.size = Pt(9)
+        elif tipo == "imagem":
+            # Largura de 5,5" ou, em capturas em retrato, altura de 8" (a página útil tem 6,5" x 9")
+            with PILImage.open(io.BytesIO(bloco[1])) as imagem:
+                largura_img, altura_img = imagem.size
+            doc.add_picture(io.BytesIO(bloco[1]), width=Inches(min(5.5, 8 * largura_img / altura_img)))
+            doc.add_paragraph(bloco[2])
+        elif tipo == "quebra":
+            doc.add_page_break()
+
+    os.makedirs(os.path.dirname(caminho_saida) or ".", exist_ok=True)
+    doc.save(caminho_saida)
+    return caminho_saida
+
+
+def _texto_pdf(texto):
+    # As fontes padrão do PDF só cobrem o latin-1: emojis e afins são descartados
+    from xml.sax.saxutils import escape
+
+    texto = texto.encode("cp1252", "ignore").decode("cp1252").strip()
+    return "".join(f"<b>{escape(t)}</b>" if negrito else escape(t) for t, negrito in _trechos(texto))
+
+
+def _renderizar_pdf(blocos, caminho_saida):
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.lib.units import cm
+    from reportlab.lib.utils import ImageReader
+    from reportlab.platypus import Image, PageBreak, Paragraph, Preformatted, SimpleDocTemplate, Spacer, Table, TableStyle
+
+    estilos = getSampleStyleSheet()
+    estilos_titulo = {0: estilos["Title"], 1: estilos["Heading1"], 2: estilos["Heading2"]}
+    documento = SimpleDocTemplate(caminho_saida, pagesize=A4, leftMargin=2 * cm, rightMargin=2 * cm, title="Relatório Executivo de Migração")
+    largura = documento.width
+    # Área útil do quadro da página: o Frame do SimpleDocTemplate tem 6 pt de recuo em cada lado
+    largura_util, altura_util = documento.width - 12, documento.height - 12
+    elementos = []
+    for bloco in blocos:
+        tipo = bloco[0]
+        if tipo == "titulo":
+            elementos.append(Paragraph(_texto_pdf(bloco[1]), estilos_titulo.get(bloco[2], estilos["Heading3"])))
+        elif tipo == "paragrafo":
+            elementos.append(Paragraph(_texto_pdf(bloco[1]), estilos["BodyText"]))
+        elif tipo == "item":
+            elementos.append(Paragraph(_texto_pdf(bloco[1]), estilos["BodyText"], bulletText="•"))
+        elif tipo == "tabela":
+            colunas = max(len(linha) for linha in bloco[1])
+            dados = [[Paragraph(_texto_pdf(v), estilos["BodyText"]) for v in linha + [""] * (colunas - len(linha))] for linha in bloco[1]]
+            tabela = Table(dados, colWidths=[largura / colunas] * colunas, repeatRows=1)
+            tabela.setStyle(TableStyle([
+                ("GRID", (0, 0), (-1, -1), 0.5, colors.grey),
+                ("BACKGROUND", (0, 0), (-1, 0), colors.HexColor("#e8f4ff")),
+                ("VALIGN", (0, 0), (-1, -1), "TOP")
+            ]))
+            elementos += [tabela, Spacer(1, 0.3 * cm)]
+        elif tipo == "codigo":
+            elementos.append(Preformatted(bloco[1].encode("cp1252", "ignore").decode("cp1252"), estilos["Code"]))
+        elif tipo == "imagem":
+            largura_img, altura_img = ImageReader(io.BytesIO(bloco[1])).getSize()
+            # Cabe na largura e na altura da página; capturas em retrato não podem estourar o quadro
+            escala = min(largura_util / largura_img, altura_util / altura_img, 1.0)
+            elementos.append(Image(io.BytesIO(bloco[1]), width=largura_img * escala, height=altura_img * escala))
+            elementos.append(Paragraph(_texto_pdf(bloco[2]), estilos["Italic"]))
+        elif tipo == "quebra":
+            elementos.append(PageBreak())
+
+    os.makedirs(os.path.dirname(caminho_saida) or ".", exist_ok=True)
+    documento.build(elementos)
+    return caminho_saida
+
+
+def gerar_relatorio_docx(caminho_saida, ocr, roteiro, checklist, progresso, esquema_dataset,
+                         caminho_img_original=None, caminho_img_novo=None, diretorio_cache_imagens=None):
+    return _renderizar_docx(blocos_relatorio(
+        ocr, roteiro, checklist, progresso, esquema_dataset,
+        caminho_img_original, caminho_img_novo, diretorio_cache_imagens
+    ), caminho_saida)
+
+
+def gerar_relatorio_pdf(caminho_saida, ocr, roteiro, checklist, progresso, esquema_dataset,
+                        caminho_img_original=None, caminho_img_novo=None, diretorio_cache_imagens=None):
+    return _renderizar_pdf(blocos_relatorio(
+        ocr, roteiro, checklist, progresso, esquema_dataset,
+        caminho_img_original, caminho_img_novo, diretorio_cache_imagens
+    ), caminho_saida)
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Os testes importam os módulos do app (raiz) e os utilitários de benchmarks/ (servidor LLM
+# falso e dados sintéticos) como os scripts fazem
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
@@ -0,0 +1,109 @@
+import io
+import os
+
+import pytest
+
+from armazenamento_objetos import (TAMANHO_BLOCO_LEITURA, ArquivoRemoto, abrir_remoto, baixar_em_partes,
+                                   criar_cliente_s3, objeto_s3, sondar_objeto)
+
+moto = pytest.importorskip("moto")
+
+# Leituras por intervalo contra um S3 simulado pelo moto: os bytes devolvidos por
+# ArquivoRemoto e por baixar_em_partes têm de ser idênticos aos do objeto gravado.
+
+BUCKET = "dashmigrate-testes"
+CONTEUDO = os.urandom(3 * TAMANHO_BLOCO_LEITURA + 12345)
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        cliente = criar_cliente_s3("teste", "teste")
+        cliente.create_bucket(Bucket=BUCKET)
+        cliente.put_object(Bucket=BUCKET, Key="dados/base.bin", Body=CONTEUDO)
+        yield cliente
+
+
+def test_leitura_por_intervalo_atravessa_blocos(s3):
+    tamanho, ler_intervalo = objeto_s3(s3, BUCKET, "dados/base.bin")
+    assert tamanho == len(CONTEUDO)
+
+    arquivo = abrir_remoto(tamanho, ler_intervalo)
+    inicio = TAMANHO_BLOCO_LEITURA - 100
+    arquivo.seek(inicio)
+    assert arquivo.read(300) == CONTEUDO[inicio:inicio + 300]
+    assert arquivo.tell() == inicio + 300
+    # O resto da leitura sai do buffer, sem nova requisição
+    requisicoes = arquivo.raw.requisicoes
+    assert arquivo.read(1000) == CONTEUDO[inicio + 300:inicio + 1300]
+    assert arquivo.raw.requisicoes == requisicoes
+
+
+def test_seek_e_tell(s3):
+    tamanho, ler_intervalo = objeto_s3(s3, BUCKET, "dados/base.bin")
+    arquivo = ArquivoRemoto(tamanho, ler_intervalo)
+
+    assert arquivo.seek(-8, io.SEEK_END) == tamanho - 8
+    assert arquivo.read(100) == CONTEUDO[-8:]
+    assert arquivo.read(100) == b""
+    assert arquivo.seek(10) == 10
+    assert arquivo.seek(5, io.SEEK_CUR) == 15
+    assert arquivo.tell() == 15
+    assert arquivo.read(5) == CONTEUDO[15:20]
+    assert arquivo.seek(-100, io.SEEK_SET) == 0
+    assert arquivo.requisicoes == 2
+    assert arquivo.bytes_lidos == 13
+
+
+def test_baixar_em_partes_reconstroi_o_objeto(s3, tmp_path):
+    tamanho, ler_intervalo = objeto_s3(s3, BUCKET, "dados/base.bin")
+    destino = tmp_path / "base.bin"
+
+    baixar_em_partes(tamanho, ler_intervalo, str(destino), tamanho_parte=TAMANHO_BLOCO_LEITURA // 3, max_paralelos=4)
+    assert destino.read_bytes() == CONTEUDO
+    assert os.listdir(tmp_path) == ["base.bin"]
+
+
+def test_sondagem_parquet_le_so_parte_do_objeto(s3):
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    pd.DataFrame({"id": range(200_000), "valor": [i * 1.5 for i in range(200_000)]}).to_parquet(
+        buffer, row_group_size=20_000
+    )
+    s3.put_object(Bucket=BUCKET, Key="dados/base.parquet", Body=buffer.getvalue())
+
+    tamanho, ler_intervalo = objeto_s3(s3, BUCKET, "dados/base.parquet")
+    sondagem = sondar_objeto(tamanho, ler_intervalo, "parquet", linhas=10)
+    assert list(sondagem.preview.columns) == ["id", "valor"]
+    assert len(sondagem.preview) == 10
+    assert sondagem.bytes_lidos < tamanho
+
+
+def test_objeto_inexistente(s3):
+    from botocore.exceptions import ClientError
+
+    with pytest.raises(ClientError) as erro:
+        objeto_s3(s3, BUCKET, "dados/nao_existe.csv")
+    assert erro.value.response["Error"]["Code"] in ("404", "NoSuchKey")
+
+
+@pytest.mark.skipif(not os.environ.get("DASHMIGRATE_AZURITE"),
+                    reason="defina DASHMIGRATE_AZURITE com a connection string de um Azurite")
+def test_azure_blob_no_azurite(tmp_path):
+    from armazenamento_objetos import criar_cliente_azure, objeto_azure
+
+    servico = criar_cliente_azure(os.environ["DASHMIGRATE_AZURITE"])
+    container = servico.get_container_client(BUCKET)
+    if not container.exists():
+        container.create_container()
+    container.upload_blob("dados/base.bin", CONTEUDO, overwrite=True)
+
+    tamanho, ler_intervalo = objeto_azure(servico, BUCKET, "dados/base.bin")
+    arquivo = abrir_remoto(tamanho, ler_intervalo)
+    arquivo.seek(TAMANHO_BLOCO_LEITURA - 100)
+    assert arquivo.read(300) == CONTEUDO[TAMANHO_BLOCO_LEITURA - 100:TAMANHO_BLOCO_LEITURA + 200]
+    destino = tmp_path / "base.bin"
+    baixar_em_partes(tamanho, ler_intervalo, str(destino), tamanho_parte=TAMANHO_BLOCO_LEITURA)
+    assert destino.read_bytes() == CONTEUDO
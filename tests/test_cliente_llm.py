@@ -0,0 +1,130 @@
+import threading
+import time
+from functools import partial
+
+import pytest
+
+from backends_llm import _cliente_openai
+from cliente_llm import BaldeTokens, ClienteLLM, ErroLLM
+from servidor_llm_falso import iniciar_servidor
+
+# Limites de taxa, novas tentativas e single-flight do ClienteLLM contra o servidor LLM
+# falso, que recusa as primeiras requisições com 429/503 e retry-after quando pedido.
+
+MENSAGENS = [{"role": "user", "content": "Descreva o dashboard."}]
+
+
+@pytest.fixture
+def servidor():
+    servidores = []
+
+    def iniciar(**configuracao):
+        servidores.append(iniciar_servidor(tokens_resposta=10, **configuracao))
+        return servidores[-1]
+    yield iniciar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
+
+
+def cliente(servidor, **opcoes):
+    # espera_base mínima: só o retry-after do servidor produz esperas perceptíveis
+    opcoes = {"max_tentativas": 3, "espera_base": 0.001, "espera_maxima": 0.01, **opcoes}
+    return ClienteLLM(partial(_cliente_openai, api_key="sk-teste", base_url=servidor.url), **opcoes)
+
+
+@pytest.mark.parametrize("cabecalho", [{"retry_after": 0.4}, {"retry_after_ms": 400}])
+def test_retry_after_e_respeitado(servidor, cabecalho):
+    falso = servidor(falhas=2, status_falha=429, **cabecalho)
+    llm = cliente(falso)
+
+    inicio = time.perf_counter()
+    assert "Medida_" in llm.completar(MENSAGENS, 0.2)
+    assert time.perf_counter() - inicio >= 0.8
+    assert falso.requisicoes == 3
+    assert llm.estatisticas()["tentativas_extras"] == 2
+
+
+def test_erro_llm_depois_de_max_tentativas(servidor):
+    falso = servidor(falhas=10, status_falha=503)
+    llm = cliente(falso, max_tentativas=3)
+
+    with pytest.raises(ErroLLM, match="após 3 tentativas"):
+        llm.completar(MENSAGENS, 0.2)
+    assert falso.requisicoes == 3
+
+
+@pytest.mark.parametrize("status", [400, 401, 404])
+def test_erro_4xx_nao_e_refeito(servidor, status):
+    falso = servidor(falhas=10, status_falha=status)
+    llm = cliente(falso, max_tentativas=5)
+
+    with pytest.raises(ErroLLM, match=f"recusou a requisição \\({status}\\)"):
+        llm.completar(MENSAGENS, 0.2)
+    assert falso.requisicoes == 1
+    assert llm.estatisticas()["tentativas_extras"] == 0
+
+
+def test_chamadas_identicas_simultaneas_viram_uma_requisicao(servidor):
+    falso = servidor(latencia=0.5)
+    llm = cliente(falso)
+    largada = threading.Barrier(2)
+    respostas = []
+
+    def chamar():
+        largada.wait()
+        respostas.append(llm.completar(MENSAGENS, 0.2))
+
+    threads = [threading.Thread(target=chamar) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert falso.requisicoes == 1
+    assert len(respostas) == 2 and respostas[0] == respostas[1]
+    assert llm.estatisticas()["coalescidas"] == 1
+
+
+def test_balde_espera_a_reposicao():
+    balde = BaldeTokens(600)  # 10 por segundo
+
+    inicio = time.perf_counter()
+    balde.consumir(600)
+    assert time.perf_counter() - inicio < 0.1
+    balde.consumir(5)
+    assert 0.4 <= time.perf_counter() - inicio < 1.0
+
+
+def test_modo_json_nao_compartilha_resposta_com_texto(servidor, tmp_path):
+    from cache_llm import CacheLLM
+
+    falso = servidor()
+    llm = cliente(falso, cache=CacheLLM(tmp_path))
+
+    texto = llm.completar(MENSAGENS, 0.2)
+    inventario = llm.completar(MENSAGENS, 0.2, formato_json=True)
+    assert "Medida_" in texto and inventario.startswith('{"componentes"')
+    assert falso.requisicoes == 2
+    # Cada modo acerta a sua própria entrada no cache
+    assert llm.completar(MENSAGENS, 0.2, formato_json=True) == inventario
+    assert llm.completar(MENSAGENS, 0.2) == texto
+    assert falso.requisicoes == 2
+
+
+def test_chamadas_simultaneas_em_modos_diferentes_nao_sao_coalescidas(servidor):
+    falso = servidor(latencia=0.3)
+    llm = cliente(falso)
+    largada = threading.Barrier(2)
+    respostas = {}
+
+    def chamar(formato_json):
+        largada.wait()
+        respostas[formato_json] = llm.completar(MENSAGENS, 0.2, formato_json=formato_json)
+
+    threads = [threading.Thread(target=chamar, args=(formato_json,)) for formato_json in (False, True)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert falso.requisicoes == 2
+    assert respostas[True] != respostas[False]
@@ -0,0 +1,119 @@
+import tracemalloc
+
+import pytest
+import sqlalchemy
+
+from conexoes_sql import consulta_livre, consulta_tabela, criar_engine
+from esquema_dados import LINHAS_PREVIEW, MAX_BYTES_EXPLORACAO, MAX_LINHAS_EXPLORACAO, sondar_sql
+
+# Leituras exploratórias contra um SQLite em disco: limites de linhas e de bytes,
+# tabela vazia e nomes de tabela/consultas maliciosas.
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = criar_engine(f"sqlite:///{tmp_path / 'banco.db'}")
+    yield engine
+    engine.dispose()
+
+
+def executar(engine, *instrucoes):
+    with engine.begin() as conn:
+        for instrucao in instrucoes:
+            conn.execute(sqlalchemy.text(instrucao))
+
+
+def contar(engine, tabela):
+    with engine.connect() as conn:
+        return conn.execute(sqlalchemy.text(f"SELECT COUNT(*) FROM {tabela}")).scalar()
+
+
+def test_leitura_para_no_limite_de_linhas(engine):
+    executar(
+        engine,
+        "CREATE TABLE vendas (id INTEGER, valor REAL, regiao TEXT)",
+        "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < 49999) "
+        "INSERT INTO vendas SELECT i, CASE WHEN i % 10 = 0 THEN NULL ELSE i * 1.5 END, 'Norte' FROM n"
+    )
+
+    sondagem = sondar_sql(engine, consulta_tabela("vendas"))
+    assert sondagem.perfil["linhas"] == MAX_LINHAS_EXPLORACAO
+    assert len(sondagem.preview) == LINHAS_PREVIEW
+    assert sondagem.colunas == ["id", "valor", "regiao"]
+    assert sondagem.perfil["nulos"]["valor"] == 0.1
+    assert 0 < sondagem.bytes_lidos < MAX_BYTES_EXPLORACAO
+
+
+def test_leitura_para_no_limite_de_bytes_com_memoria_limitada(engine):
+    # 4000 linhas de ~20 KB (~80 MB): a leitura para ao passar de 64 MB, antes do fim
+    # da tabela, e só um bloco por vez fica em memória
+    executar(
+        engine,
+        "CREATE TABLE logs (id INTEGER, texto TEXT)",
+        "WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < 3999) "
+        "INSERT INTO logs SELECT i, hex(randomblob(10000)) FROM n"
+    )
+
+    tracemalloc.start()
+    try:
+        sondagem = sondar_sql(engine, consulta_tabela("logs"), tamanho_bloco=500)
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert sondagem.bytes_lidos >= MAX_BYTES_EXPLORACAO
+    assert sondagem.perfil["linhas"] < 4000
+    assert pico < MAX_BYTES_EXPLORACAO / 2
+
+
+def test_tabela_vazia(engine):
+    executar(engine, "CREATE TABLE vazia (id INTEGER, nome TEXT)")
+
+    sondagem = sondar_sql(engine, consulta_tabela("vazia"))
+    assert sondagem.colunas == ["id", "nome"]
+    assert sondagem.preview.empty
+    assert sondagem.perfil == {"linhas": 0, "nulos": {"id": 0.0, "nome": 0.0}}
+
+
+def test_schema_e_tabela_sao_citados(engine):
+    executar(engine, 'CREATE TABLE "vendas 2024" (id INTEGER)', 'INSERT INTO "vendas 2024" VALUES (1)')
+
+    assert sondar_sql(engine, consulta_tabela("main.vendas 2024")).perfil["linhas"] == 1
+
+
+@pytest.mark.parametrize("nome", [
+    "vitima; DROP TABLE vitima",
+    'vitima" --',
+    "vitima WHERE 1=1 --",
+    "(SELECT 1)",
+    "a.b.c",
+    ""
+])
+def test_nome_de_tabela_malicioso_e_recusado(engine, nome):
+    executar(engine, "CREATE TABLE vitima (id INTEGER)", "INSERT INTO vitima VALUES (1)")
+
+    with pytest.raises(ValueError):
+        sondar_sql(engine, consulta_tabela(nome))
+    assert contar(engine, "vitima") == 1
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM vitima; DROP TABLE vitima",
+    "SELECT * FROM vitima;\nDELETE FROM vitima;",
+    "SELECT 'a' AS x; DROP TABLE vitima --';",
+    "",
+    ";"
+])
+def test_consulta_livre_com_varias_instrucoes_e_recusada(engine, sql):
+    executar(engine, "CREATE TABLE vitima (id INTEGER)", "INSERT INTO vitima VALUES (1)")
+
+    with pytest.raises(ValueError):
+        sondar_sql(engine, consulta_livre(sql))
+    assert contar(engine, "vitima") == 1
+
+
+def test_consulta_livre_aceita_ponto_e_virgula_em_literais(engine):
+    executar(engine, "CREATE TABLE vitima (id INTEGER)", "INSERT INTO vitima VALUES (1), (2)")
+
+    sondagem = sondar_sql(engine, consulta_livre("SELECT id, 'a;b' AS \"x;y\" FROM vitima WHERE id > 1;"))
+    assert sondagem.colunas == ["id", "x;y"]
+    assert sondagem.preview.to_dict("records") == [{"id": 2, "x;y": "a;b"}]
@@ -0,0 +1,31 @@
+import io
+
+import pytest
+from PIL import Image
+
+from imagens import detectar_formato, imagem_valida, preprocessar_imagem
+
+
+def imagem_em_bytes(formato, tamanho=(320, 200), modo="RGB"):
+    buffer = io.BytesIO()
+    Image.new(modo, tamanho, (31, 119, 180)).save(buffer, format=formato)
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("formato", ["PNG", "JPEG", "WEBP"])
+def test_formato_real_pelo_conteudo(formato):
+    assert detectar_formato(imagem_em_bytes(formato)) == formato
+    assert imagem_valida(imagem_em_bytes(formato))
+
+
+@pytest.mark.parametrize("dados", [b"", b"id,valor\n1,2\n", b"%PDF-1.4 qualquer coisa", imagem_em_bytes("PNG")[:60]])
+def test_arquivo_que_nao_e_imagem_e_recusado(dados):
+    assert detectar_formato(dados) is None
+    assert not imagem_valida(dados)
+
+
+def test_preprocessamento_reduz_e_converte_para_jpeg():
+    dados, mime = preprocessar_imagem(imagem_em_bytes("PNG", (4096, 2160), "RGBA"), lado_max=2048)
+    assert mime == "image/jpeg"
+    with Image.open(io.BytesIO(dados)) as imagem:
+        assert imagem.format == "JPEG" and imagem.size == (2048, 1080)
@@ -0,0 +1,29 @@
+import json
+import os
+import time
+
+from metricas import Instrumentacao
+
+
+def test_prometheus_e_reescrito_uma_vez_por_intervalo(tmp_path):
+    instrumentacao = Instrumentacao(tmp_path, intervalo_prometheus=0.2)
+    for i in range(50):
+        instrumentacao.registrar_span("etapa_1", 0.01)
+
+    # O trace recebe cada evento na hora; o textfile só depois do intervalo, com todos eles
+    with open(instrumentacao.caminho_trace, encoding="utf-8") as f:
+        assert len([json.loads(linha) for linha in f]) == 50
+    assert not os.path.exists(instrumentacao.caminho_prometheus)
+    time.sleep(0.5)
+    with open(instrumentacao.caminho_prometheus, encoding="utf-8") as f:
+        assert 'dashmigrate_span_segundos_count{nome="etapa_1"} 50' in f.read()
+
+
+def test_exportar_grava_na_hora(tmp_path):
+    instrumentacao = Instrumentacao(tmp_path, intervalo_prometheus=3600)
+    instrumentacao.registrar_dados("base.csv", "csv", 1024, 10, 0.5)
+    instrumentacao.exportar()
+
+    with open(instrumentacao.caminho_prometheus, encoding="utf-8") as f:
+        assert 'dashmigrate_dados_linhas_total{tipo="csv"} 10' in f.read()
+    assert instrumentacao._exportacao_agendada is None
@@ -0,0 +1,103 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from dados_sinteticos import gerar_screenshot
+from servidor_llm_falso import iniciar_servidor
+
+# Lote de ponta a ponta contra o servidor LLM falso (compatível com a OpenAI), rodando o
+# CLI como no uso real: processo separado, manifesto em CSV e checkpoints em disco.
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def servidor():
+    servidor = iniciar_servidor(componentes=4, colunas=4, tokens_resposta=40)
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+@pytest.fixture
+def manifesto(tmp_path):
+    with open(tmp_path / "painel.png", "wb") as f:
+        f.write(gerar_screenshot(640, 360, componentes=4))
+    with open(tmp_path / "base.csv", "w", encoding="utf-8", newline="") as f:
+        escritor = csv.writer(f)
+        escritor.writerow([f"coluna_{c:03d}" for c in range(4)])
+        escritor.writerows([[i, i * 1.5, "Norte", "2024-01-01"] for i in range(50)])
+
+    def escrever(linhas):
+        caminho = tmp_path / "manifesto.csv"
+        with open(caminho, "w", encoding="utf-8", newline="") as f:
+            escritor = csv.writer(f)
+            escritor.writerow(["id", "imagem", "dataset"])
+            escritor.writerows(linhas)
+        return caminho
+    return escrever
+
+
+def rodar_lote(caminho_manifesto, servidor):
+    ambiente = {**os.environ, "OPENAI_API_KEY": "sk-teste", "OPENAI_BASE_URL": servidor.url}
+    saida = caminho_manifesto.parent / "saida"
+    processo = subprocess.run(
+        [sys.executable, os.path.join(RAIZ, "migracao_lote.py"), str(caminho_manifesto), "--saida", str(saida),
+         "--sem-cache", "--dashboards-paralelos", "2", "--max-chamadas", "2"],
+        cwd=caminho_manifesto.parent, env=ambiente, capture_output=True, text=True, timeout=300
+    )
+    with open(saida / "resumo_lote.json", encoding="utf-8") as f:
+        return processo, json.load(f), saida
+
+
+def test_lote_conclui_e_retoma_dos_checkpoints(manifesto, servidor):
+    caminho = manifesto([["painel 1", "painel.png", "base.csv"], ["painel2", "painel.png", "base.csv"]])
+
+    processo, resumo, saida = rodar_lote(caminho, servidor)
+    assert processo.returncode == 0, processo.stdout + processo.stderr
+    assert resumo["concluidos"] == 2 and resumo["falhas"] == []
+    for id_item in ("painel_1", "painel2"):
+        assert os.path.exists(saida / id_item / "relatorio_executivo_dashmigrate.docx")
+        assert json.loads((saida / id_item / "inventario.json").read_text(encoding="utf-8"))["componentes"]
+    requisicoes = servidor.requisicoes
+    assert requisicoes > 0
+    # O textfile do Prometheus é gravado ao fim do lote, sem esperar o intervalo de exportação
+    with open(saida / "metricas" / "dashmigrate.prom", encoding="utf-8") as f:
+        assert "dashmigrate_llm_chamadas_total" in f.read()
+
+    # Segunda execução: tudo vem dos checkpoints, sem nenhuma chamada nova ao LLM
+    processo, resumo, _ = rodar_lote(caminho, servidor)
+    assert processo.returncode == 0, processo.stdout + processo.stderr
+    assert resumo["concluidos"] == 0 and resumo["ja_concluidos"] == 2
+    assert servidor.requisicoes == requisicoes
+
+
+def test_falha_aparece_no_resumo_e_no_codigo_de_saida(manifesto, servidor):
+    caminho = manifesto([["ok", "painel.png", "base.csv"], ["sem imagem", "nao_existe.png", "base.csv"]])
+
+    processo, resumo, _ = rodar_lote(caminho, servidor)
+    assert processo.returncode == 1
+    assert resumo["concluidos"] == 1
+    assert [falha["id"] for falha in resumo["falhas"]] == ["sem_imagem"]
+    assert "FileNotFoundError" in resumo["falhas"][0]["erro"]
+    assert "1 falhas" in processo.stdout
+
+
+@pytest.mark.parametrize("ids", [["painel 1", "painel_1"], ["Painel-2", "painel-2"], ["painel/3", "painel 3"]])
+def test_ids_que_viram_a_mesma_pasta_sao_recusados(manifesto, ids):
+    from migracao_lote import carregar_manifesto
+
+    caminho = manifesto([[id_item, "painel.png", "base.csv"] for id_item in ids])
+    with pytest.raises(ValueError, match="mesma pasta"):
+        carregar_manifesto(str(caminho))
+
+
+def test_id_sem_caracteres_validos_e_recusado(manifesto):
+    from migracao_lote import carregar_manifesto
+
+    with pytest.raises(ValueError, match="Id inválido"):
+        carregar_manifesto(str(manifesto([["///", "painel.png", "base.csv"]])))
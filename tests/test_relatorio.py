@@ -0,0 +1,26 @@
+import pytest
+from PIL import Image
+
+from relatorio import gerar_relatorio_docx, gerar_relatorio_pdf
+
+# Relatórios com capturas de tela em paisagem e em retrato: a imagem precisa caber na
+# página inteira (largura e altura), senão o reportlab recusa o documento.
+
+
+@pytest.mark.parametrize("tamanho", [(1920, 1080), (1080, 1920), (1000, 3000), (400, 6000)])
+def test_relatorios_com_capturas_de_qualquer_proporcao(tmp_path, tamanho):
+    caminho_imagem = tmp_path / "dashboard.png"
+    Image.new("RGB", tamanho, (31, 119, 180)).save(caminho_imagem)
+    dados = dict(
+        ocr="- **KPI: Receita**", roteiro="## Passos\n\n- Criar a medida", checklist={},
+        progresso={"Extração visual": True}, esquema_dataset={},
+        caminho_img_original=str(caminho_imagem), caminho_img_novo=str(caminho_imagem),
+        diretorio_cache_imagens=str(tmp_path / "cache")
+    )
+
+    pdf = gerar_relatorio_pdf(str(tmp_path / "relatorio.pdf"), **dados)
+    docx = gerar_relatorio_docx(str(tmp_path / "relatorio.docx"), **dados)
+    with open(pdf, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+    with open(docx, "rb") as f:
+        assert f.read(2) == b"PK"